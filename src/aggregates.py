@@ -0,0 +1,179 @@
+from assets import remove_output
+from manifest import hash_file
+from output import AtomicWriter
+from search import page_url
+from template import load_template
+from datetime import datetime, timezone
+from functools import partial
+import hashlib, heapq, html, json, os
+
+SITEMAP_NAME = "sitemap.xml"
+FEED_NAME = "feed.xml"
+FEED_SIZE = 20
+# Entries per section index page, written to <section>/pages/<n>.html
+PAGE_SIZE = 20
+LISTING_DIR = "pages"
+
+# Escapes &, < and > like xml.sax.saxutils.escape, which costs urllib and http.client to import
+escape = partial(html.escape, quote=False)
+
+
+def site_digest(pages, settings, template_hash):
+	# Everything the aggregate outputs are made from; page bodies aren't part of it
+	digest = hashlib.sha256(json.dumps([settings["base_url"], settings["template"], template_hash]).encode())
+
+	for source in sorted(pages):
+		entry = pages[source]
+		digest.update(json.dumps([source, entry["output"], entry.get("meta", {})], sort_keys=True).encode())
+
+	return digest.hexdigest()
+
+
+def absolute_url(base_url, output):
+	return base_url.rstrip("/") + page_url(output)
+
+
+def newest_first(pages, sources):
+	return sorted(sources, key=lambda source: (str(pages[source].get("meta", {}).get("date", "")),
+		str(pages[source].get("meta", {}).get("title", ""))), reverse=True)
+
+
+def rfc822(date):
+	from email.utils import format_datetime
+
+	try:
+		parsed = datetime.fromisoformat(str(date))
+	except ValueError:
+		return None
+
+	if parsed.tzinfo is None:
+		parsed = parsed.replace(tzinfo=timezone.utc)
+	return format_datetime(parsed)
+
+
+def write_sitemap(path, pages, base_url):
+	with AtomicWriter(path) as file:
+		file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+		file.write('<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+
+		for source in sorted(pages):
+			entry = pages[source]
+			file.write(f"<url><loc>{escape(absolute_url(base_url, entry['output']))}</loc>")
+			if date := entry.get("meta", {}).get("date"):
+				file.write(f"<lastmod>{escape(str(date))}</lastmod>")
+			file.write("</url>\n")
+
+		file.write("</urlset>\n")
+
+	return file
+
+
+def write_feed(path, pages, base_url):
+	# Only dated pages are news; the newest FEED_SIZE are picked without sorting the rest
+	dated = ((str(entry["meta"]["date"]), source) for source, entry in pages.items() if entry.get("meta", {}).get("date"))
+	title = pages.get("index.md", {}).get("meta", {}).get("title") or "Feed"
+
+	with AtomicWriter(path) as file:
+		file.write('<?xml version="1.0" encoding="UTF-8"?>\n<rss version="2.0"><channel>\n')
+		file.write(f"<title>{escape(title)}</title><link>{escape(base_url or '/')}</link><description>{escape(title)}</description>\n")
+
+		for date, source in heapq.nlargest(FEED_SIZE, dated):
+			entry = pages[source]
+			url = escape(absolute_url(base_url, entry["output"]))
+			file.write(f"<item><title>{escape(str(entry['meta'].get('title', '')))}</title><link>{url}</link><guid>{url}</guid>")
+			if published := rfc822(date):
+				file.write(f"<pubDate>{published}</pubDate>")
+			file.write("</item>\n")
+
+		file.write("</channel></rss>\n")
+
+	return file
+
+
+def listing_path(section, number):
+	return os.path.join(section, LISTING_DIR, f"{number}.html")
+
+
+def write_listing(path, template, title, pages, sources, section, number, count):
+	def content(write):
+		write("<ul>")
+		for source in sources:
+			meta = pages[source].get("meta", {})
+			write(f'<li><a href="{page_url(pages[source]["output"])}">{meta.get("title") or source}</a>')
+			if date := meta.get("date"):
+				write(f" <time>{date}</time>")
+			write("</li>")
+		write("</ul><nav>")
+		if number > 1:
+			write(f'<a href="{page_url(listing_path(section, number - 1))}">Newer</a>')
+		if number < count:
+			write(f'<a href="{page_url(listing_path(section, number + 1))}">Older</a>')
+		write("</nav>")
+
+	with AtomicWriter(path) as file:
+		template.render(file.write, {"Title": title, "Content": content})
+
+	return file
+
+
+def write_aggregates(dest_dir_path, pages, settings):
+	# Returns {relative output: written} for the sitemap, the feed and every section index page
+	results = {}
+	base_url = settings["base_url"]
+
+	results[SITEMAP_NAME] = write_sitemap(os.path.join(dest_dir_path, SITEMAP_NAME), pages, base_url).written
+	results[FEED_NAME] = write_feed(os.path.join(dest_dir_path, FEED_NAME), pages, base_url).written
+
+	# A section is a top-level directory of content/
+	sections = {}
+	for source in pages:
+		if os.sep in source:
+			sections.setdefault(source.split(os.sep, 1)[0], []).append(source)
+
+	template = load_template(settings["template"])
+	taken = {entry["output"] for entry in pages.values()}
+
+	for section, sources in sorted(sections.items()):
+		sources = newest_first(pages, sources)
+		title = pages.get(os.path.join(section, "index.md"), {}).get("meta", {}).get("title") or section
+		count = -(-len(sources) // PAGE_SIZE)
+
+		for number in range(1, count + 1):
+			relative_path = listing_path(section, number)
+			# A real page at the same path wins over the generated listing
+			if relative_path in taken:
+				continue
+
+			chunk = sources[(number - 1) * PAGE_SIZE:number * PAGE_SIZE]
+			file = write_listing(os.path.join(dest_dir_path, relative_path), template, title, pages, chunk, section, number, count)
+			results[relative_path] = file.written
+
+	return results
+
+
+def update_aggregates(dest_dir_path, manifest):
+	# Regenerates the aggregate outputs when the page set, its metadata or the settings changed;
+	# returns the outputs that changed on disk
+	settings = manifest.aggregates
+	template_hash = manifest.templates.get(settings["template"]) or hash_file(settings["template"])
+	digest = site_digest(manifest.pages, settings, template_hash)
+	outputs = settings.get("outputs", [])
+
+	if digest == settings.get("digest") and all(os.path.isfile(os.path.join(dest_dir_path, path)) for path in outputs):
+		return []
+
+	results = write_aggregates(dest_dir_path, manifest.pages, settings)
+
+	taken = manifest.outputs()
+	for relative_path in outputs:
+		if relative_path not in results and relative_path not in taken:
+			remove_output(dest_dir_path, relative_path)
+
+	settings["digest"] = digest
+	settings["outputs"] = sorted(results)
+	return sorted(path for path, written in results.items() if written)
+
+
+def remove_aggregates(dest_dir_path, settings):
+	for relative_path in settings.get("outputs", []):
+		remove_output(dest_dir_path, relative_path)
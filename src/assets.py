@@ -0,0 +1,143 @@
+from manifest import source_entry
+import os, shutil
+
+COPY_CHUNK = 1 << 30
+
+
+class SyncReport():
+	def __init__(self):
+		self.copied = []
+		self.skipped = 0
+		self.removed = []
+		self.bytes_copied = 0
+		self.bytes_skipped = 0
+
+	def __repr__(self):
+		return (f"SyncReport({len(self.copied)} copied ({self.bytes_copied} bytes), "
+			f"{self.skipped} skipped ({self.bytes_skipped} bytes), {len(self.removed)} removed)")
+
+
+def copy_file(source, destination, link = False):
+	# Written next to the destination and renamed so a reader never sees a partial file
+	tmp_path = destination + ".tmp"
+
+	if link:
+		try:
+			os.link(source, tmp_path)
+			os.replace(tmp_path, destination)
+			return
+		except OSError:
+			if os.path.lexists(tmp_path):
+				os.unlink(tmp_path)
+
+	with open(source, "rb") as src, open(tmp_path, "wb") as dst:
+		try:
+			# Lets the filesystem share extents (reflink) or copy in-kernel
+			while os.copy_file_range(src.fileno(), dst.fileno(), COPY_CHUNK):
+				pass
+		except (AttributeError, OSError):
+			src.seek(0)
+			dst.seek(0)
+			dst.truncate()
+			shutil.copyfileobj(src, dst)
+
+	shutil.copystat(source, tmp_path)
+	os.replace(tmp_path, destination)
+
+
+def is_unchanged(source_stat, destination):
+	try:
+		stat = os.stat(destination)
+	except OSError:
+		return False
+
+	return stat.st_size == source_stat.st_size and stat.st_mtime_ns == source_stat.st_mtime_ns
+
+
+def collect_assets(dir_path_static):
+	assets = []
+
+	for root, dirs, files in os.walk(dir_path_static):
+		for item in files:
+			assets.append(os.path.relpath(os.path.join(root, item), dir_path_static))
+
+	return sorted(assets)
+
+
+def sync_file(relative_path, dir_path_static, dest_dir_path, previous, report, link = False, checksum = False):
+	source = os.path.join(dir_path_static, relative_path)
+	destination = os.path.join(dest_dir_path, relative_path)
+
+	if checksum:
+		entry = source_entry(source, previous)
+		unchanged = previous and previous["hash"] == entry["hash"] and os.path.exists(destination)
+	else:
+		stat = os.stat(source)
+		entry = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+		unchanged = is_unchanged(stat, destination)
+
+	if unchanged:
+		report.skipped += 1
+		report.bytes_skipped += entry["size"]
+	else:
+		os.makedirs(os.path.dirname(destination), exist_ok=True)
+		copy_file(source, destination, link)
+		report.copied.append(relative_path)
+		report.bytes_copied += entry["size"]
+
+	return entry
+
+
+def remove_output(dest_dir_path, relative_path):
+	file_path = os.path.join(dest_dir_path, relative_path)
+
+	from compress import remove_compressed
+
+	if os.path.isfile(file_path):
+		os.unlink(file_path)
+	remove_compressed(file_path)
+
+	# Prune directories left empty by the removal, never the output root itself
+	directory = os.path.dirname(file_path)
+	while os.path.abspath(directory) != os.path.abspath(dest_dir_path):
+		try:
+			os.rmdir(directory)
+		except OSError:
+			break
+		directory = os.path.dirname(directory)
+
+
+def sync_static(dir_path_static, dest_dir_path, previous_assets, keep = (), link = False, checksum = False):
+	# Copies only new or changed files and removes ones the previous sync put there
+	# but static/ no longer has; files in keep (page outputs) are never removed
+	assets = {}
+	report = SyncReport()
+
+	for relative_path in collect_assets(dir_path_static):
+		assets[relative_path] = sync_file(relative_path, dir_path_static, dest_dir_path,
+			previous_assets.get(relative_path), report, link, checksum)
+
+	for relative_path in sorted(previous_assets.keys() - assets.keys()):
+		if relative_path not in keep:
+			remove_output(dest_dir_path, relative_path)
+			report.removed.append(relative_path)
+
+	return assets, report
+
+
+def list_static(dir_path_static, dest_dir_path, previous_assets, keep = ()):
+	# Records static/ without copying it, for a shard that leaves the assets to the first one;
+	# copies an earlier sync put in dest_dir_path are removed
+	assets = {}
+	report = SyncReport()
+
+	for relative_path in collect_assets(dir_path_static):
+		stat = os.stat(os.path.join(dir_path_static, relative_path))
+		assets[relative_path] = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+	for relative_path in sorted(previous_assets):
+		if relative_path not in keep and os.path.isfile(os.path.join(dest_dir_path, relative_path)):
+			remove_output(dest_dir_path, relative_path)
+			report.removed.append(relative_path)
+
+	return assets, report
@@ -0,0 +1,135 @@
+from build import output_path, rendering, run_profiled
+from output import AtomicWriter
+from profiler import get_profiler
+from textnode import render_page
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio, logging
+
+logger = logging.getLogger(__name__)
+
+# Reads and writes in flight at once; on network or overlay filesystems latency, not bandwidth, is the limit
+IO_CONCURRENCY = 32
+# Pages per render call, small so one chunk's rendering overlaps the next one's reads and the last one's writes
+ASYNC_CHUNK_SIZE = 16
+# Rendered chunks allowed to wait on their writes before rendering stops
+WRITE_BACKLOG = 4
+
+
+def read_source(path):
+	with open(path, "rb") as file:
+		return file.read()
+
+
+def write_output(path, html):
+	with AtomicWriter(path) as file:
+		file.write(html)
+
+	return file
+
+
+def render_text_chunk(pages, cache_path = None, index = False, links = False, sizes = None):
+	# Pure CPU work: sources come in as bytes, pages go back as strings (plus search postings with index,
+	# link and image targets with links or sizes)
+	rendered = []
+	errors = []
+	profiler = get_profiler()
+
+	if index:
+		from search import page_postings
+	if sizes is not None:
+		from images import size_lookup
+
+	with rendering(cache_path):
+		for source, from_path, template_path, data in pages:
+			logger.info("Rendering %s using %s", from_path, template_path)
+			try:
+				with profiler.page(from_path):
+					texts = [] if index else None
+					targets = [] if links or sizes is not None else None
+					image_size = size_lookup(sizes, output_path(source)) if sizes is not None else None
+					html = render_page(data.decode("utf-8"), template_path, texts = texts, targets = targets,
+						image_size = image_size)
+					rendered.append((source, html, page_postings(texts) if index else None, targets))
+			except Exception as e:
+				errors.append((source, f"{type(e).__name__}: {e}"))
+
+	return rendered, errors
+
+
+async def build_chunk(chunk, io, executor, profile, cache_path, index, links, sizes, limit, unwritten, errors, outputs):
+	loop = asyncio.get_running_loop()
+	profiler = get_profiler()
+
+	# A chunk holds unwritten from its reads until its pages are on disk, so when storage falls
+	# behind the reading and rendering of later chunks waits instead of queueing pages in memory
+	async with unwritten:
+		async with limit:
+			results = await asyncio.gather(*(loop.run_in_executor(io, read_source, from_path)
+				for source, from_path, template_path, dest_path in chunk), return_exceptions=True)
+
+			pages = []
+			destinations = {}
+			for (source, from_path, template_path, dest_path), data in zip(chunk, results):
+				if isinstance(data, Exception):
+					errors.append((source, f"{type(data).__name__}: {data}"))
+				else:
+					pages.append((source, from_path, template_path, data))
+					destinations[source] = dest_path
+
+			(rendered, chunk_errors), data = await loop.run_in_executor(executor, run_profiled,
+				render_text_chunk, profile, pages, cache_path, index, links, sizes)
+			errors.extend(chunk_errors)
+			if data:
+				profiler.merge(data)
+
+		# Writes happen outside the limit so the next chunk's reads can start meanwhile
+		written = await asyncio.gather(*(loop.run_in_executor(io, write_output, destinations[source], html)
+			for source, html, postings, targets in rendered), return_exceptions=True)
+
+	for (source, html, postings, targets), file in zip(rendered, written):
+		if isinstance(file, Exception):
+			errors.append((source, f"{type(file).__name__}: {file}"))
+			continue
+
+		outputs.append((source, file.hash, file.written, postings, targets))
+		profiler.count("pages")
+		if file.written:
+			profiler.count("bytes_written", file.size)
+		else:
+			profiler.count("outputs_unchanged")
+
+
+async def render_all(tasks, jobs, cache_path, index, links, sizes):
+	errors = []
+	outputs = []
+	chunks = [tasks[i:i + ASYNC_CHUNK_SIZE] for i in range(0, len(tasks), ASYNC_CHUNK_SIZE)]
+
+	# One render thread is enough under the GIL and keeps the block cache single-threaded;
+	# with jobs the rendering moves to worker processes and their profiles are merged back
+	if jobs > 1:
+		executor = ProcessPoolExecutor(max_workers = min(jobs, len(chunks)))
+		profile = get_profiler().enabled
+	else:
+		executor = ThreadPoolExecutor(max_workers = 1)
+		profile = False
+
+	# Bounds how many chunks have been read but not yet rendered, and how many are anywhere
+	# between their reads and their last write
+	limit = asyncio.Semaphore(max(jobs, 1) * 2)
+	unwritten = asyncio.Semaphore(max(jobs, 1) * 2 + WRITE_BACKLOG)
+
+	with ThreadPoolExecutor(max_workers = IO_CONCURRENCY) as io, executor:
+		await asyncio.gather(*(build_chunk(chunk, io, executor, profile, cache_path, index, links, sizes, limit, unwritten,
+			errors, outputs)
+			for chunk in chunks))
+
+	return sorted(errors), outputs
+
+
+def render_pages_async(tasks, jobs = 1, cache_path = None, index = False, links = False, sizes = None):
+	# Same contract as render_pages: writes every page and returns (source, message) for the
+	# ones that failed plus (source, output hash, written, search postings, targets) for the rest
+	if not tasks:
+		return [], []
+
+	return asyncio.run(render_all(tasks, jobs, cache_path, index, links, sizes))
@@ -0,0 +1,319 @@
+from build import build_site
+from template import load_template
+from textnode import inline_fragment, iter_blocks, text_to_textnodes, block_to_block_type, block_to_html_node
+import argparse, io, json, os, platform, random, subprocess, sys, tempfile, time
+
+SIZES = {
+	"small": 50,
+	"medium": 1000,
+	"large": 10000,
+	"huge": 100000,
+}
+
+# Relative weight of each block kind in generated pages
+DEFAULT_MIX = {
+	"heading": 2,
+	"paragraph": 6,
+	"unordered": 2,
+	"ordered": 1,
+	"code": 1,
+	"quote": 1,
+}
+
+# Chance that a generated sentence carries each inline construct
+INLINE_MIX = {
+	"bold": 0.3,
+	"italic": 0.3,
+	"code": 0.2,
+	"link": 0.2,
+	"image": 0.05,
+}
+
+PAGES_PER_DIRECTORY = 100
+WORDS = ("middle earth ring fellowship shire hobbit wizard elf dwarf mountain river forest "
+	"road journey shadow light tower king sword council valley").split()
+TEMPLATE = "<!DOCTYPE html><html><head><title>{{ Title }}</title></head><body>{{ Content }}</body></html>"
+
+# A fresh interpreter running `main.py build` on a one-page site should finish within this
+COLD_START_TARGET = 0.15
+COLD_START_RUNS = 5
+
+STAGES = ["read", "markdown_to_blocks", "text_to_textnodes", "block_to_html_node", "template_fill", "disk_write"]
+
+
+def check_mix(mix, known, limit = None):
+	# Block weights or inline chances, keyed by the kinds the generator knows
+	if not isinstance(mix, dict):
+		raise ValueError("expected a JSON object")
+
+	for kind, value in mix.items():
+		if kind not in known:
+			raise ValueError(f"unknown kind {kind!r}, expected one of {', '.join(known)}")
+		if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0 or (limit and value > limit):
+			raise ValueError(f"{kind} must be a number from 0" + (f" to {limit}" if limit else ""))
+
+	return mix
+
+
+def mix_argument(known, limit = None):
+	def parse(value):
+		try:
+			return check_mix(json.loads(value), known, limit)
+		except ValueError as e:
+			raise argparse.ArgumentTypeError(str(e))
+
+	return parse
+
+
+def sentence(rng, inline_mix):
+	words = [rng.choice(WORDS) for _ in range(rng.randint(6, 14))]
+
+	for kind, chance in inline_mix.items():
+		if rng.random() >= chance:
+			continue
+		i = rng.randrange(len(words))
+
+		match kind:
+			case "bold":
+				words[i] = f"**{words[i]}**"
+			case "italic":
+				words[i] = f"*{words[i]}*"
+			case "code":
+				words[i] = f"`{words[i]}`"
+			case "link":
+				words[i] = f"[{words[i]}](/{rng.choice(WORDS)}/{rng.choice(WORDS)})"
+			case "image":
+				words[i] = f"![{words[i]}](/images/{rng.choice(WORDS)}.png)"
+
+	return " ".join(words).capitalize() + "."
+
+
+def generate_block(rng, kind, inline_mix):
+	match kind:
+		case "heading":
+			return "#" * rng.randint(1, 3) + " " + sentence(rng, inline_mix)
+		case "paragraph":
+			return " ".join(sentence(rng, inline_mix) for _ in range(rng.randint(1, 5)))
+		case "unordered":
+			return "\n".join("* " + sentence(rng, inline_mix) for _ in range(rng.randint(2, 6)))
+		case "ordered":
+			return "\n".join(f"{i}. " + sentence(rng, inline_mix) for i in range(1, rng.randint(3, 7)))
+		case "code":
+			return "```\n" + "\n".join(f"print(\"{rng.choice(WORDS)}\")" for _ in range(rng.randint(2, 8))) + "\n```"
+		case "quote":
+			return "> " + sentence(rng, inline_mix)
+
+
+def generate_page_markdown(rng, blocks, mix, inline_mix):
+	kinds = list(mix)
+	weights = [mix[kind] for kind in kinds]
+	parts = ["# " + sentence(rng, {})]
+
+	for kind in rng.choices(kinds, weights, k = blocks):
+		parts.append(generate_block(rng, kind, inline_mix))
+
+	return "\n\n".join(parts) + "\n"
+
+
+def generate_corpus(root, pages, blocks = 20, mix = None, inline_mix = None, seed = 0):
+	rng = random.Random(seed)
+	mix = check_mix(mix or DEFAULT_MIX, DEFAULT_MIX)
+	inline_mix = check_mix(INLINE_MIX if inline_mix is None else inline_mix, INLINE_MIX, 1)
+	paths = []
+
+	for i in range(pages):
+		path = os.path.join(root, f"section{i // PAGES_PER_DIRECTORY}", f"page{i}.md")
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+
+		with open(path, "w", encoding="utf-8") as file:
+			file.write(generate_page_markdown(rng, blocks, mix, inline_mix))
+		paths.append(path)
+
+	return paths
+
+
+def time_stages(paths, template_path, dest_dir_path):
+	timings = dict.fromkeys(STAGES, 0.0)
+	counters = {"pages": len(paths), "blocks": 0, "text_nodes": 0, "bytes_read": 0, "bytes_written": 0}
+	template = load_template(template_path)
+	clock = time.perf_counter
+	# Every timed phase starts with a cold memo, like a fresh build does
+	inline_fragment.clear()
+
+	for i, path in enumerate(paths):
+		started = clock()
+		with open(path, "r", encoding="utf-8") as file:
+			markdown = file.read()
+		timings["read"] += clock() - started
+		counters["bytes_read"] += len(markdown)
+
+		started = clock()
+		blocks = list(iter_blocks(markdown.split("\n")))
+		timings["markdown_to_blocks"] += clock() - started
+		counters["blocks"] += len(blocks)
+
+		started = clock()
+		for block in blocks:
+			counters["text_nodes"] += len(text_to_textnodes(block))
+		timings["text_to_textnodes"] += clock() - started
+
+		# Includes its own inline tokenizing, the same work the build does per block
+		started = clock()
+		html = "<div>" + "".join(block_to_html_node(block, block_to_block_type(block)) for block in blocks) + "</div>"
+		timings["block_to_html_node"] += clock() - started
+
+		started = clock()
+		buffer = io.StringIO()
+		template.render(buffer.write, {"Title": path, "Content": html})
+		page = buffer.getvalue()
+		timings["template_fill"] += clock() - started
+
+		started = clock()
+		with open(os.path.join(dest_dir_path, f"{i}.html"), "w", encoding="utf-8") as file:
+			file.write(page)
+		timings["disk_write"] += clock() - started
+		counters["bytes_written"] += len(page)
+
+	return timings, counters
+
+
+def time_build(content, template_path, dest_dir_path, jobs):
+	# time_stages rendered the same corpus, forked workers would inherit its memo too
+	inline_fragment.clear()
+	started = time.perf_counter()
+	build_site(content, template_path, dest_dir_path, jobs = jobs)
+	full = time.perf_counter() - started
+
+	started = time.perf_counter()
+	build_site(content, template_path, dest_dir_path, incremental = True, jobs = jobs)
+	noop = time.perf_counter() - started
+
+	return {"full_seconds": full, "noop_incremental_seconds": noop, "jobs": jobs}
+
+
+def time_cold_start(runs = COLD_START_RUNS):
+	# Best of runs, next to a bare interpreter start so the import and build overhead is visible
+	main_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+	with tempfile.TemporaryDirectory() as root:
+		os.makedirs(os.path.join(root, "content"))
+		with open(os.path.join(root, "template.html"), "w", encoding="utf-8") as file:
+			file.write(TEMPLATE)
+		with open(os.path.join(root, "content", "index.md"), "w", encoding="utf-8") as file:
+			file.write("# Home\n\nHello **world**\n")
+
+		def best(command):
+			timings = []
+			for _ in range(runs):
+				started = time.perf_counter()
+				subprocess.run(command, cwd=root, capture_output=True, check=True)
+				timings.append(time.perf_counter() - started)
+			return min(timings)
+
+		seconds = best([sys.executable, main_path, "build", "--no-cache"])
+		python_seconds = best([sys.executable, "-c", "pass"])
+
+	return {"seconds": seconds, "python_seconds": python_seconds, "target_seconds": COLD_START_TARGET,
+		"within_target": seconds <= COLD_START_TARGET, "runs": runs}
+
+
+def git_revision():
+	try:
+		return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+
+def run_bench(pages, blocks = 20, seed = 0, jobs = 1, mix = None, inline_mix = None, cold_start_runs = COLD_START_RUNS):
+	with tempfile.TemporaryDirectory() as root:
+		content = os.path.join(root, "content")
+		template_path = os.path.join(root, "template.html")
+		with open(template_path, "w", encoding="utf-8") as file:
+			file.write(TEMPLATE)
+
+		paths = generate_corpus(content, pages, blocks, mix, inline_mix, seed)
+
+		stage_dir = os.path.join(root, "stages")
+		os.makedirs(stage_dir)
+
+		timings, counters = time_stages(paths, template_path, stage_dir)
+		build = time_build(content, template_path, os.path.join(root, "public"), jobs)
+
+	return {
+		"revision": git_revision(),
+		"python": platform.python_version(),
+		"pages": pages,
+		"blocks_per_page": blocks,
+		"seed": seed,
+		"counters": counters,
+		"stages": {stage: {"seconds": seconds, "us_per_page": seconds / pages * 1e6}
+			for stage, seconds in timings.items()},
+		"build": build,
+		"cold_start": time_cold_start(cold_start_runs),
+	}
+
+
+def compare(result, baseline, threshold = 0.1):
+	# Stages (and the cold start) that got slower than the baseline by more than threshold (a fraction)
+	regressions = {}
+
+	for stage, timing in result["stages"].items():
+		if not (before := baseline.get("stages", {}).get(stage)) or not before["us_per_page"]:
+			continue
+
+		change = timing["us_per_page"] / before["us_per_page"] - 1
+		if change > threshold:
+			regressions[stage] = change
+
+	if (before := baseline.get("cold_start")) and result.get("cold_start"):
+		change = result["cold_start"]["seconds"] / before["seconds"] - 1
+		if change > threshold:
+			regressions["cold_start"] = change
+
+	return regressions
+
+
+def main(argv = None):
+	parser = argparse.ArgumentParser(description="Benchmark the markdown pipeline on a synthetic content tree")
+	parser.add_argument("--size", choices=SIZES, default="small", help="preset corpus size")
+	parser.add_argument("--pages", type=int, help="page count, overrides --size")
+	parser.add_argument("--blocks", type=int, default=20, help="blocks per page")
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("-j", "--jobs", type=int, default=1, help="worker processes for the full build timing")
+	parser.add_argument("--mix", type=mix_argument(DEFAULT_MIX),
+		help='block weights as JSON, e.g. \'{"paragraph": 1, "code": 1}\'')
+	parser.add_argument("--inline-mix", type=mix_argument(INLINE_MIX, 1),
+		help='chance a sentence carries each inline construct, as JSON, e.g. \'{"link": 0.5, "image": 0.2}\'')
+	parser.add_argument("--output", help="write the JSON result here instead of stdout")
+	parser.add_argument("--compare", help="baseline JSON result to check for regressions")
+	parser.add_argument("--threshold", type=float, default=0.1, help="allowed slowdown per stage, as a fraction")
+	args = parser.parse_args(argv)
+
+	result = run_bench(args.pages or SIZES[args.size], args.blocks, args.seed, args.jobs, args.mix, args.inline_mix)
+	text = json.dumps(result, indent=2)
+
+	if args.output:
+		with open(args.output, "w", encoding="utf-8") as file:
+			file.write(text + "\n")
+	else:
+		print(text)
+
+	cold_start = result["cold_start"]
+	if not cold_start["within_target"]:
+		print(f"cold start took {cold_start['seconds']:.3f}s, over the {COLD_START_TARGET}s target", file=sys.stderr)
+
+	if args.compare:
+		with open(args.compare, "r", encoding="utf-8") as file:
+			regressions = compare(result, json.load(file), args.threshold)
+
+		for stage, change in regressions.items():
+			print(f"{stage} is {change:.0%} slower than {args.compare}", file=sys.stderr)
+
+		if regressions:
+			return 1
+
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,137 @@
+import hashlib, json, os, sqlite3, time
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Eviction trims down to this share of the limit so it doesn't run on every flush
+EVICT_TO = 0.9
+# Pending writes are flushed once this many pile up
+FLUSH_EVERY = 1000
+# Bump when the blocks table changes shape
+SCHEMA_VERSION = 3
+
+# The cache rendering consults, None when caching is off
+_cache = None
+# path -> BlockCache opened by this process
+_open_caches = {}
+
+
+class BlockCache():
+	def __init__(self, path, version, max_bytes = DEFAULT_MAX_BYTES):
+		self.path = path
+		self.version = f"{SCHEMA_VERSION}.{version}"
+		self.max_bytes = max_bytes
+		self.pid = os.getpid()
+		self.hits = 0
+		self.misses = 0
+		self.pending = []
+		self.used = set()
+
+		os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+		# The async build renders on an executor thread; only one thread uses the cache at a time
+		self.connection = sqlite3.connect(path, timeout = 60, isolation_level = None, check_same_thread = False)
+		self.connection.execute("PRAGMA journal_mode=WAL")
+		self.connection.execute("PRAGMA synchronous=NORMAL")
+		self.connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+		with self.connection:
+			# Everything rendered by another renderer or cache version is stale, and its table may have an older layout
+			self.connection.execute("BEGIN IMMEDIATE")
+			row = self.connection.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+			if not row or row[0] != self.version:
+				self.connection.execute("DROP TABLE IF EXISTS blocks")
+
+			self.connection.execute("CREATE TABLE IF NOT EXISTS blocks "
+				"(key BLOB PRIMARY KEY, html TEXT NOT NULL, text TEXT NOT NULL, targets TEXT NOT NULL, size INTEGER NOT NULL, "
+				"used INTEGER NOT NULL)")
+			self.connection.execute("CREATE INDEX IF NOT EXISTS blocks_used ON blocks (used)")
+			self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (self.version,))
+
+	def __repr__(self):
+		return f"BlockCache({self.path}, {self.hits} hits, {self.misses} misses)"
+
+	def key(self, block):
+		return hashlib.blake2b(f"{self.version}\0{block}".encode(), digest_size = 16).digest()
+
+	def get(self, block):
+		# (html, plain text, link and image targets) of the block, the text feeds the search
+		# index and the targets the link index
+		key = self.key(block)
+		row = self.connection.execute("SELECT html, text, targets FROM blocks WHERE key = ?", (key,)).fetchone()
+
+		if row:
+			self.hits += 1
+			self.used.add(key)
+			html, text, targets = row
+			return html, text, tuple(map(tuple, json.loads(targets))) if targets else ()
+
+		self.misses += 1
+		return None
+
+	def put(self, block, html, text = "", targets = ()):
+		targets = json.dumps(targets, separators=(",", ":")) if targets else ""
+		self.pending.append((self.key(block), html, text, targets, len(html) + len(text) + len(targets), time.time_ns()))
+
+		if len(self.pending) >= FLUSH_EVERY:
+			self.flush()
+
+	def flush(self):
+		now = time.time_ns()
+
+		with self.connection:
+			self.connection.execute("BEGIN IMMEDIATE")
+			self.connection.executemany("INSERT OR REPLACE INTO blocks VALUES (?, ?, ?, ?, ?, ?)", self.pending)
+			self.connection.executemany("UPDATE blocks SET used = ? WHERE key = ?", ((now, key) for key in self.used))
+
+		self.pending = []
+		self.used = set()
+		self.evict()
+
+	def size(self):
+		return self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM blocks").fetchone()[0]
+
+	def evict(self):
+		# Least recently used blocks go first
+		excess = self.size() - self.max_bytes
+		if excess <= 0:
+			return
+
+		excess += int(self.max_bytes * (1 - EVICT_TO))
+		keys = []
+
+		for key, size in self.connection.execute("SELECT key, size FROM blocks ORDER BY used"):
+			keys.append((key,))
+			excess -= size
+			if excess <= 0:
+				break
+
+		with self.connection:
+			self.connection.execute("BEGIN IMMEDIATE")
+			self.connection.executemany("DELETE FROM blocks WHERE key = ?", keys)
+
+	def clear(self):
+		with self.connection:
+			self.connection.execute("BEGIN IMMEDIATE")
+			self.connection.execute("DELETE FROM blocks")
+			self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (self.version,))
+
+	def close(self):
+		self.flush()
+		self.connection.close()
+
+
+def get_block_cache():
+	return _cache
+
+
+def set_block_cache(cache):
+	global _cache
+	_cache = cache
+
+
+def open_block_cache(path, version, max_bytes = DEFAULT_MAX_BYTES):
+	# One connection per process and path; one inherited through fork is never reused
+	cache = _open_caches.get(path)
+
+	if cache is None or cache.pid != os.getpid() or cache.version != f"{SCHEMA_VERSION}.{version}":
+		cache = _open_caches[path] = BlockCache(path, version, max_bytes)
+
+	return cache
@@ -0,0 +1,546 @@
+from assets import SyncReport, list_static, remove_output, sync_file, sync_static
+from manifest import Manifest, hash_file, load_build_manifest, manifest_path, save_manifest, source_entry
+from template import TEMPLATE_NAME, find_template
+from profiler import Profiler, get_profiler, set_profiler
+from textnode import RENDERER_VERSION, generate_page, inline_fragment, page_metadata
+from contextlib import contextmanager
+import os
+
+# Upper bound on pages per task so a slow chunk can't stall the whole pool
+MAX_CHUNK_SIZE = 256
+# Chunks handed to each worker; more than one lets fast workers pick up slack
+CHUNKS_PER_JOB = 4
+
+
+class BuildReport():
+	def __init__(self):
+		self.rendered = []
+		self.removed = []
+		self.skipped = 0
+		# Rendered pages that changed on disk, the rest came out byte-identical
+		self.written = []
+		self.unchanged = 0
+		self.assets = SyncReport()
+		# CompressReport of the compress stage, None when it didn't run
+		self.compressed = None
+		# Search index shards, and sitemap, feed or section index pages, that changed on disk
+		self.search_shards = []
+		self.aggregates = []
+		# (source, kind, url) of every internal link or image whose target doesn't exist, site-wide
+		self.broken_links = []
+		# ImageReport of the image stage, None when it didn't run
+		self.images = None
+
+	def __repr__(self):
+		return (f"BuildReport({len(self.rendered)} rendered ({len(self.written)} written, {self.unchanged} unchanged), "
+			f"{self.skipped} skipped, {len(self.removed)} removed, {self.assets}, {self.compressed})")
+
+
+class BuildError(Exception):
+	def __init__(self, errors):
+		self.errors = errors
+		super().__init__(f"{len(errors)} of the pages failed to build")
+
+	def __str__(self):
+		lines = [super().__str__()]
+		lines.extend(f"  {source}: {message}" for source, message in self.errors)
+		return "\n".join(lines)
+
+
+def output_path(relative_path):
+	return os.path.splitext(relative_path)[0] + ".html"
+
+
+def collect_pages(dir_path_content):
+	# scandir gets file types from the directory listing itself, no stat per entry
+	pages = []
+	directories = [dir_path_content]
+
+	while directories:
+		try:
+			entries = os.scandir(directories.pop())
+		except OSError:
+			continue
+
+		with entries:
+			for entry in entries:
+				if entry.is_dir(follow_symlinks=False):
+					directories.append(entry.path)
+				elif entry.name.endswith(".md"):
+					pages.append(os.path.relpath(entry.path, dir_path_content))
+
+	return sorted(pages)
+
+
+@contextmanager
+def rendering(cache_path = None):
+	# Block cache and memo bookkeeping around one chunk of pages
+	# blockcache and sqlite3 are only loaded when there's a cache to open
+	cache = None
+	if cache_path:
+		from blockcache import open_block_cache, set_block_cache
+		cache = open_block_cache(cache_path, RENDERER_VERSION)
+		set_block_cache(cache)
+	profiler = get_profiler()
+	memo = inline_fragment.stats()
+
+	try:
+		yield
+	finally:
+		if profiler.enabled:
+			stats = inline_fragment.stats()
+			profiler.count("inline_memo_hits", stats["hits"] - memo["hits"])
+			profiler.count("inline_memo_misses", stats["misses"] - memo["misses"])
+
+		if cache:
+			set_block_cache(None)
+			cache.flush()
+
+
+def read_metadata(path, entry, old_entry = None):
+	# The site-wide metadata store is the manifest: unchanged sources keep what the
+	# last scan found, changed ones have only their header read
+	if old_entry and old_entry["hash"] == entry["hash"] and "meta" in old_entry:
+		return old_entry["meta"]
+
+	try:
+		with open(path, "r", encoding="utf-8") as file:
+			return page_metadata(file)
+	except (OSError, UnicodeDecodeError):
+		# Rendering reports the page as failed
+		return {}
+
+
+def render_chunk(chunk, cache_path = None, index = False, links = False, sizes = None):
+	# With index, each output also carries the page's search postings, with links or sizes (image
+	# path -> [width, height] to put on <img> tags) its link and image targets
+	errors = []
+	outputs = []
+
+	if index:
+		from search import page_postings
+	if sizes is not None:
+		from images import size_lookup
+
+	with rendering(cache_path):
+		for source, from_path, template_path, dest_path in chunk:
+			try:
+				texts = [] if index else None
+				targets = [] if links or sizes is not None else None
+				image_size = size_lookup(sizes, output_path(source)) if sizes is not None else None
+				file = generate_page(from_path, template_path, dest_path, texts = texts, targets = targets,
+					image_size = image_size)
+
+				outputs.append((source, file.hash, file.written, page_postings(texts) if index else None, targets))
+			except Exception as e:
+				errors.append((source, f"{type(e).__name__}: {e}"))
+
+	return errors, outputs
+
+
+def run_profiled(function, profile, *args):
+	# Runs in a worker: records into a fresh profiler whose data rides back with the result
+	if not profile:
+		return function(*args), None
+
+	profiler = Profiler()
+	set_profiler(profiler)
+	try:
+		return function(*args), profiler.to_dict()
+	finally:
+		set_profiler(None)
+
+
+def render_worker_chunk(chunk, profile, cache_path, index, links, sizes):
+	return run_profiled(render_chunk, profile, chunk, cache_path, index, links, sizes)
+
+
+def chunk_pages(tasks, jobs):
+	size = -(-len(tasks) // (jobs * CHUNKS_PER_JOB))
+	size = max(1, min(size, MAX_CHUNK_SIZE))
+
+	return [tasks[i:i + size] for i in range(0, len(tasks), size)]
+
+
+def render_pages(tasks, jobs = 1, cache_path = None, index = False, links = False, sizes = None):
+	if jobs <= 1 or len(tasks) < 2:
+		return render_chunk(tasks, cache_path, index, links, sizes)
+
+	from concurrent.futures import ProcessPoolExecutor
+
+	errors = []
+	outputs = []
+	chunks = chunk_pages(tasks, jobs)
+	profiler = get_profiler()
+
+	# Workers write their own outputs, only errors, output hashes (and profiles) travel back over IPC
+	with ProcessPoolExecutor(max_workers = min(jobs, len(chunks))) as executor:
+		for (chunk_errors, chunk_outputs), profile in executor.map(render_worker_chunk, chunks,
+				[profiler.enabled] * len(chunks), [cache_path] * len(chunks), [index] * len(chunks), [links] * len(chunks),
+				[sizes] * len(chunks)):
+			errors.extend(chunk_errors)
+			outputs.extend(chunk_outputs)
+			if profile:
+				profiler.merge(profile)
+
+	return errors, outputs
+
+
+def build_site(dir_path_content, template_path, dest_dir_path, incremental = False, jobs = 1,
+		dir_path_static = None, link_assets = False, checksum_assets = False, cache_path = None, async_io = False,
+		compress = False, search = False, feeds = False, base_url = "", check_links = False, images = False,
+		image_cache = None, shard = None):
+	# The previous manifest is always read so stale outputs get removed,
+	# a full build only ignores it when deciding what to re-render
+	previous = load_build_manifest(dest_dir_path)
+	if compress:
+		from compress import available_encodings
+
+	current = Manifest(compression = available_encodings() if compress else [], search = search, links = check_links,
+		renderer = RENDERER_VERSION)
+	report = BuildReport()
+	template_path = os.path.normpath(template_path)
+	profiler = get_profiler()
+
+	# A shard, (index, count, "directory" or "hash"), builds only its share of the pages into its own
+	# dest_dir_path; the sitemap and feeds cover the whole site, so merging the shards writes them
+	if shard is not None:
+		from shards import in_shard
+		feeds = False
+
+	# Section index pages use the default template
+	if feeds:
+		current.aggregates = {"base_url": base_url, "template": template_path}
+		if previous.aggregates:
+			current.aggregates["digest"] = previous.aggregates.get("digest")
+			current.aggregates["outputs"] = previous.aggregates.get("outputs", [])
+
+	# The block cache is keyed on the renderer version, pages rendered by another one have to go too
+	if previous.renderer != RENDERER_VERSION:
+		incremental = False
+	# Pages skipped by earlier builds were never indexed, turning search on renders them all
+	if search and not previous.search:
+		incremental = False
+	# Same for the link check, skipped pages never recorded their targets
+	if check_links and not previous.links:
+		incremental = False
+	if images:
+		current.images = {"cache": image_cache, "variants": previous.images.get("variants", {}) if previous.images else {}}
+	# Dimensions are part of the markup, turning them on or off renders every page
+	if images != (previous.images is not None):
+		incremental = False
+
+	with profiler.stage("scan"):
+		# Per-directory template overrides, resolved once per directory
+		directory_templates = {}
+
+		for source in collect_pages(dir_path_content):
+			if shard is not None and not in_shard(source, shard):
+				continue
+
+			directory = os.path.dirname(source)
+			if directory not in directory_templates:
+				directory_templates[directory] = find_template(directory, dir_path_content, template_path)
+			page_template = directory_templates[directory]
+
+			if page_template not in current.templates:
+				current.templates[page_template] = hash_file(page_template)
+
+			old_entry = previous.pages.get(source)
+			entry = source_entry(os.path.join(dir_path_content, source), old_entry)
+			entry["output"] = output_path(source)
+			entry["template"] = page_template
+			entry["meta"] = read_metadata(os.path.join(dir_path_content, source), entry, old_entry)
+			current.pages[source] = entry
+
+			if (not incremental or not old_entry or old_entry["hash"] != entry["hash"]
+					or old_entry.get("template") != page_template
+					or previous.templates.get(page_template) != current.templates[page_template]
+					or not os.path.exists(os.path.join(dest_dir_path, entry["output"]))):
+				report.rendered.append(source)
+			else:
+				if "output_hash" in old_entry:
+					entry["output_hash"] = old_entry["output_hash"]
+				if check_links:
+					entry["links"] = old_entry.get("links", [])
+				if images:
+					entry["images"] = old_entry.get("images", {})
+				report.skipped += 1
+
+	with profiler.stage("remove"):
+		outputs = current.outputs()
+		for source, entry in previous.pages.items():
+			if source not in current.pages and entry["output"] not in outputs:
+				remove_output(dest_dir_path, entry["output"])
+				report.removed.append(source)
+
+		if previous.aggregates and not feeds:
+			from aggregates import remove_aggregates
+			remove_aggregates(dest_dir_path, previous.aggregates)
+		if previous.search and not search:
+			from search import remove_search_index
+			remove_search_index(dest_dir_path)
+
+	# Only the first shard copies static/, merging takes every asset from it; the others list it
+	# so their pages still get image dimensions
+	copy_static = shard is None or shard[0] == 0
+	if dir_path_static:
+		with profiler.stage("assets"):
+			if copy_static:
+				current.assets, report.assets = sync_static(dir_path_static, dest_dir_path, previous.assets,
+					keep = outputs, link = link_assets, checksum = checksum_assets)
+			else:
+				current.assets, report.assets = list_static(dir_path_static, dest_dir_path, previous.assets, keep = outputs)
+
+	if images:
+		from images import image_sizes, stale_pages
+
+		image_stage(current, previous.assets, report, dest_dir_path, jobs,
+			static_dir = None if copy_static else dir_path_static)
+
+		# Pages showing an image whose dimensions or variants changed are rendered again
+		sizes = image_sizes(current.assets, current.images["variants"])
+		rendered = set(report.rendered)
+		for source in sorted(stale_pages(current.pages, sizes) - rendered):
+			report.rendered.append(source)
+			report.skipped -= 1
+	elif previous.images:
+		from images import remove_variants
+		remove_variants(dest_dir_path, previous.images.get("variants", {}), keep = outputs | current.assets.keys())
+
+	return finish_build(current, report, dir_path_content, dest_dir_path, jobs, cache_path, async_io,
+		recompress = current.compression != previous.compression)
+
+
+def image_stage(manifest, previous_assets, report, dest_dir_path, jobs = 1, static_dir = None):
+	# Reads the dimensions of new or changed images from their headers; with a cache directory
+	# and Pillow installed, also keeps their resized WebP variants up to date. With static_dir
+	# the images weren't copied and are read there, their variants are only planned: the shard
+	# that has the images writes them, pages here just refer to them
+	from images import Image, ImageReport, measure_images, remove_variants, variant_plans, write_variants
+
+	settings = manifest.images
+	variants = bool(settings.get("cache")) and Image is not None
+	report.images = ImageReport()
+
+	with get_profiler().stage("images"):
+		measure_images(manifest.assets, previous_assets, static_dir or dest_dir_path, report.images,
+			digests = variants and static_dir is None)
+
+		keep = manifest.outputs() | manifest.assets.keys()
+		if variants and static_dir is None:
+			settings["variants"] = write_variants(dest_dir_path, manifest.assets, settings["cache"],
+				settings.get("variants", {}), report.images, jobs, keep)
+		else:
+			remove_variants(dest_dir_path, settings.get("variants", {}), keep)
+			settings["variants"] = {}
+			if variants:
+				settings["variants"] = {relative_path: [path for path, width in plan]
+					for relative_path, plan in variant_plans(manifest.assets, keep).items()}
+
+
+def compress_stage(manifest, report, dest_dir_path, recompress = False):
+	# Only outputs written or copied by this build get (re)compressed, unless the set
+	# of encodings changed, in which case every output's siblings are redone or removed
+	if not manifest.compression and not recompress:
+		return
+
+	from compress import compress_outputs, remove_compressed
+
+	if recompress:
+		# A shard that only listed static/ has none of the assets to compress
+		paths = sorted(manifest.outputs()) + sorted(path for path in manifest.assets
+			if os.path.isfile(os.path.join(dest_dir_path, path)))
+		if manifest.aggregates:
+			paths += manifest.aggregates.get("outputs", [])
+	else:
+		paths = [manifest.pages[source]["output"] for source in report.written] + report.assets.copied + report.aggregates
+
+	with get_profiler().stage("compress"):
+		if manifest.compression:
+			report.compressed = compress_outputs(dest_dir_path, paths, manifest.compression)
+		elif recompress:
+			for path in paths:
+				remove_compressed(os.path.join(dest_dir_path, path))
+
+
+def search_stage(manifest, report, outputs, errors, dest_dir_path):
+	if not manifest.search:
+		return
+
+	from search import SearchIndex, page_url
+
+	with get_profiler().stage("search"):
+		index = SearchIndex(dest_dir_path)
+
+		for source in report.removed:
+			index.remove(source)
+		for source, message in errors:
+			index.remove(source)
+		for source, digest, written, postings, targets in outputs:
+			entry = manifest.pages[source]
+			index.add(source, page_url(entry["output"]), entry["meta"].get("title", ""), postings)
+
+		report.search_shards = index.save()
+
+
+def link_stage(manifest, report):
+	# Only pages rendered by this build resolved their targets again, the rest come
+	# from the manifest; each target is then one set lookup
+	if not manifest.links:
+		return
+
+	from links import LinkIndex, site_paths
+
+	with get_profiler().stage("links"):
+		report.broken_links = LinkIndex(manifest.pages).broken(site_paths(manifest))
+
+
+def finish_build(manifest, report, dir_path_content, dest_dir_path, jobs, cache_path = None, async_io = False,
+		recompress = False, save = True):
+	tasks = [
+		(source,
+		os.path.join(dir_path_content, source),
+		manifest.pages[source]["template"],
+		os.path.join(dest_dir_path, manifest.pages[source]["output"]))
+		for source in report.rendered]
+
+	profiler = get_profiler()
+	sizes = None
+	if manifest.images is not None:
+		from images import image_sizes, page_images
+		sizes = image_sizes(manifest.assets, manifest.images.get("variants"))
+
+	with profiler.stage("render"):
+		if async_io:
+			from asyncbuild import render_pages_async
+			errors, outputs = render_pages_async(tasks, jobs, cache_path, manifest.search, manifest.links, sizes)
+		else:
+			errors, outputs = render_pages(tasks, jobs, cache_path, manifest.search, manifest.links, sizes)
+
+	if manifest.links:
+		from links import page_links
+
+	# Output hashes identify what's on disk without reading it back
+	for source, digest, written, postings, targets in outputs:
+		entry = manifest.pages[source]
+		entry["output_hash"] = digest
+		if manifest.links:
+			entry["links"] = page_links(entry["output"], targets)
+		if sizes is not None:
+			entry["images"] = page_images(entry["output"], targets, sizes)
+		if written:
+			report.written.append(source)
+		else:
+			report.unchanged += 1
+
+	# Failed pages are left out of the manifest so the next build retries them
+	for source, message in errors:
+		del manifest.pages[source]
+
+	search_stage(manifest, report, outputs, errors, dest_dir_path)
+
+	if manifest.aggregates:
+		from aggregates import update_aggregates
+
+		with profiler.stage("aggregates"):
+			report.aggregates = update_aggregates(dest_dir_path, manifest)
+
+	link_stage(manifest, report)
+	compress_stage(manifest, report, dest_dir_path, recompress)
+
+	# Watch mode saves it itself, after browsers were told to reload
+	if save:
+		with profiler.stage("manifest"):
+			save_manifest(manifest, manifest_path(dest_dir_path))
+
+	if errors:
+		raise BuildError(errors)
+
+	return report
+
+
+def rebuild_paths(manifest, paths, dir_path_content, template_path, dest_dir_path, jobs = 1, dir_path_static = None,
+		cache_path = None, save = True):
+	# Targeted rebuild for watch mode: the manifest's source -> output and
+	# source -> template edges say exactly which pages a changed file affects
+	report = BuildReport()
+	template_path = os.path.normpath(template_path)
+	sources = set()
+
+	for path in map(os.path.normpath, paths):
+		in_content = not os.path.relpath(path, dir_path_content).startswith(os.pardir)
+		relative_path = os.path.relpath(path, dir_path_content)
+
+		if path == template_path or (in_content and os.path.basename(path) == TEMPLATE_NAME):
+			if path != template_path:
+				# An override appearing or disappearing changes which template its whole subtree uses
+				directory = os.path.dirname(relative_path)
+				sources.update(source for source in manifest.pages
+					if not directory or source.startswith(directory + os.sep))
+
+			manifest.templates.pop(path, None)
+			sources.update(manifest.dependents(path))
+
+		elif in_content and path.endswith(".md"):
+			sources.add(relative_path)
+
+		elif in_content and not os.path.exists(path):
+			# A moved or deleted directory takes every page under it along
+			sources.update(source for source in manifest.pages if source.startswith(relative_path + os.sep))
+
+		elif dir_path_static and not os.path.relpath(path, dir_path_static).startswith(os.pardir):
+			asset = os.path.relpath(path, dir_path_static)
+
+			if os.path.isfile(path):
+				manifest.assets[asset] = sync_file(asset, dir_path_static, dest_dir_path,
+					manifest.assets.get(asset), report.assets)
+				continue
+
+			for removed in [asset] + [name for name in manifest.assets if name.startswith(asset + os.sep)]:
+				if manifest.assets.pop(removed, None) is not None:
+					remove_output(dest_dir_path, removed)
+					report.assets.removed.append(removed)
+
+	# Entries of unchanged images still carry their dimensions, only the synced ones are read
+	if manifest.images is not None and (report.assets.copied or report.assets.removed):
+		from images import image_sizes, stale_pages
+
+		image_stage(manifest, {}, report, dest_dir_path, jobs)
+		sources.update(stale_pages(manifest.pages, image_sizes(manifest.assets, manifest.images.get("variants"))))
+
+	for source in sorted(sources):
+		from_path = os.path.join(dir_path_content, source)
+
+		if not os.path.isfile(from_path):
+			if entry := manifest.pages.pop(source, None):
+				remove_output(dest_dir_path, entry["output"])
+				report.removed.append(source)
+			continue
+
+		page_template = find_template(os.path.dirname(source), dir_path_content, template_path)
+		if page_template not in manifest.templates:
+			manifest.templates[page_template] = hash_file(page_template)
+
+		old_entry = manifest.pages.get(source)
+		entry = source_entry(from_path, old_entry)
+		entry["output"] = output_path(source)
+		entry["template"] = page_template
+		entry["meta"] = read_metadata(from_path, entry, old_entry)
+		manifest.pages[source] = entry
+		report.rendered.append(source)
+
+	if not sources:
+		if report.assets.copied or report.assets.removed:
+			compress_stage(manifest, report, dest_dir_path)
+			if save:
+				save_manifest(manifest, manifest_path(dest_dir_path))
+		return report
+
+	# Templates no page uses any more are dropped so a later re-add is seen as a change
+	used = {entry["template"] for entry in manifest.pages.values()}
+	for path in list(manifest.templates):
+		if path not in used:
+			del manifest.templates[path]
+
+	return finish_build(manifest, report, dir_path_content, dest_dir_path, jobs, cache_path, save = save)
@@ -0,0 +1,116 @@
+from concurrent.futures import ThreadPoolExecutor
+import gzip, os
+
+try:
+	import brotli
+except ImportError:
+	brotli = None
+
+try:
+	import zstandard
+except ImportError:
+	zstandard = None
+
+# Outputs worth precompressing, everything else (images, fonts) is already compressed
+COMPRESSIBLE = (".html", ".css", ".js", ".svg", ".xml")
+# Below this the encoding overhead eats most of the gain
+MIN_SIZE = 1024
+SUFFIXES = (".gz", ".br", ".zst")
+
+
+class CompressReport():
+	def __init__(self):
+		self.compressed = []
+		self.bytes_in = 0
+		# suffix -> total compressed size
+		self.bytes_out = {}
+
+	def __repr__(self):
+		return f"CompressReport({len(self.compressed)} compressed, {self.bytes_in} bytes -> {self.bytes_out})"
+
+
+def encode(data, suffix):
+	# Slow, high levels are fine here: each file is compressed once per change
+	match suffix:
+		case ".gz":
+			# mtime 0 keeps the output byte-identical across builds
+			return gzip.compress(data, compresslevel = 9, mtime = 0)
+		case ".br":
+			return brotli.compress(data, quality = 11)
+		case ".zst":
+			return zstandard.ZstdCompressor(level = 19).compress(data)
+
+
+def available_encodings():
+	encodings = [".gz"]
+
+	if brotli is not None:
+		encodings.append(".br")
+	if zstandard is not None:
+		encodings.append(".zst")
+
+	return encodings
+
+
+def remove_compressed(path):
+	removed = 0
+
+	for suffix in SUFFIXES:
+		if os.path.isfile(path + suffix):
+			os.unlink(path + suffix)
+			removed += 1
+
+	return removed
+
+
+def compress_file(path, encodings, min_size = MIN_SIZE):
+	# Returns (original size, compressed sizes), or None when the file is too small to bother
+	with open(path, "rb") as file:
+		data = file.read()
+
+	if len(data) < min_size:
+		remove_compressed(path)
+		return None
+
+	stat = os.stat(path)
+	sizes = {}
+
+	for suffix in encodings:
+		compressed = encode(data, suffix)
+		sibling = path + suffix
+
+		# A sibling that isn't smaller would only cost the server a pointless lookup
+		if len(compressed) >= len(data):
+			if os.path.isfile(sibling):
+				os.unlink(sibling)
+			continue
+
+		with open(sibling + ".tmp", "wb") as file:
+			file.write(compressed)
+		os.utime(sibling + ".tmp", ns = (stat.st_atime_ns, stat.st_mtime_ns))
+		os.replace(sibling + ".tmp", sibling)
+		sizes[suffix] = len(compressed)
+
+	return len(data), sizes
+
+
+def compress_outputs(dest_dir_path, relative_paths, encodings, min_size = MIN_SIZE):
+	report = CompressReport()
+	relative_paths = [path for path in relative_paths if path.endswith(COMPRESSIBLE)]
+
+	# zlib, brotli and zstd all release the GIL while compressing, so threads run in parallel
+	with ThreadPoolExecutor() as executor:
+		results = executor.map(compress_file, [os.path.join(dest_dir_path, path) for path in relative_paths],
+			[encodings] * len(relative_paths), [min_size] * len(relative_paths))
+
+		for relative_path, result in zip(relative_paths, results):
+			if result is None:
+				continue
+
+			size, sizes = result
+			report.compressed.append(relative_path)
+			report.bytes_in += size
+			for suffix, compressed in sizes.items():
+				report.bytes_out[suffix] = report.bytes_out.get(suffix, 0) + compressed
+
+	return report
@@ -0,0 +1,319 @@
+from compress import COMPRESSIBLE
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from functools import partial
+from manifest import LEGACY_MANIFEST_NAME, load_manifest, manifest_path
+from search import LEGACY_STATE_NAME
+from urllib.parse import unquote, urlsplit
+import os, posixpath, re, threading
+
+RELOAD_PATH = "/__livereload"
+RELOAD_SCRIPT = f"""<script>new EventSource("{RELOAD_PATH}").onmessage = () => location.reload();</script>""".encode()
+KEEPALIVE_SECONDS = 15
+# Precompressed siblings the build writes, smallest first, and the content coding each one is
+ENCODINGS = ((".br", "br"), (".zst", "zstd"), (".gz", "gzip"))
+# Browsers revalidate every time, which costs a 304 and no body when nothing changed
+CACHE_CONTROL = "no-cache"
+RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+class LiveReload():
+	def __init__(self):
+		self.version = 0
+		self.condition = threading.Condition()
+
+	def notify(self):
+		with self.condition:
+			self.version += 1
+			self.condition.notify_all()
+
+	def wait(self, version, timeout):
+		with self.condition:
+			self.condition.wait_for(lambda: self.version != version, timeout)
+			return self.version
+
+
+class ETags():
+	def __init__(self, directory):
+		self.path = manifest_path(directory)
+		self.mtime = None
+		# output path -> content hash the build recorded
+		self.hashes = {}
+		self.lock = threading.Lock()
+
+	def reload(self):
+		# Picks up the manifest a rebuild (or merge) wrote, it's only parsed again when it changed
+		try:
+			mtime = os.stat(self.path).st_mtime_ns
+		except OSError:
+			mtime = None
+
+		with self.lock:
+			if mtime != self.mtime:
+				manifest = load_manifest(self.path)
+				hashes = {entry["output"]: entry["output_hash"] for entry in manifest.pages.values() if entry.get("output_hash")}
+				hashes.update((asset, entry["hash"]) for asset, entry in manifest.assets.items() if entry.get("hash"))
+				self.hashes, self.mtime = hashes, mtime
+
+	def get(self, relative_path, stat):
+		# Pages and checksummed assets were hashed by the build, nothing is read here; anything
+		# else (feeds, search shards, variants, assets synced by size and mtime) goes by its stat
+		self.reload()
+
+		# A file written after the manifest was saved (watch mode saves it once browsers are
+		# reloading) is newer than its recorded hash
+		if (digest := self.hashes.get(relative_path)) and stat.st_mtime_ns <= self.mtime:
+			return f'"{digest[:32]}"'
+		return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+class FileSlice():
+	def __init__(self, file, offset, length):
+		self.file = file
+		self.offset = offset
+		self.length = length
+
+	def close(self):
+		self.file.close()
+
+
+def accepted_encodings(header):
+	# Content codings the client takes; "*" stands for any it didn't name, q=0 refuses one
+	accepted = {}
+
+	for item in header.split(","):
+		coding, *params = [part.strip() for part in item.split(";")]
+		quality = 1.0
+		for param in params:
+			name, _, value = param.partition("=")
+			if name.strip().lower() == "q":
+				try:
+					quality = float(value)
+				except ValueError:
+					quality = 0.0
+		if coding:
+			accepted[coding.lower()] = quality
+
+	return {coding for suffix, coding in ENCODINGS if accepted.get(coding, accepted.get("*", 0)) > 0}
+
+
+def byte_range(header, size):
+	# (first, last) byte of a single "bytes=" range; None serves the whole file (several ranges or
+	# a malformed header are ignored, as RFC 9110 allows) and False means nothing of it is in range
+	match = RANGE_PATTERN.fullmatch(header.strip())
+	if not match or match.groups() == ("", ""):
+		return None
+
+	first, last = match.groups()
+	if not first:
+		if int(last) == 0 or size == 0:
+			return False
+		return max(0, size - int(last)), size - 1
+
+	if last and int(last) < int(first):
+		return None
+	if int(first) >= size:
+		return False
+
+	return int(first), min(int(last), size - 1) if last else size - 1
+
+
+def is_internal(url):
+	# Files mid-write end in .tmp, and builds from before the manifest and search state moved
+	# to .cache/ left them in the output directory; none of it is part of the site
+	path = posixpath.normpath(unquote(urlsplit(url).path)).lstrip("/")
+	return path.endswith(".tmp") or path in (LEGACY_MANIFEST_NAME, LEGACY_STATE_NAME)
+
+
+def etag_matches(header, etag):
+	# If-None-Match compares weakly, W/ tags match their strong form
+	return any(tag.strip() in ("*", etag, "W/" + etag) for tag in header.split(","))
+
+
+class DevRequestHandler(SimpleHTTPRequestHandler):
+	# Keep-alive, a page and its assets come over one connection
+	protocol_version = "HTTP/1.1"
+
+	def __init__(self, *args, live_reload = None, etags = None, **kwargs):
+		self.live_reload = live_reload
+		self.etags = etags
+		super().__init__(*args, **kwargs)
+
+	def log_message(self, format, *args):
+		pass
+
+	def do_GET(self):
+		if self.live_reload and self.path == RELOAD_PATH:
+			return self.send_events()
+		if is_internal(self.path):
+			return self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+
+		path = self.translate_path(self.path)
+		if os.path.isdir(path):
+			path = os.path.join(path, "index.html")
+
+		if self.live_reload and path.endswith(".html") and os.path.isfile(path):
+			return self.send_html(path)
+
+		return super().do_GET()
+
+	def send_head(self):
+		# Directory redirects and listings and missing files are left to SimpleHTTPRequestHandler
+		if is_internal(self.path):
+			self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+			return None
+
+		path = self.translate_path(self.path)
+		if os.path.isdir(path) and urlsplit(self.path).path.endswith("/"):
+			path = os.path.join(path, "index.html")
+
+		if not os.path.isfile(path):
+			return super().send_head()
+
+		return self.send_file(path)
+
+	def pick_encoding(self, path, stat):
+		# The smallest precompressed sibling the client accepts, unless a rebuild left it older than the file
+		accepted = accepted_encodings(self.headers.get("Accept-Encoding", ""))
+
+		for suffix, coding in ENCODINGS:
+			if coding in accepted:
+				try:
+					sibling = os.stat(path + suffix)
+				except OSError:
+					continue
+				if sibling.st_mtime_ns >= stat.st_mtime_ns:
+					return suffix, coding
+
+		return None
+
+	def send_file(self, path):
+		try:
+			stat = os.stat(path)
+		except OSError:
+			self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+			return None
+
+		relative_path = os.path.relpath(path, self.directory)
+		etag = self.etags.get(relative_path, stat) if self.etags else f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+		headers = [("Cache-Control", CACHE_CONTROL)]
+
+		content_type = self.guess_type(path)
+		if path.endswith(COMPRESSIBLE):
+			headers.append(("Vary", "Accept-Encoding"))
+			if encoding := self.pick_encoding(path, stat):
+				suffix, coding = encoding
+				path += suffix
+				# Each encoding is its own representation and needs its own tag
+				etag = f'{etag[:-1]}-{coding}"'
+				headers.append(("Content-Encoding", coding))
+		headers.append(("ETag", etag))
+
+		if etag_matches(self.headers.get("If-None-Match", ""), etag):
+			self.send_response(HTTPStatus.NOT_MODIFIED)
+			for name, value in headers:
+				self.send_header(name, value)
+			self.end_headers()
+			return None
+
+		try:
+			file = open(path, "rb")
+		except OSError:
+			self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+			return None
+
+		size = os.fstat(file.fileno()).st_size
+		span = None
+		# If-Range only lets a range through when the client still has this representation
+		if "Range" in self.headers and self.headers.get("If-Range", etag) == etag:
+			span = byte_range(self.headers["Range"], size)
+
+		if span is False:
+			file.close()
+			self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+			self.send_header("Content-Range", f"bytes */{size}")
+			self.send_header("Content-Length", "0")
+			self.end_headers()
+			return None
+
+		first, last = span or (0, size - 1)
+		self.send_response(HTTPStatus.PARTIAL_CONTENT if span else HTTPStatus.OK)
+		self.send_header("Content-Type", content_type)
+		self.send_header("Content-Length", str(last - first + 1))
+		self.send_header("Accept-Ranges", "bytes")
+		self.send_header("Last-Modified", self.date_time_string(stat.st_mtime))
+		if span:
+			self.send_header("Content-Range", f"bytes {first}-{last}/{size}")
+		for name, value in headers:
+			self.send_header(name, value)
+		self.end_headers()
+
+		return FileSlice(file, first, last - first + 1)
+
+	def copyfile(self, source, outputfile):
+		if not isinstance(source, FileSlice):
+			return super().copyfile(source, outputfile)
+
+		# The headers are already on the socket (wfile is unbuffered), the body goes
+		# from the page cache to it with sendfile and never passes through Python
+		if source.length > 0:
+			try:
+				self.connection.sendfile(source.file, source.offset, source.length)
+			except (BrokenPipeError, ConnectionResetError):
+				self.close_connection = True
+
+	def send_html(self, path):
+		# The reload hook is injected on the fly, never written into public/
+		with open(path, "rb") as file:
+			body = file.read()
+
+		position = body.rfind(b"</body>")
+		if position < 0:
+			position = len(body)
+		body = body[:position] + RELOAD_SCRIPT + body[position:]
+
+		self.send_response(200)
+		self.send_header("Content-Type", "text/html; charset=utf-8")
+		self.send_header("Content-Length", str(len(body)))
+		self.send_header("Cache-Control", "no-store")
+		self.end_headers()
+		self.wfile.write(body)
+
+	def send_events(self):
+		self.send_response(200)
+		self.send_header("Content-Type", "text/event-stream")
+		self.send_header("Cache-Control", "no-store")
+		# The stream has no length, it ends when the connection does
+		self.send_header("Connection", "close")
+		self.end_headers()
+		self.close_connection = True
+
+		version = self.live_reload.version
+		try:
+			while True:
+				current = self.live_reload.wait(version, KEEPALIVE_SECONDS)
+				if current != version:
+					self.wfile.write(b"data: reload\n\n")
+					version = current
+				else:
+					self.wfile.write(b": keepalive\n\n")
+				self.wfile.flush()
+		except (BrokenPipeError, ConnectionResetError):
+			pass
+
+
+def make_server(directory, port, live_reload = None, host = ""):
+	handler = partial(DevRequestHandler, directory = directory, live_reload = live_reload, etags = ETags(directory))
+	server = ThreadingHTTPServer((host, port), handler)
+	server.daemon_threads = True
+
+	return server
+
+
+def serve(directory, port, live_reload = None, host = ""):
+	server = make_server(directory, port, live_reload, host)
+	thread = threading.Thread(target = server.serve_forever, daemon = True)
+	thread.start()
+	print(f"Serving {directory} at http://{host or 'localhost'}:{server.server_address[1]}/")
+
+	return server
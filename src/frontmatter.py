@@ -0,0 +1,58 @@
+from itertools import chain
+
+FENCE = "---"
+
+
+def parse_value(value):
+	value = value.strip()
+
+	if value.startswith("[") and value.endswith("]"):
+		return [parse_value(item) for item in value[1:-1].split(",") if item.strip()]
+	if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+		return value[1:-1]
+
+	return value
+
+
+def parse_front_matter(header):
+	metadata = {}
+
+	for line in header:
+		line = line.strip()
+		if not line or line.startswith("#") or ":" not in line:
+			continue
+
+		key, value = line.split(":", 1)
+		key = key.strip().lower()
+		value = parse_value(value)
+
+		# "tags: a, b" reads the same as "tags: [a, b]"
+		if key == "tags" and isinstance(value, str):
+			value = [tag.strip() for tag in value.split(",") if tag.strip()]
+
+		metadata[key] = value
+
+	return metadata
+
+
+def split_front_matter(lines):
+	# Returns (metadata, remaining lines); only the header is consumed, so a caller
+	# after metadata alone stops reading a file right there
+	lines = iter(lines)
+
+	for first in lines:
+		break
+	else:
+		return {}, iter(())
+
+	if first.strip() != FENCE:
+		return {}, chain([first], lines)
+
+	header = []
+	for line in lines:
+		if line.strip() == FENCE:
+			return parse_front_matter(header), lines
+		header.append(line)
+
+	# No closing fence, it was never front matter
+	return {}, chain([first], header)
@@ -1,4 +1,6 @@
 class HTMLNode():
+	__slots__ = ("tag", "value", "children", "props")
+
 	def __init__(self, tag = None, value = None, children = None, props = None):
 		self.tag = tag
 		self.value = value
@@ -8,6 +10,9 @@ class HTMLNode():
 	def to_html(self):
 		raise NotImplementedError
 
+	def write_html(self, write):
+		write_html(self, write)
+
 	def props_to_html(self):
 		return " ".join(f'{key}="{value}"' for key, value in self.props.items())
 
@@ -21,31 +26,61 @@ class HTMLNode():
 		return False
 
 class LeafNode(HTMLNode):
+	__slots__ = ()
+
 	def __init__(self, value, tag = None, props = None):
 		if not value:
 			raise ValueError("value is required")
 		super().__init__(tag = tag, value = value, children = None, props = props)
 
 	def to_html(self):
-		if not self.tag:
-			return self.value
-
-		if not self.props:
-			return f"<{self.tag}>{self.value}</{self.tag}>"
-		
-		return f"<{self.tag} {self.props_to_html()}>{self.value}</{self.tag}>"
+		return render_html(self)
 
 class ParentNode(HTMLNode):
+	__slots__ = ()
+
 	def __init__(self, tag, children, props = None):
 		if not tag or not children:
 			raise ValueError("tag and children are required")
 		super().__init__(tag = tag, value = None, children = children, props = props)
 
 	def to_html(self):
-		children = "".join(child.to_html() for child in self.children)
-		return f"<{self.tag}>{children}</{self.tag}>"
+		return render_html(self)
+
+
+def write_html(node, write):
+	# Depth-first with an explicit stack so deep trees can't hit the recursion limit;
+	# closing tags wait on the stack as plain strings until their children are written
+	stack = [node]
+
+	while stack:
+		node = stack.pop()
+
+		if type(node) is str:
+			write(node)
 
+		elif isinstance(node, ParentNode):
+			write(f"<{node.tag}>")
+			stack.append(f"</{node.tag}>")
+			stack.extend(reversed(node.children))
 
+		elif isinstance(node, LeafNode):
+			if not node.tag:
+				write(node.value)
+			elif not node.props:
+				write(f"<{node.tag}>")
+				write(node.value)
+				write(f"</{node.tag}>")
+			else:
+				write(f"<{node.tag} {node.props_to_html()}>")
+				write(node.value)
+				write(f"</{node.tag}>")
 
+		else:
+			write(node.to_html())
 
 
+def render_html(node):
+	parts = []
+	write_html(node, parts.append)
+	return "".join(parts)
@@ -0,0 +1,286 @@
+from assets import copy_file, is_unchanged, remove_output
+from links import resolve_target
+from manifest import hash_file
+import os, struct
+
+try:
+	from PIL import Image
+except ImportError:
+	Image = None
+
+IMAGE_SUFFIXES = (".png", ".gif", ".jpg", ".jpeg", ".webp")
+# Resized WebP copies are made of these; GIFs may be animated and WebPs already are WebP
+VARIANT_SUFFIXES = (".png", ".jpg", ".jpeg")
+# Widths of the resized variants, an image is never scaled up
+VARIANT_WIDTHS = (480, 960, 1920)
+VARIANT_QUALITY = 80
+# JPEG start-of-frame markers, the ones that carry the dimensions
+JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+class ImageReport():
+	def __init__(self):
+		# Images whose dimensions were read this build, and variants that changed on disk
+		self.measured = []
+		self.variants = []
+		self.removed = []
+		# (image, message) for images the variants couldn't be made of
+		self.errors = []
+
+	def __repr__(self):
+		return (f"ImageReport({len(self.measured)} measured, {len(self.variants)} variants written, "
+			f"{len(self.removed)} removed, {len(self.errors)} failed)")
+
+
+def is_image(relative_path):
+	return relative_path.lower().endswith(IMAGE_SUFFIXES)
+
+
+def jpeg_size(file):
+	# Walks the marker segments up to the first frame header, skipping every segment's payload
+	file.seek(2)
+
+	while True:
+		byte = file.read(1)
+		while byte == b"\xff":
+			byte = file.read(1)
+		if not byte:
+			return None
+
+		marker = byte[0]
+		if marker == 0xD9 or marker == 0xDA:
+			return None
+		if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+			continue
+
+		header = file.read(2)
+		if len(header) < 2:
+			return None
+		length = struct.unpack(">H", header)[0]
+
+		if marker in JPEG_SOF:
+			frame = file.read(5)
+			if len(frame) < 5:
+				return None
+			height, width = struct.unpack(">xHH", frame)
+			return width, height
+
+		file.seek(length - 2, os.SEEK_CUR)
+
+
+def image_size(path):
+	# (width, height) read from the file's header, nothing is decoded; None for anything unrecognized
+	try:
+		with open(path, "rb") as file:
+			head = file.read(32)
+
+			if head[:8] == b"\x89PNG\r\n\x1a\n" and head[12:16] == b"IHDR":
+				return struct.unpack(">II", head[16:24])
+
+			if head[:6] in (b"GIF87a", b"GIF89a"):
+				return struct.unpack("<HH", head[6:10])
+
+			if head[:4] == b"RIFF" and head[8:12] == b"WEBP" and len(head) >= 30:
+				chunk = head[12:16]
+				if chunk == b"VP8 ":
+					width, height = struct.unpack("<HH", head[26:30])
+					return width & 0x3FFF, height & 0x3FFF
+				if chunk == b"VP8L":
+					bits = int.from_bytes(head[21:25], "little")
+					return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+				if chunk == b"VP8X":
+					return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+				return None
+
+			if head[:2] == b"\xff\xd8":
+				return jpeg_size(file)
+	except (OSError, struct.error):
+		return None
+
+	return None
+
+
+def measure_images(assets, previous_assets, dest_dir_path, report, digests = False):
+	# Fills in the dimensions (and with digests the content hash the variant cache is keyed
+	# on) of every image asset; unchanged files keep what the last build read
+	for relative_path, entry in assets.items():
+		if not is_image(relative_path):
+			continue
+
+		old = previous_assets.get(relative_path)
+		unchanged = old and old.get("size") == entry["size"] and old.get("mtime") == entry["mtime"]
+
+		if "dimensions" not in entry:
+			if unchanged and "dimensions" in old:
+				entry["dimensions"] = old["dimensions"]
+			else:
+				size = image_size(os.path.join(dest_dir_path, relative_path))
+				entry["dimensions"] = list(size) if size else None
+				report.measured.append(relative_path)
+
+		if digests and "hash" not in entry:
+			if unchanged and "hash" in old:
+				entry["hash"] = old["hash"]
+			else:
+				entry["hash"] = hash_file(os.path.join(dest_dir_path, relative_path))
+
+
+def image_sizes(assets, variants = None):
+	# Resolved path -> [width, height] of every image the build could measure, followed by the
+	# widths of its WebP variants when it has any (image -> variant paths, as write_variants returns)
+	sizes = {}
+
+	for relative_path, entry in assets.items():
+		if not (dimensions := entry.get("dimensions")):
+			continue
+
+		sizes[relative_path] = dimensions
+		if variants and (paths := variants.get(relative_path)):
+			sizes[relative_path] = dimensions + [[width for path, width in plan_variants(relative_path, dimensions)
+				if path in paths]]
+
+	return sizes
+
+
+def size_lookup(sizes, output):
+	# url -> [width, height] or None for the page written to output, with a third item
+	# listing the (url, width) of each WebP variant for images that have them
+	def lookup(url):
+		size = sizes.get(resolve_target(url, output))
+		if size and len(size) > 2:
+			return size[:2] + [[(variant_path(url, None if width == size[0] else width), width) for width in size[2]]]
+		return size
+
+	return lookup
+
+
+def page_images(output, targets, sizes):
+	# Resolved path -> the dimensions the page was rendered with, None for images the build has no size for
+	images = {}
+
+	for kind, url in targets:
+		if kind == "image" and (path := resolve_target(url, output)) is not None:
+			images[path] = sizes.get(path)
+
+	return images
+
+
+def stale_pages(pages, sizes):
+	# Pages rendered with dimensions that no longer match their images
+	return {source for source, entry in pages.items()
+		if any(sizes.get(path) != dimensions for path, dimensions in entry.get("images", {}).items())}
+
+
+def variant_path(relative_path, width = None):
+	stem = os.path.splitext(relative_path)[0]
+	return f"{stem}.{width}w.webp" if width else f"{stem}.webp"
+
+
+def plan_variants(relative_path, dimensions):
+	# (variant path, width) of every variant an image gets: a full-size WebP plus each smaller width
+	if not relative_path.lower().endswith(VARIANT_SUFFIXES) or not dimensions:
+		return []
+
+	return [(variant_path(relative_path), dimensions[0])] + [(variant_path(relative_path, width), width)
+		for width in VARIANT_WIDTHS if width < dimensions[0]]
+
+
+def variant_plans(assets, keep = ()):
+	# image -> (variant path, width) of every image that gets variants; a variant never takes
+	# the place of a path in keep (pages, static files)
+	plans = {}
+
+	for relative_path, entry in assets.items():
+		if plan := [(path, width) for path, width in plan_variants(relative_path, entry.get("dimensions")) if path not in keep]:
+			plans[relative_path] = plan
+
+	return plans
+
+
+def cached_variant(cache_dir, digest, width):
+	# Content addressed, an image is only ever processed once per width and quality
+	return os.path.join(cache_dir, digest[:2], f"{digest}-{width}w-q{VARIANT_QUALITY}.webp")
+
+
+def render_variant(source, cache_file, width):
+	with Image.open(source) as image:
+		if image.mode not in ("RGB", "RGBA"):
+			image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+		if width != image.width:
+			image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+
+		os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+		tmp_path = f"{cache_file}.{os.getpid()}.tmp"
+		image.save(tmp_path, "WEBP", quality = VARIANT_QUALITY)
+		os.replace(tmp_path, cache_file)
+
+
+def render_variants(jobs):
+	# Runs in a worker: (image, message) for every variant that failed
+	errors = []
+
+	for relative_path, source, cache_file, width in jobs:
+		try:
+			render_variant(source, cache_file, width)
+		except Exception as e:
+			errors.append((relative_path, f"{type(e).__name__}: {e}"))
+
+	return errors
+
+
+def write_variants(dest_dir_path, assets, cache_dir, previous_variants, report, jobs = 1, keep = ()):
+	# Renders the variants missing from the cache in a process pool, links every variant into
+	# place and removes the ones the last run wrote that no image has any more; returns
+	# image -> variant paths
+	plans = variant_plans(assets, keep)
+	missing = []
+
+	for relative_path, plan in plans.items():
+		for path, width in plan:
+			cache_file = cached_variant(cache_dir, assets[relative_path]["hash"], width)
+			if not os.path.isfile(cache_file):
+				missing.append((relative_path, os.path.join(dest_dir_path, relative_path), cache_file, width))
+
+	if missing:
+		if jobs > 1 and len(missing) > 1:
+			from concurrent.futures import ProcessPoolExecutor
+
+			chunks = [missing[i::jobs] for i in range(min(jobs, len(missing)))]
+			with ProcessPoolExecutor(max_workers = len(chunks)) as executor:
+				for errors in executor.map(render_variants, chunks):
+					report.errors.extend(errors)
+		else:
+			report.errors.extend(render_variants(missing))
+
+	failed = {relative_path for relative_path, message in report.errors}
+	variants = {}
+
+	for relative_path, plan in sorted(plans.items()):
+		if relative_path in failed:
+			continue
+
+		for path, width in plan:
+			cache_file = cached_variant(cache_dir, assets[relative_path]["hash"], width)
+			destination = os.path.join(dest_dir_path, path)
+
+			if not is_unchanged(os.stat(cache_file), destination):
+				copy_file(cache_file, destination, link = True)
+				report.variants.append(path)
+
+		variants[relative_path] = [path for path, width in plan]
+
+	current = {path for paths in variants.values() for path in paths}
+	for paths in previous_variants.values():
+		for path in paths:
+			if path not in current and path not in keep:
+				remove_output(dest_dir_path, path)
+				report.removed.append(path)
+
+	return variants
+
+
+def remove_variants(dest_dir_path, variants, keep = ()):
+	for paths in variants.values():
+		for path in paths:
+			if path not in keep:
+				remove_output(dest_dir_path, path)
@@ -0,0 +1,71 @@
+from urllib.parse import unquote, urlsplit
+import os, posixpath
+
+INDEX_NAME = "index.html"
+
+
+def resolve_target(url, output):
+	# Site-relative path an internal url points at, None for external, mailto: or same-page urls.
+	# Relative urls resolve against the linking page's output directory
+	parts = urlsplit(url)
+	if parts.scheme or parts.netloc:
+		return None
+
+	if not (path := unquote(parts.path)):
+		return None
+
+	if path.startswith("/"):
+		path = path.lstrip("/")
+	else:
+		path = posixpath.join(posixpath.dirname(output.replace(os.sep, "/")), path)
+
+	if not path or path.endswith("/"):
+		path += INDEX_NAME
+
+	return posixpath.normpath(path).replace("/", os.sep)
+
+
+def page_links(output, targets):
+	# [kind, url, resolved path] per distinct target, resolved once when the page renders
+	return [[kind, url, resolve_target(url, output)] for kind, url in dict.fromkeys(targets)]
+
+
+def site_paths(manifest):
+	# Everything a link can land on: pages, static assets, image variants and the sitemap, feed and section indexes
+	paths = manifest.outputs()
+	paths.update(manifest.assets)
+	if manifest.aggregates:
+		paths.update(manifest.aggregates.get("outputs", []))
+	if manifest.images:
+		paths.update(path for variants in manifest.images.get("variants", {}).values() for path in variants)
+
+	return paths
+
+
+class LinkIndex():
+	def __init__(self, pages):
+		# resolved path -> (source, kind, url) of every page linking to it, from what the manifest
+		# recorded; unchanged pages are never read again
+		self.targets = {}
+
+		for source, entry in pages.items():
+			for kind, url, path in entry.get("links", []):
+				if path is not None:
+					self.targets.setdefault(path, []).append((source, kind, url))
+
+	def __repr__(self):
+		return f"LinkIndex({len(self.targets)} targets)"
+
+	def referrers(self, path):
+		return self.targets.get(path, [])
+
+	def broken(self, paths):
+		# (source, kind, url) of every link whose target isn't among paths; a directory
+		# link resolves to its index page
+		broken = []
+
+		for path, referrers in self.targets.items():
+			if path not in paths and os.path.join(path, INDEX_NAME) not in paths:
+				broken.extend(referrers)
+
+		return sorted(broken)
@@ -1,44 +1,223 @@
-from textnode import TextType, TextNode, generate_page, generate_pages_recursive
+import argparse
+import logging
 import os
-import shutil
-
-def main():
-	text_node = TextNode("This is a text node", TextType.BOLD, "https://www.boot.dev")
-	print(text_node.__repr__())
-
-
-
-main()
-
-
-def construct_directory(source, destination):
-
-	destination_paths = os.listdir(destination)
-
-	for item in os.listdir(destination):
-		file_path = os.path.join(destination, item)
-		if os.path.isfile(file_path):
-			os.unlink(file_path)
-
-		elif os.path.isdir(file_path):
-			shutil.rmtree(file_path)  
-
-	for item in os.listdir(source):
-		source_path = os.path.join(source, item)
-		destination_path = os.path.join(destination, item)
-
-		if os.path.isfile(source_path):
-			shutil.copy(source_path, destination_path)
-
-		elif os.path.isdir(source_path):
-
-			shutil.copytree(source_path, destination_path)
-
-
-construct_directory("/Users/juanrey/workspace/github.com/JDRA000/static-site-generator/static", "/Users/juanrey/workspace/github.com/JDRA000/static-site-generator/public")
-
-generate_pages_recursive(
-	"./content",
-	"./template.html",
-	"./public")
-
+import sys
+
+# The pipeline is imported by the command that needs it, so --help, serve without
+# --watch and every tiny build don't pay for the modules they never touch
+
+
+def build(args):
+	from build import BuildError, build_site
+	from profiler import Profiler, set_profiler
+
+	if args.cache and args.clear_cache:
+		from blockcache import open_block_cache
+		from textnode import RENDERER_VERSION
+		open_block_cache(args.cache, RENDERER_VERSION).clear()
+
+	if args.profile:
+		profiler = Profiler()
+		set_profiler(profiler)
+
+	try:
+		report = build_site(
+			"./content",
+			"./template.html",
+			shard_dir(args.shard) if args.shard else "./public",
+			incremental = args.incremental,
+			jobs = args.jobs,
+			dir_path_static = "./static",
+			link_assets = args.link_assets,
+			checksum_assets = args.checksum,
+			cache_path = args.cache,
+			async_io = args.async_io,
+			compress = args.compress,
+			search = args.search,
+			feeds = args.feeds,
+			base_url = args.base_url,
+			check_links = args.check_links,
+			images = args.images,
+			image_cache = args.image_cache,
+			shard = args.shard and args.shard + (args.shard_by,))
+	except BuildError as e:
+		print(e, file=sys.stderr)
+		sys.exit(1)
+
+	assets = report.assets
+	print(f"Rendered {len(report.rendered)} pages ({len(report.written)} written, {report.unchanged} unchanged), "
+		f"skipped {report.skipped}, removed {len(report.removed)}")
+	print(f"Copied {len(assets.copied)} assets ({assets.bytes_copied} bytes), skipped {assets.skipped} "
+		f"({assets.bytes_skipped} bytes), removed {len(assets.removed)}")
+
+	if (compressed := report.compressed) and compressed.compressed:
+		sizes = ", ".join(f"{suffix} {size} bytes" for suffix, size in compressed.bytes_out.items())
+		print(f"Compressed {len(compressed.compressed)} files ({compressed.bytes_in} bytes): {sizes}")
+
+	if args.search:
+		print(f"Updated {len(report.search_shards)} search index shards")
+
+	if args.feeds and not args.shard:
+		print(f"Updated {len(report.aggregates)} sitemap, feed and section index files")
+
+	if images := report.images:
+		from images import Image
+
+		print(f"Measured {len(images.measured)} images, wrote {len(images.variants)} variants, removed {len(images.removed)}")
+		if Image is None:
+			print("Pillow isn't installed, no image variants were made", file=sys.stderr)
+		for image, message in images.errors:
+			print(f"{image}: {message}", file=sys.stderr)
+
+	# A shard only sees its own pages, links into the others are checked when they're merged
+	if args.check_links and not args.shard:
+		print(f"Found {len(report.broken_links)} broken links and images")
+		for source, kind, url in report.broken_links:
+			print(f"{source}: broken {kind} {url}", file=sys.stderr)
+
+	if args.profile:
+		set_profiler(None)
+		print(profiler.summary(), file=sys.stderr)
+		profiler.write_trace(args.profile)
+		print(f"Wrote profile to {args.profile}", file=sys.stderr)
+
+
+def shard_dir(shard):
+	return os.path.join("./shards", str(shard[0]))
+
+
+def parse_shard(value):
+	# "I/N", the I-th of N shards counting from 0
+	try:
+		index, count = (int(part) for part in value.split("/"))
+	except ValueError:
+		raise argparse.ArgumentTypeError(f"expected I/N, got {value!r}")
+
+	if not 0 <= index < count:
+		raise argparse.ArgumentTypeError(f"shard {index} isn't one of 0 to {count - 1}")
+
+	return index, count
+
+
+def merge(args):
+	from shards import ShardError, merge_shards
+
+	shard_dirs = []
+	if os.path.isdir("./shards"):
+		shard_dirs = [shard_dir((int(entry.name),)) for entry in os.scandir("./shards") if entry.name.isdigit()]
+		shard_dirs.sort(key = lambda path: int(os.path.basename(path)))
+
+	try:
+		report = merge_shards(shard_dirs, "./public", template_path = "./template.html", feeds = args.feeds,
+			base_url = args.base_url)
+	except ShardError as e:
+		print(e, file=sys.stderr)
+		sys.exit(1)
+
+	print(f"Merged {len(shard_dirs)} shards: placed {len(report.copied)} pages ({report.unchanged} unchanged), "
+		f"removed {len(report.removed)}")
+	print(f"Placed {len(report.assets.copied)} assets, skipped {report.assets.skipped}, removed {len(report.assets.removed)}")
+
+	if report.search_shards:
+		print(f"Updated {len(report.search_shards)} search index shards")
+
+	if args.feeds:
+		print(f"Updated {len(report.aggregates)} sitemap, feed and section index files")
+
+	if args.check_links:
+		print(f"Found {len(report.broken_links)} broken links and images")
+		for source, kind, url in report.broken_links:
+			print(f"{source}: broken {kind} {url}", file=sys.stderr)
+
+
+def preview(args):
+	from devserver import LiveReload, serve
+
+	args.incremental = True
+	build(args)
+
+	live_reload = LiveReload() if args.watch else None
+	server = serve("./public", args.port, live_reload, args.host)
+
+	try:
+		if args.watch:
+			from watch import watch
+			watch("./content", "./static", "./template.html", "./public", on_change = live_reload.notify,
+				jobs = args.jobs, cache_path = args.cache)
+		else:
+			server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.shutdown()
+
+
+def cli():
+	parser = argparse.ArgumentParser(description="Build the static site from ./content into ./public")
+	parser.add_argument("command", nargs="?", choices=["build", "serve", "merge"], default="build",
+		help="build the site once, build it and serve ./public, or merge ./shards/* into ./public")
+	parser.add_argument("--incremental", action="store_true",
+		help="only re-render pages whose markdown or template changed since the last build")
+	parser.add_argument("-j", "--jobs", type=int, default=1,
+		help="render pages across N worker processes (0 uses every CPU)")
+	parser.add_argument("--async", dest="async_io", action="store_true",
+		help="overlap reading, rendering and writing pages, for slow or networked storage")
+	parser.add_argument("--compress", action="store_true",
+		help="write .gz (and .br/.zst when brotli/zstandard are installed) next to HTML, CSS, JS and SVG outputs")
+	parser.add_argument("--search", action="store_true",
+		help="write a sharded search index (public/search/) of every page's text")
+	parser.add_argument("--feeds", action="store_true",
+		help="write sitemap.xml, feed.xml and paginated section indexes (<section>/pages/<n>.html)")
+	parser.add_argument("--base-url", default="", metavar="URL",
+		help="with --feeds (required): site root used for absolute links, e.g. https://example.com")
+	parser.add_argument("--check-links", action="store_true",
+		help="report internal links and images whose target isn't among the pages or static files")
+	parser.add_argument("--images", action="store_true",
+		help="put width/height on <img> tags, and with Pillow installed write resized WebP variants of PNG and JPEG images and list them in a srcset")
+	parser.add_argument("--image-cache", default="./.cache/images", metavar="PATH",
+		help="with --images: directory of processed variants, unchanged images are never processed again")
+	parser.add_argument("--shard", type=parse_shard, metavar="I/N",
+		help="build only the I-th of N shards of the pages into ./shards/I, to be combined with merge")
+	parser.add_argument("--shard-by", choices=["directory", "hash"], default="directory",
+		help="with --shard: keep each top-level content directory in one shard, or spread pages by path hash")
+	parser.add_argument("--link-assets", action="store_true",
+		help="hard link static files into ./public instead of copying them")
+	parser.add_argument("--checksum", action="store_true",
+		help="compare static files by content hash instead of size and mtime")
+	parser.add_argument("--cache", default="./.cache/blocks.sqlite", metavar="PATH",
+		help="block render cache, rendered HTML is reused for unchanged blocks")
+	parser.add_argument("--no-cache", dest="cache", action="store_const", const=None,
+		help="render every block without the cache")
+	parser.add_argument("--clear-cache", action="store_true",
+		help="empty the block cache before building")
+	parser.add_argument("--profile", metavar="PATH",
+		help="record per-stage and per-page timings and write them as a Chrome trace to PATH")
+	parser.add_argument("-v", "--verbose", action="count", default=0,
+		help="log each page (-v) or parser internals too (-vv)")
+	parser.add_argument("--watch", action="store_true",
+		help="with serve: rebuild changed files and reload connected browsers")
+	parser.add_argument("--port", type=int, default=8888,
+		help="with serve: port to listen on")
+	parser.add_argument("--host", default="", metavar="ADDRESS",
+		help="with serve: address to listen on, every interface by default")
+	args = parser.parse_args()
+
+	# Sitemaps and feeds must use absolute URLs, relative ones get them rejected by crawlers and readers
+	if args.feeds and "://" not in args.base_url:
+		parser.error("--feeds needs --base-url with an absolute URL, e.g. https://example.com")
+
+	levels = [logging.WARNING, logging.INFO, logging.DEBUG]
+	logging.basicConfig(level = levels[min(args.verbose, 2)], format = "%(levelname)s %(name)s: %(message)s")
+
+	args.jobs = args.jobs or os.cpu_count() or 1
+
+	if args.command == "serve":
+		preview(args)
+	elif args.command == "merge":
+		merge(args)
+	else:
+		build(args)
+
+
+if __name__ == "__main__":
+	cli()
@@ -0,0 +1,120 @@
+import hashlib, json, os
+
+MANIFEST_VERSION = 2
+MANIFEST_SUFFIX = ".manifest.json"
+# Where builds before the manifest moved out of the output directory kept it
+LEGACY_MANIFEST_NAME = ".manifest.json"
+
+
+def hash_file(path):
+	digest = hashlib.sha256()
+
+	with open(path, "rb") as file:
+		while chunk := file.read(1 << 16):
+			digest.update(chunk)
+
+	return digest.hexdigest()
+
+
+class Manifest():
+	def __init__(self, templates = None, pages = None, assets = None, compression = None, search = False, aggregates = None,
+			links = False, images = None, renderer = None):
+		# template path -> hash, pages record the template they were rendered with
+		self.templates = templates if templates is not None else {}
+		self.pages = pages if pages is not None else {}
+		# static file -> size and mtime (plus hash with checksum syncs) as last copied
+		self.assets = assets if assets is not None else {}
+		# Precompressed sibling suffixes every output carries, empty when compression is off
+		self.compression = compression if compression is not None else []
+		# Whether the outputs carry a search index
+		self.search = search
+		# Sitemap, feed and section index settings plus the digest and outputs of their last run, None when off
+		self.aggregates = aggregates
+		# Whether pages record their link and image targets for the link check
+		self.links = links
+		# Image variant cache directory and image -> variants written, None when image processing is off
+		self.images = images
+		# RENDERER_VERSION the pages were rendered with, a different one renders them all again
+		self.renderer = renderer
+
+	def __eq__(self, Manifest):
+		return (self.templates == Manifest.templates and self.pages == Manifest.pages and self.assets == Manifest.assets
+			and self.compression == Manifest.compression and self.search == Manifest.search
+			and self.aggregates == Manifest.aggregates and self.links == Manifest.links
+			and self.images == Manifest.images and self.renderer == Manifest.renderer)
+
+	def __repr__(self):
+		return f"Manifest({len(self.templates)} templates, {len(self.pages)} pages)"
+
+	def outputs(self):
+		return {entry["output"] for entry in self.pages.values()}
+
+	def dependents(self, template_path):
+		return {source for source, entry in self.pages.items() if entry.get("template") == template_path}
+
+	def to_dict(self):
+		return {"version": MANIFEST_VERSION, "templates": self.templates, "pages": self.pages, "assets": self.assets,
+			"compression": self.compression, "search": self.search, "aggregates": self.aggregates, "links": self.links,
+			"images": self.images, "renderer": self.renderer}
+
+
+def state_path(dest_dir_path, suffix):
+	# Build state lives in .cache/ next to the output directory, so it's never deployed with
+	# the site: ./public keeps its manifest in ./.cache/public.manifest.json
+	dest_dir_path = os.path.normpath(dest_dir_path)
+	return os.path.join(os.path.dirname(dest_dir_path), ".cache", os.path.basename(dest_dir_path) + suffix)
+
+
+def manifest_path(dest_dir_path):
+	return state_path(dest_dir_path, MANIFEST_SUFFIX)
+
+
+def load_build_manifest(dest_dir_path):
+	# A manifest still in the output directory is picked up once and removed from it
+	path = manifest_path(dest_dir_path)
+	legacy_path = os.path.join(dest_dir_path, LEGACY_MANIFEST_NAME)
+
+	if os.path.isfile(legacy_path):
+		if not os.path.isfile(path):
+			save_manifest(load_manifest(legacy_path), path)
+		os.unlink(legacy_path)
+
+	return load_manifest(path)
+
+
+def load_manifest(path):
+	try:
+		with open(path, "r", encoding="utf-8") as file:
+			data = json.load(file)
+	except (OSError, ValueError):
+		return Manifest()
+
+	if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+		return Manifest()
+
+	return Manifest(templates = data.get("templates", {}), pages = data.get("pages", {}), assets = data.get("assets", {}),
+		compression = data.get("compression", []), search = data.get("search", False), aggregates = data.get("aggregates"),
+		links = data.get("links", False), images = data.get("images"), renderer = data.get("renderer"))
+
+
+def save_manifest(manifest, path):
+	os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+	tmp_path = path + ".tmp"
+
+	# Compact and unsorted keeps it on the C encoder, a large site's manifest is saved on every edit
+	with open(tmp_path, "w", encoding="utf-8") as file:
+		file.write(json.dumps(manifest.to_dict(), separators=(",", ":")))
+
+	os.replace(tmp_path, path)
+
+
+def source_entry(path, previous = None):
+	# Reuse the stored hash when size and mtime match so unchanged files are never read
+	stat = os.stat(path)
+
+	if previous and previous.get("size") == stat.st_size and previous.get("mtime") == stat.st_mtime_ns:
+		digest = previous["hash"]
+	else:
+		digest = hash_file(path)
+
+	return {"hash": digest, "size": stat.st_size, "mtime": stat.st_mtime_ns}
@@ -0,0 +1,95 @@
+from collections import OrderedDict
+import os, sys, threading, weakref
+
+DEFAULT_MAX_ENTRIES = 65536
+# Total characters of keys and values held, the entry cap alone doesn't bound memory when values are long
+DEFAULT_MAX_BYTES = 8 << 20
+# Only short fragments repeat (nav items, headings, list items); longer text is rendered without the memo
+DEFAULT_MAX_KEY_LENGTH = 256
+
+# Every memo this process made, so a forked child can reset them
+_memos = weakref.WeakSet()
+
+
+class Memo():
+	# Bounded LRU of text -> rendered string (or tuple of strings and other values); safe to share between
+	# threads, and a forked worker starts with its own copy and a fresh lock instead of
+	# inheriting one that another thread may have held at fork time
+	def __init__(self, function, max_entries = DEFAULT_MAX_ENTRIES, max_bytes = DEFAULT_MAX_BYTES,
+			max_key_length = DEFAULT_MAX_KEY_LENGTH):
+		self.function = function
+		self.max_entries = max_entries
+		self.max_bytes = max_bytes
+		self.max_key_length = max_key_length
+		# key -> (value, size)
+		self.entries = OrderedDict()
+		self.bytes = 0
+		self.lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+		self.bypassed = 0
+		_memos.add(self)
+
+	def __repr__(self):
+		return (f"Memo({len(self.entries)}/{self.max_entries} entries, {self.bytes}/{self.max_bytes} bytes, "
+			f"{self.hits} hits, {self.misses} misses)")
+
+	def __call__(self, key):
+		if len(key) > self.max_key_length:
+			with self.lock:
+				self.bypassed += 1
+			return self.function(key)
+
+		with self.lock:
+			if (entry := self.entries.get(key)) is not None:
+				self.entries.move_to_end(key)
+				self.hits += 1
+				return entry[0]
+			self.misses += 1
+
+		# Computed outside the lock; two threads racing on one key just do the work twice.
+		# Interned so every page repeating a fragment holds the same string object
+		value = self.function(key)
+		if type(value) is str:
+			value = sys.intern(value)
+			size = len(value)
+		else:
+			value = tuple(sys.intern(item) if type(item) is str else item for item in value)
+			size = sum(len(item) for item in value if type(item) is str)
+		size += len(key)
+
+		with self.lock:
+			if (old := self.entries.pop(key, None)) is not None:
+				self.bytes -= old[1]
+			self.entries[key] = (value, size)
+			self.bytes += size
+
+			while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+				self.bytes -= self.entries.popitem(last = False)[1][1]
+
+		return value
+
+	def stats(self):
+		with self.lock:
+			return {"hits": self.hits, "misses": self.misses, "bypassed": self.bypassed, "entries": len(self.entries),
+				"max_entries": self.max_entries, "bytes": self.bytes, "max_bytes": self.max_bytes}
+
+	def clear(self):
+		with self.lock:
+			self.entries.clear()
+			self.bytes = 0
+			self.hits = 0
+			self.misses = 0
+			self.bypassed = 0
+
+	def after_fork(self):
+		self.lock = threading.Lock()
+
+
+def reset_after_fork():
+	for memo in list(_memos):
+		memo.after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+	os.register_at_fork(after_in_child = reset_after_fork)
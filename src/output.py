@@ -0,0 +1,79 @@
+from manifest import hash_file
+import hashlib, os
+
+# Text written is encoded and hashed in batches of about this many characters
+BUFFER_SIZE = 1 << 16
+
+
+def same_content(path, size, digest):
+	# A size mismatch settles it without reading the old file
+	try:
+		if os.stat(path).st_size != size:
+			return False
+	except OSError:
+		return False
+
+	return hash_file(path) == digest
+
+
+class AtomicWriter():
+	# Streams into a temp file next to the destination while hashing it; on close the
+	# destination is only replaced when the bytes differ, so unchanged outputs keep their
+	# mtime and a server never sees a half-written file
+	def __init__(self, path):
+		self.path = path
+		self.tmp_path = path + ".tmp"
+		self.pending = []
+		self.pending_size = 0
+		self.digest = hashlib.sha256()
+		self.size = 0
+		self.hash = None
+		self.written = False
+
+		os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+		self.file = open(self.tmp_path, "wb")
+
+	def __repr__(self):
+		return f"AtomicWriter({self.path}, {'written' if self.written else 'unchanged'})"
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc, traceback):
+		if exc_type:
+			self.abort()
+		else:
+			self.commit()
+
+	def write(self, text):
+		self.pending.append(text)
+		self.pending_size += len(text)
+
+		if self.pending_size >= BUFFER_SIZE:
+			self.drain()
+
+	def drain(self):
+		data = "".join(self.pending).encode("utf-8")
+		self.digest.update(data)
+		self.file.write(data)
+		self.size += len(data)
+		self.pending = []
+		self.pending_size = 0
+
+	def commit(self):
+		self.drain()
+		self.file.close()
+		self.hash = self.digest.hexdigest()
+
+		if same_content(self.path, self.size, self.hash):
+			os.unlink(self.tmp_path)
+		else:
+			os.replace(self.tmp_path, self.path)
+			self.written = True
+
+		return self.written
+
+	def abort(self):
+		self.file.close()
+		if os.path.exists(self.tmp_path):
+			os.unlink(self.tmp_path)
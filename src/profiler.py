@@ -0,0 +1,109 @@
+from contextlib import contextmanager, nullcontext
+import json, os, threading, time
+
+
+class Profiler():
+	enabled = True
+
+	def __init__(self):
+		self.stages = {}
+		self.pages = {}
+		self.counters = {}
+		self.events = []
+
+	def record(self, name, category, started, ended):
+		self.events.append({
+			"name": name,
+			"cat": category,
+			"ph": "X",
+			"ts": started // 1000,
+			"dur": (ended - started) // 1000,
+			"pid": os.getpid(),
+			"tid": threading.get_ident(),
+		})
+
+	@contextmanager
+	def stage(self, name):
+		started = time.time_ns()
+		try:
+			yield
+		finally:
+			ended = time.time_ns()
+			self.stages[name] = self.stages.get(name, 0) + (ended - started) / 1e9
+			self.record(name, "stage", started, ended)
+
+	@contextmanager
+	def page(self, name):
+		started = time.time_ns()
+		try:
+			yield
+		finally:
+			ended = time.time_ns()
+			self.pages[name] = self.pages.get(name, 0) + (ended - started) / 1e9
+			self.record(name, "page", started, ended)
+
+	def count(self, name, n = 1):
+		self.counters[name] = self.counters.get(name, 0) + n
+
+	def to_dict(self):
+		return {"stages": self.stages, "pages": self.pages, "counters": self.counters, "events": self.events}
+
+	def merge(self, data):
+		# Folds in what a worker process recorded
+		for name, seconds in data["stages"].items():
+			self.stages[name] = self.stages.get(name, 0) + seconds
+		for name, seconds in data["pages"].items():
+			self.pages[name] = self.pages.get(name, 0) + seconds
+		for name, n in data["counters"].items():
+			self.count(name, n)
+		self.events.extend(data["events"])
+
+	def slowest_pages(self, n = 10):
+		return sorted(self.pages.items(), key=lambda item: item[1], reverse=True)[:n]
+
+	def summary(self, n = 10):
+		lines = ["Stages:"]
+		lines.extend(f"  {name:<24} {seconds * 1000:10.1f} ms" for name, seconds in self.stages.items())
+		lines.append("Counters:")
+		lines.extend(f"  {name:<24} {value:10}" for name, value in sorted(self.counters.items()))
+		lines.append(f"Slowest {min(n, len(self.pages))} of {len(self.pages)} pages:")
+		lines.extend(f"  {seconds * 1000:10.1f} ms  {name}" for name, seconds in self.slowest_pages(n))
+		return "\n".join(lines)
+
+	def write_trace(self, path):
+		# Chrome trace event format, loads in chrome://tracing and Perfetto
+		trace = {
+			"traceEvents": self.events,
+			"displayTimeUnit": "ms",
+			"otherData": {"stages": self.stages, "counters": self.counters, "slowest_pages": self.slowest_pages(50)},
+		}
+
+		with open(path, "w", encoding="utf-8") as file:
+			json.dump(trace, file)
+
+
+class NullProfiler():
+	# Stand-in while profiling is off, every hook is a no-op
+	enabled = False
+
+	def stage(self, name):
+		return nullcontext()
+
+	def page(self, name):
+		return nullcontext()
+
+	def count(self, name, n = 1):
+		pass
+
+
+NULL_PROFILER = NullProfiler()
+_profiler = NULL_PROFILER
+
+
+def get_profiler():
+	return _profiler
+
+
+def set_profiler(profiler):
+	global _profiler
+	_profiler = profiler or NULL_PROFILER
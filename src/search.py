@@ -0,0 +1,193 @@
+from manifest import state_path
+from output import AtomicWriter
+import json, os, re, shutil
+
+SEARCH_DIR = "search"
+# Everything the next build needs to patch the index lives in .cache/, next to the manifest
+STATE_SUFFIX = ".search.json"
+# Where builds before it moved out of the output directory kept it
+LEGACY_STATE_NAME = ".search.json"
+# Terms are sharded by prefix, a client looking up "ring" fetches search/terms/ri.json only
+PREFIX_LENGTH = 2
+TERM_PATTERN = re.compile(r"\w+")
+
+
+def page_postings(texts):
+	# term -> word positions across the page's text
+	postings = {}
+	position = 0
+
+	for text in texts:
+		for term in TERM_PATTERN.findall(text.lower()):
+			postings.setdefault(term, []).append(position)
+			position += 1
+
+	return postings
+
+
+def page_url(output):
+	return "/" + output.replace(os.sep, "/")
+
+
+def write_json(path, data):
+	with AtomicWriter(path) as file:
+		file.write(json.dumps(data, separators=(",", ":"), sort_keys=True, ensure_ascii=False))
+
+	return file.written
+
+
+class SearchIndex():
+	def __init__(self, dest_dir_path):
+		self.directory = os.path.join(dest_dir_path, SEARCH_DIR)
+		self.state_path = state_path(dest_dir_path, STATE_SUFFIX)
+
+		# A state file still in the output directory is picked up once and moved out of it
+		legacy_path = os.path.join(dest_dir_path, LEGACY_STATE_NAME)
+		if os.path.isfile(legacy_path):
+			if os.path.isfile(self.state_path):
+				os.unlink(legacy_path)
+			else:
+				os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+				os.replace(legacy_path, self.state_path)
+
+		try:
+			with open(self.state_path, "r", encoding="utf-8") as file:
+				state = json.load(file)
+		except (OSError, ValueError):
+			state = {}
+
+		self.next_id = state.get("next_id", 0)
+		# source -> id, url, title and the terms it has postings under
+		self.pages = state.get("pages", {})
+		# Only shards a changed page touches are ever loaded
+		self.shards = {}
+		self.dirty = set()
+
+	def __repr__(self):
+		return f"SearchIndex({len(self.pages)} pages, {len(self.shards)} shards loaded)"
+
+	def shard_path(self, key):
+		return os.path.join(self.directory, "terms", f"{key}.json")
+
+	def shard(self, key):
+		if key not in self.shards:
+			try:
+				with open(self.shard_path(key), "r", encoding="utf-8") as file:
+					self.shards[key] = json.load(file)
+			except (OSError, ValueError):
+				self.shards[key] = {}
+
+		return self.shards[key]
+
+	def drop_postings(self, page):
+		page_id = str(page["id"])
+
+		for term in page["terms"]:
+			key = term[:PREFIX_LENGTH]
+			shard = self.shard(key)
+
+			if (postings := shard.get(term)) and postings.pop(page_id, None) is not None:
+				if not postings:
+					del shard[term]
+				self.dirty.add(key)
+
+	def remove(self, source):
+		if page := self.pages.pop(source, None):
+			self.drop_postings(page)
+
+	def add(self, source, url, title, postings):
+		# A page keeps its id across rebuilds, so the pages table only changes when titles or urls do
+		if page := self.pages.get(source):
+			self.drop_postings(page)
+			page_id = page["id"]
+		else:
+			page_id = self.next_id
+			self.next_id += 1
+
+		for term, positions in postings.items():
+			key = term[:PREFIX_LENGTH]
+			self.shard(key).setdefault(term, {})[str(page_id)] = positions
+			self.dirty.add(key)
+
+		self.pages[source] = {"id": page_id, "url": url, "title": title, "terms": sorted(postings)}
+
+	def save(self):
+		# Returns the shards that changed on disk
+		written = []
+
+		for key in sorted(self.dirty):
+			if shard := self.shards[key]:
+				if write_json(self.shard_path(key), shard):
+					written.append(key)
+			elif os.path.isfile(self.shard_path(key)):
+				os.unlink(self.shard_path(key))
+				written.append(key)
+
+		table = {str(page["id"]): {"url": page["url"], "title": page["title"]} for page in self.pages.values()}
+		write_json(os.path.join(self.directory, "pages.json"), table)
+
+		os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+		tmp_path = self.state_path + ".tmp"
+		with open(tmp_path, "w", encoding="utf-8") as file:
+			json.dump({"next_id": self.next_id, "pages": self.pages}, file, separators=(",", ":"))
+		os.replace(tmp_path, self.state_path)
+
+		self.dirty = set()
+		return written
+
+
+def remove_search_index(dest_dir_path):
+	# Only an index this module wrote (it leaves a state file) is removed
+	for path in (state_path(dest_dir_path, STATE_SUFFIX), os.path.join(dest_dir_path, LEGACY_STATE_NAME)):
+		if os.path.isfile(path):
+			shutil.rmtree(os.path.join(dest_dir_path, SEARCH_DIR), ignore_errors=True)
+			os.unlink(path)
+
+
+def merge_search_indexes(dest_dir_path, shard_dirs):
+	# Combines the indexes separately built shards wrote into one under dest_dir_path, a prefix
+	# at a time from their term shards; no page is read. A page keeps the id the last merge gave
+	# it. Returns the term shards that changed on disk
+	index = SearchIndex(dest_dir_path)
+	parts = [SearchIndex(shard_dir) for shard_dir in shard_dirs]
+	pages = {}
+	remaps = []
+
+	for part in parts:
+		remap = {}
+		for source, page in part.pages.items():
+			if (old := index.pages.get(source)) is not None:
+				page_id = old["id"]
+			else:
+				page_id = index.next_id
+				index.next_id += 1
+
+			remap[str(page["id"])] = str(page_id)
+			pages[source] = dict(page, id = page_id)
+		remaps.append(remap)
+
+	keys = {term[:PREFIX_LENGTH] for page in pages.values() for term in page["terms"]}
+	stale = {term[:PREFIX_LENGTH] for page in index.pages.values() for term in page["terms"]} - keys
+	written = []
+
+	for key in sorted(keys):
+		shard = {}
+		for part, remap in zip(parts, remaps):
+			for term, postings in part.shard(key).items():
+				target = shard.setdefault(term, {})
+				for page_id, positions in postings.items():
+					target[remap[page_id]] = positions
+			# One prefix is held at a time
+			part.shards.pop(key)
+
+		if write_json(index.shard_path(key), shard):
+			written.append(key)
+
+	for key in sorted(stale):
+		if os.path.isfile(index.shard_path(key)):
+			os.unlink(index.shard_path(key))
+			written.append(key)
+
+	index.pages = pages
+	index.save()
+	return written
@@ -0,0 +1,176 @@
+from assets import SyncReport, copy_file, is_unchanged, remove_output
+from manifest import Manifest, load_build_manifest, load_manifest, manifest_path, save_manifest
+from search import merge_search_indexes, remove_search_index
+import hashlib, os
+
+
+class ShardError(Exception):
+	pass
+
+
+class MergeReport():
+	def __init__(self):
+		# Pages whose output changed and was linked or copied in, the rest were already in place
+		self.copied = []
+		self.unchanged = 0
+		self.removed = []
+		self.assets = SyncReport()
+		# Search index shards, and sitemap, feed or section index pages, that changed on disk
+		self.search_shards = []
+		self.aggregates = []
+		self.broken_links = []
+
+	def __repr__(self):
+		return (f"MergeReport({len(self.copied)} copied, {self.unchanged} unchanged, {len(self.removed)} removed, "
+			f"{self.assets})")
+
+
+def shard_index(source, count, by = "directory"):
+	# Stable across machines and runs: a page lands in the same shard wherever it's built.
+	# By directory, a whole top-level directory (the root's own pages count as one) goes together
+	if by == "directory":
+		key = source.split(os.sep, 1)[0] if os.sep in source else ""
+	else:
+		key = source
+
+	return int.from_bytes(hashlib.blake2b(key.encode(), digest_size = 8).digest(), "big") % count
+
+
+def in_shard(source, shard):
+	index, count, by = shard
+	return shard_index(source, count, by) == index
+
+
+def place_file(shard_dir, dest_dir_path, relative_path, suffixes = (), link = True):
+	# Links (or copies) one output and its precompressed siblings from a shard into place
+	for suffix in ("",) + tuple(suffixes):
+		source = os.path.join(shard_dir, relative_path) + suffix
+		destination = os.path.join(dest_dir_path, relative_path) + suffix
+
+		if not os.path.isfile(source):
+			if suffix and os.path.isfile(destination):
+				os.unlink(destination)
+			continue
+
+		if not is_unchanged(os.stat(source), destination):
+			os.makedirs(os.path.dirname(destination), exist_ok=True)
+			copy_file(source, destination, link)
+
+
+def merge_manifests(manifests, shard_dirs):
+	# One manifest over every shard's pages and assets, plus which shard holds each of them
+	merged = Manifest(compression = manifests[0].compression, search = all(manifest.search for manifest in manifests),
+		links = all(manifest.links for manifest in manifests), renderer = manifests[0].renderer)
+	owners = {}
+
+	if any(manifest.compression != merged.compression for manifest in manifests):
+		raise ShardError("shards were built with different compression settings")
+	if any(manifest.renderer != merged.renderer for manifest in manifests):
+		raise ShardError("shards were built by different renderer versions")
+
+	for shard_dir, manifest in zip(shard_dirs, manifests):
+		merged.templates.update(manifest.templates)
+
+		for source, entry in manifest.pages.items():
+			if source in merged.pages:
+				raise ShardError(f"{source} was built by more than one shard")
+			merged.pages[source] = entry
+			owners[entry["output"]] = shard_dir
+
+		# Only the first shard copies static/, the others just list it
+		for asset, entry in manifest.assets.items():
+			if asset not in merged.assets and os.path.isfile(os.path.join(shard_dir, asset)):
+				merged.assets[asset] = entry
+				owners.setdefault(asset, shard_dir)
+
+		if manifest.images is not None:
+			if merged.images is None:
+				merged.images = {"cache": manifest.images.get("cache"), "variants": {}}
+			# Shards that didn't copy the images only planned their variants
+			for image, variants in manifest.images.get("variants", {}).items():
+				if image not in merged.images["variants"] and all(os.path.isfile(os.path.join(shard_dir, path))
+						for path in variants):
+					merged.images["variants"][image] = variants
+					for path in variants:
+						owners.setdefault(path, shard_dir)
+
+	return merged, owners
+
+
+def merge_shards(shard_dirs, dest_dir_path, template_path = None, feeds = False, base_url = "", link = True):
+	# Combines independently built shard outputs into dest_dir_path. Outputs are linked in
+	# unless unchanged since the last merge, and the cross-shard artifacts (search index,
+	# sitemap and feeds, the link check) come from the shard manifests and search indexes;
+	# no page is parsed again
+	if not shard_dirs:
+		raise ShardError("no shards to merge")
+
+	for shard_dir in shard_dirs:
+		if not os.path.isfile(manifest_path(shard_dir)):
+			raise ShardError(f"{shard_dir} has no build manifest, was the shard built?")
+
+	manifests = [load_manifest(manifest_path(shard_dir)) for shard_dir in shard_dirs]
+	previous = load_build_manifest(dest_dir_path)
+	merged, owners = merge_manifests(manifests, shard_dirs)
+	report = MergeReport()
+
+	for source, entry in sorted(merged.pages.items()):
+		old = previous.pages.get(source)
+		if (old and old["output"] == entry["output"] and old.get("output_hash") == entry.get("output_hash")
+				and os.path.isfile(os.path.join(dest_dir_path, entry["output"]))):
+			report.unchanged += 1
+			continue
+
+		place_file(owners[entry["output"]], dest_dir_path, entry["output"], merged.compression, link)
+		report.copied.append(source)
+
+	variants = [path for paths in (merged.images or {}).get("variants", {}).values() for path in paths]
+	for relative_path in sorted(merged.assets) + variants:
+		source = os.path.join(owners[relative_path], relative_path)
+		if is_unchanged(os.stat(source), os.path.join(dest_dir_path, relative_path)):
+			report.assets.skipped += 1
+		else:
+			place_file(owners[relative_path], dest_dir_path, relative_path, merged.compression, link)
+			report.assets.copied.append(relative_path)
+
+	# Whatever the last merge placed that no shard has any more
+	keep = merged.outputs() | merged.assets.keys() | set(variants)
+	for source, entry in previous.pages.items():
+		if source not in merged.pages and entry["output"] not in keep:
+			remove_output(dest_dir_path, entry["output"])
+			report.removed.append(source)
+
+	stale_assets = set(previous.assets)
+	if previous.images:
+		stale_assets.update(path for paths in previous.images.get("variants", {}).values() for path in paths)
+	for relative_path in sorted(stale_assets - keep):
+		remove_output(dest_dir_path, relative_path)
+		report.assets.removed.append(relative_path)
+
+	if merged.search:
+		report.search_shards = merge_search_indexes(dest_dir_path, shard_dirs)
+	else:
+		remove_search_index(dest_dir_path)
+
+	if feeds:
+		from aggregates import update_aggregates
+
+		merged.aggregates = {"base_url": base_url, "template": os.path.normpath(template_path)}
+		if previous.aggregates:
+			merged.aggregates["digest"] = previous.aggregates.get("digest")
+			merged.aggregates["outputs"] = previous.aggregates.get("outputs", [])
+		report.aggregates = update_aggregates(dest_dir_path, merged)
+
+		if merged.compression and report.aggregates:
+			from compress import compress_outputs
+			compress_outputs(dest_dir_path, report.aggregates, merged.compression)
+	elif previous.aggregates:
+		from aggregates import remove_aggregates
+		remove_aggregates(dest_dir_path, previous.aggregates)
+
+	if merged.links:
+		from links import LinkIndex, site_paths
+		report.broken_links = LinkIndex(merged.pages).broken(site_paths(merged))
+
+	save_manifest(merged, manifest_path(dest_dir_path))
+	return report
@@ -0,0 +1,43 @@
+import unittest
+import os, tempfile
+
+from build import build_site
+
+TEMPLATE = "<html><body>{{ Content }}</body></html>"
+
+
+class SiteTestCase(unittest.TestCase):
+	# A throwaway site under a temporary root: content/ and static/ (written by each test case's
+	# setUp), a template, and public/ to build into
+	template_text = TEMPLATE
+
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.root = self.tmp.name
+		self.content = os.path.join(self.root, "content")
+		self.static = os.path.join(self.root, "static")
+		self.public = os.path.join(self.root, "public")
+		self.template = os.path.join(self.root, "template.html")
+
+		self.write(self.template, self.template_text)
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def write(self, path, text):
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+
+		if isinstance(text, bytes):
+			with open(path, "wb") as file:
+				file.write(text)
+		else:
+			with open(path, "w", encoding="utf-8") as file:
+				file.write(text)
+
+	def read(self, *parts):
+		# Relative to public/, an absolute path is read as is
+		with open(os.path.join(self.public, *parts), "r", encoding="utf-8") as file:
+			return file.read()
+
+	def build(self, incremental = True, dest_dir_path = None, **kwargs):
+		return build_site(self.content, self.template, dest_dir_path or self.public, incremental = incremental, **kwargs)
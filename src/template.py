@@ -0,0 +1,76 @@
+import os, re
+
+TEMPLATE_NAME = "template.html"
+SLOT_PATTERN = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+# path -> ((mtime, size), Template)
+_templates = {}
+
+
+class Template():
+	def __init__(self, chunks):
+		# Alternating literal text and slot names: [(literal, None), (None, name), ...]
+		self.chunks = chunks
+
+	def __eq__(self, Template):
+		return self.chunks == Template.chunks
+
+	def __repr__(self):
+		return f"Template({self.slots()})"
+
+	def slots(self):
+		return [name for literal, name in self.chunks if name]
+
+	def render(self, write, context):
+		for literal, name in self.chunks:
+			if name is None:
+				write(literal)
+				continue
+
+			value = context.get(name, "")
+			if callable(value):
+				value(write)
+			else:
+				write(str(value))
+
+
+def compile_template(text):
+	chunks = []
+	position = 0
+
+	for match in SLOT_PATTERN.finditer(text):
+		if match.start() > position:
+			chunks.append((text[position:match.start()], None))
+		chunks.append((None, match.group(1)))
+		position = match.end()
+
+	if position < len(text):
+		chunks.append((text[position:], None))
+
+	return Template(chunks)
+
+
+def load_template(path):
+	stat = os.stat(path)
+	key = (stat.st_mtime_ns, stat.st_size)
+
+	if (cached := _templates.get(path)) and cached[0] == key:
+		return cached[1]
+
+	with open(path, "r", encoding="utf-8") as file:
+		template = compile_template(file.read())
+
+	_templates[path] = (key, template)
+	return template
+
+
+def find_template(relative_dir, dir_path_content, default_path):
+	# The nearest template.html between the page's directory and the content root wins
+	while True:
+		candidate = os.path.join(dir_path_content, relative_dir, TEMPLATE_NAME)
+		if os.path.isfile(candidate):
+			return os.path.normpath(candidate)
+
+		if not relative_dir:
+			return default_path
+		relative_dir = os.path.dirname(relative_dir)
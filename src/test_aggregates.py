@@ -0,0 +1,88 @@
+import unittest
+import os
+
+from aggregates import PAGE_SIZE, rfc822
+from manifest import load_manifest, manifest_path
+from sitetest import SiteTestCase
+
+TEMPLATE = "<title>{{ Title }}</title>{{ Content }}"
+
+
+class TestAggregates(SiteTestCase):
+	template_text = TEMPLATE
+
+	def setUp(self):
+		super().setUp()
+		self.write(os.path.join(self.content, "index.md"), "# Home")
+		self.write(os.path.join(self.content, "blog", "index.md"), "# Blog")
+		self.write(os.path.join(self.content, "blog", "first.md"), "---\ndate: 2024-01-01\n---\n# First & best")
+		self.write(os.path.join(self.content, "blog", "second.md"), "---\ndate: 2024-02-01\n---\n# Second")
+
+	def build(self, feeds = True):
+		return super().build(feeds = feeds, base_url = "https://example.com/")
+
+	def test_sitemap(self):
+		self.build()
+
+		self.assertEqual(self.read("sitemap.xml"), '<?xml version="1.0" encoding="UTF-8"?>\n'
+			'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+			"<url><loc>https://example.com/blog/first.html</loc><lastmod>2024-01-01</lastmod></url>\n"
+			"<url><loc>https://example.com/blog/index.html</loc></url>\n"
+			"<url><loc>https://example.com/blog/second.html</loc><lastmod>2024-02-01</lastmod></url>\n"
+			"<url><loc>https://example.com/index.html</loc></url>\n"
+			"</urlset>\n")
+
+	def test_feed_lists_dated_pages_newest_first(self):
+		self.build()
+		feed = self.read("feed.xml")
+
+		self.assertIn("<title>Home</title>", feed)
+		self.assertLess(feed.index("<title>Second</title>"), feed.index("<title>First &amp; best</title>"))
+		self.assertIn("<pubDate>Thu, 01 Feb 2024 00:00:00 +0000</pubDate>", feed)
+		self.assertEqual(feed.count("<item>"), 2)
+
+	def test_rfc822(self):
+		self.assertEqual(rfc822("2024-02-01"), "Thu, 01 Feb 2024 00:00:00 +0000")
+		self.assertIsNone(rfc822("soon"))
+
+	def test_section_index_is_paginated(self):
+		for i in range(PAGE_SIZE):
+			self.write(os.path.join(self.content, "blog", f"old{i:02}.md"), f"---\ndate: 2023-01-{i + 1:02}\n---\n# Old {i}")
+
+		self.build()
+		first = self.read("blog", "pages", "1.html")
+		second = self.read("blog", "pages", "2.html")
+
+		self.assertTrue(first.startswith("<title>Blog</title><ul><li><a href=\"/blog/second.html\">Second</a> <time>2024-02-01</time></li>"))
+		self.assertIn('<nav><a href="/blog/pages/2.html">Older</a></nav>', first)
+		self.assertIn('<nav><a href="/blog/pages/1.html">Newer</a></nav>', second)
+		self.assertEqual(second.count("<li>"), 3)
+
+	def test_regenerated_only_when_metadata_changes(self):
+		self.assertEqual(self.build().aggregates, [os.path.join("blog", "pages", "1.html"), "feed.xml", "sitemap.xml"])
+
+		# Body edits don't touch the aggregate outputs, nor are they rewritten
+		self.write(os.path.join(self.content, "blog", "first.md"), "---\ndate: 2024-01-01\n---\n# First & best\n\nMore")
+		digest = load_manifest(manifest_path(self.public)).aggregates["digest"]
+		self.assertEqual(self.build().aggregates, [])
+		self.assertEqual(load_manifest(manifest_path(self.public)).aggregates["digest"], digest)
+
+		self.write(os.path.join(self.content, "blog", "first.md"), "---\ndate: 2024-03-01\n---\n# First & best")
+		self.assertEqual(self.build().aggregates, [os.path.join("blog", "pages", "1.html"), "feed.xml", "sitemap.xml"])
+
+	def test_removed_section_and_feeds_off(self):
+		self.build()
+		for name in ["index.md", "first.md", "second.md"]:
+			os.unlink(os.path.join(self.content, "blog", name))
+
+		self.build()
+		self.assertFalse(os.path.exists(os.path.join(self.public, "blog")))
+
+		self.build(feeds = False)
+		self.assertFalse(os.path.exists(os.path.join(self.public, "sitemap.xml")))
+		self.assertFalse(os.path.exists(os.path.join(self.public, "feed.xml")))
+		self.assertIsNone(load_manifest(manifest_path(self.public)).aggregates)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import os
+
+from assets import copy_file, sync_static
+from sitetest import SiteTestCase
+
+
+class TestSyncStatic(SiteTestCase):
+	def setUp(self):
+		super().setUp()
+		self.write(os.path.join(self.static, "index.css"), "body {}")
+		self.write(os.path.join(self.static, "images", "logo.png"), "png bytes")
+
+	def test_first_sync_copies_everything(self):
+		assets, report = sync_static(self.static, self.public, {})
+
+		self.assertEqual(report.copied, ["images/logo.png", "index.css"])
+		self.assertEqual(report.bytes_copied, 16)
+		self.assertEqual(sorted(assets), ["images/logo.png", "index.css"])
+
+	def test_unchanged_files_keep_their_mtime(self):
+		assets, report = sync_static(self.static, self.public, {})
+		mtime = os.stat(os.path.join(self.public, "index.css")).st_mtime_ns
+
+		assets, report = sync_static(self.static, self.public, assets)
+
+		self.assertEqual(report.copied, [])
+		self.assertEqual(report.skipped, 2)
+		self.assertEqual(report.bytes_skipped, 16)
+		self.assertEqual(os.stat(os.path.join(self.public, "index.css")).st_mtime_ns, mtime)
+
+	def test_changed_and_removed_files(self):
+		assets, report = sync_static(self.static, self.public, {})
+
+		self.write(os.path.join(self.static, "index.css"), "body { margin: 0 }")
+		os.unlink(os.path.join(self.static, "images", "logo.png"))
+		assets, report = sync_static(self.static, self.public, assets)
+
+		self.assertEqual(report.copied, ["index.css"])
+		self.assertEqual(report.removed, ["images/logo.png"])
+		self.assertFalse(os.path.exists(os.path.join(self.public, "images")))
+
+	def test_checksum_skips_touched_files(self):
+		assets, report = sync_static(self.static, self.public, {}, checksum = True)
+		os.utime(os.path.join(self.static, "index.css"), ns = (1, 1))
+
+		assets, report = sync_static(self.static, self.public, assets, checksum = True)
+
+		self.assertEqual(report.copied, [])
+		self.assertEqual(assets["index.css"]["mtime"], 1)
+
+	def test_link_assets(self):
+		sync_static(self.static, self.public, {}, link = True)
+
+		self.assertTrue(os.path.samefile(os.path.join(self.static, "index.css"), os.path.join(self.public, "index.css")))
+
+	def test_copy_file_preserves_stat(self):
+		destination = os.path.join(self.root, "copy.css")
+		copy_file(os.path.join(self.static, "index.css"), destination)
+
+		with open(destination, "r", encoding="utf-8") as file:
+			self.assertEqual(file.read(), "body {}")
+		self.assertEqual(os.stat(destination).st_mtime_ns, os.stat(os.path.join(self.static, "index.css")).st_mtime_ns)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+import os, threading, time
+from unittest import mock
+
+import asyncbuild
+from asyncbuild import ASYNC_CHUNK_SIZE, WRITE_BACKLOG, render_pages_async
+from build import BuildError, collect_pages, output_path
+from manifest import load_manifest, manifest_path
+from profiler import Profiler, set_profiler
+from sitetest import SiteTestCase
+
+TEMPLATE = "<html><head><title>{{ Title }}</title></head><body>{{ Content }}</body></html>"
+
+
+class TestAsyncBuild(SiteTestCase):
+	template_text = TEMPLATE
+
+	def setUp(self):
+		super().setUp()
+		for i in range(40):
+			self.write(os.path.join(self.content, f"section{i % 3}", f"{i}.md"),
+				f"# Page {i}\n\nText *{i}* with a [link](/{i})\n\n* one\n* two")
+
+	def tearDown(self):
+		set_profiler(None)
+		super().tearDown()
+
+	def outputs(self):
+		outputs = {}
+		for page in collect_pages(self.content):
+			with open(os.path.join(self.public, output_path(page)), "r", encoding="utf-8") as file:
+				outputs[page] = file.read()
+		return outputs
+
+	def test_matches_streaming_build(self):
+		self.build(incremental = False)
+		expected = self.outputs()
+
+		for jobs in (1, 2):
+			report = self.build(incremental = False, jobs = jobs, async_io = True)
+
+			self.assertEqual(len(report.rendered), 40)
+			self.assertEqual(self.outputs(), expected)
+
+	def test_errors_are_aggregated_per_file(self):
+		with open(os.path.join(self.content, "broken.md"), "wb") as file:
+			file.write(b"# \xff\xfe")
+
+		with self.assertRaises(BuildError) as context:
+			self.build(incremental = False, async_io = True)
+
+		self.assertEqual([source for source, message in context.exception.errors], ["broken.md"])
+		self.assertNotIn("broken.md", load_manifest(manifest_path(self.public)).pages)
+		self.assertTrue(os.path.isfile(os.path.join(self.public, "section0", "0.html")))
+
+	def test_missing_source_is_an_error(self):
+		tasks = [("gone.md", os.path.join(self.content, "gone.md"), self.template, os.path.join(self.public, "gone.html"))]
+
+		errors, outputs = render_pages_async(tasks)
+
+		self.assertEqual(errors[0][0], "gone.md")
+		self.assertIn("FileNotFoundError", errors[0][1])
+		self.assertEqual(outputs, [])
+
+	def test_slow_writes_hold_back_rendering(self):
+		for i in range(40, 300):
+			self.write(os.path.join(self.content, "more", f"{i}.md"), f"# Page {i}")
+		tasks = [(page, os.path.join(self.content, page), self.template, os.path.join(self.public, output_path(page)))
+			for page in collect_pages(self.content)]
+		lock = threading.Lock()
+		counts = {"rendered": 0, "written": 0, "backlog": 0}
+		render_text_chunk = asyncbuild.render_text_chunk
+		write_output = asyncbuild.write_output
+
+		def render(pages, *args):
+			result = render_text_chunk(pages, *args)
+			with lock:
+				counts["rendered"] += len(result[0])
+				counts["backlog"] = max(counts["backlog"], counts["rendered"] - counts["written"])
+			return result
+
+		def write(path, html):
+			time.sleep(0.005)
+			file = write_output(path, html)
+			with lock:
+				counts["written"] += 1
+			return file
+
+		with mock.patch.object(asyncbuild, "render_text_chunk", render), mock.patch.object(asyncbuild, "write_output", write):
+			errors, outputs = render_pages_async(tasks)
+
+		self.assertEqual((errors, len(outputs)), ([], 300))
+		self.assertLessEqual(counts["backlog"], (2 + WRITE_BACKLOG) * ASYNC_CHUNK_SIZE)
+
+	def test_profile_counts_pages(self):
+		profiler = Profiler()
+		set_profiler(profiler)
+		self.build(incremental = False, jobs = 2, async_io = True)
+
+		self.assertEqual(profiler.counters["pages"], 40)
+		self.assertEqual(len(profiler.pages), 40)
+
+
+if __name__ == "__main__":
+	unittest.main()
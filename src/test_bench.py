@@ -0,0 +1,63 @@
+import unittest
+import os, tempfile
+
+from bench import INLINE_MIX, STAGES, check_mix, compare, generate_corpus, run_bench
+
+
+class TestBench(unittest.TestCase):
+	def test_generate_corpus_is_deterministic(self):
+		with tempfile.TemporaryDirectory() as first, tempfile.TemporaryDirectory() as second:
+			paths = generate_corpus(first, 120, blocks = 5, seed = 3)
+			generate_corpus(second, 120, blocks = 5, seed = 3)
+
+			self.assertEqual(len(paths), 120)
+			self.assertTrue(os.path.isdir(os.path.join(first, "section1")))
+
+			for path in paths:
+				with open(path, encoding="utf-8") as a, open(os.path.join(second, os.path.relpath(path, first)), encoding="utf-8") as b:
+					self.assertEqual(a.read(), b.read())
+
+	def test_generate_corpus_mix(self):
+		with tempfile.TemporaryDirectory() as root:
+			[path] = generate_corpus(root, 1, blocks = 10, mix = {"code": 1}, inline_mix = {})
+
+			with open(path, encoding="utf-8") as file:
+				markdown = file.read()
+
+		self.assertEqual(markdown.count("```"), 20)
+		self.assertNotIn("](", markdown)
+
+	def test_check_mix(self):
+		self.assertEqual(check_mix({"link": 0.5}, INLINE_MIX, 1), {"link": 0.5})
+
+		for mix in [{"links": 0.5}, {"link": 2}, {"link": -1}, {"link": "often"}, ["link"]]:
+			with self.assertRaises(ValueError):
+				check_mix(mix, INLINE_MIX, 1)
+
+		with tempfile.TemporaryDirectory() as root, self.assertRaises(ValueError):
+			generate_corpus(root, 1, mix = {"table": 1})
+
+	def test_run_bench(self):
+		result = run_bench(pages = 5, blocks = 4, cold_start_runs = 1)
+
+		self.assertEqual(list(result["stages"]), STAGES)
+		self.assertEqual(result["counters"]["pages"], 5)
+		self.assertGreater(result["counters"]["blocks"], 0)
+		self.assertIn("full_seconds", result["build"])
+		self.assertGreater(result["cold_start"]["seconds"], result["cold_start"]["python_seconds"])
+
+	def test_compare(self):
+		baseline = {"stages": {"read": {"us_per_page": 10.0}, "disk_write": {"us_per_page": 10.0}}}
+		result = {"stages": {"read": {"us_per_page": 12.0}, "disk_write": {"us_per_page": 10.5}}}
+
+		self.assertEqual(list(compare(result, baseline, threshold = 0.1)), ["read"])
+
+	def test_compare_cold_start(self):
+		baseline = {"stages": {}, "cold_start": {"seconds": 0.1}}
+
+		self.assertEqual(list(compare({"stages": {}, "cold_start": {"seconds": 0.15}}, baseline)), ["cold_start"])
+		self.assertEqual(compare({"stages": {}, "cold_start": {"seconds": 0.105}}, baseline), {})
+
+
+if __name__ == "__main__":
+	unittest.main()
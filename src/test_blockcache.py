@@ -0,0 +1,92 @@
+import unittest
+import os, tempfile
+
+from blockcache import BlockCache, get_block_cache, open_block_cache
+from build import build_site
+from profiler import Profiler, set_profiler
+
+
+class TestBlockCache(unittest.TestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.path = os.path.join(self.tmp.name, "cache", "blocks.sqlite")
+
+	def tearDown(self):
+		set_profiler(None)
+		self.tmp.cleanup()
+
+	def test_get_and_put(self):
+		cache = BlockCache(self.path, 1)
+		self.assertIsNone(cache.get("# Title"))
+
+		cache.put("# Title", "<h1>Title</h1>", "Title")
+		cache.flush()
+
+		self.assertEqual(cache.get("# Title"), ("<h1>Title</h1>", "Title", ()))
+		self.assertEqual((cache.hits, cache.misses), (1, 1))
+		cache.close()
+
+		self.assertEqual(BlockCache(self.path, 1).get("# Title"), ("<h1>Title</h1>", "Title", ()))
+
+	def test_targets_round_trip(self):
+		cache = BlockCache(self.path, 1)
+		cache.put("[a](/a.html)", "<p>...</p>", "a", [("link", "/a.html"), ("image", "/b.png")])
+		cache.flush()
+
+		self.assertEqual(cache.get("[a](/a.html)")[2], (("link", "/a.html"), ("image", "/b.png")))
+
+	def test_new_renderer_version_invalidates(self):
+		cache = BlockCache(self.path, 1)
+		cache.put("# Title", "<h1>Title</h1>")
+		cache.close()
+
+		self.assertIsNone(BlockCache(self.path, 2).get("# Title"))
+
+	def test_lru_eviction(self):
+		cache = BlockCache(self.path, 1, max_bytes = 100)
+
+		for i in range(3):
+			cache.put(f"block {i}", "x" * 30)
+			cache.flush()
+
+		# Reading block 0 makes block 1 the least recently used
+		cache.get("block 0")
+		cache.put("block 3", "x" * 30)
+		cache.flush()
+
+		self.assertLessEqual(cache.size(), 100)
+		self.assertIsNotNone(cache.get("block 0"))
+		self.assertIsNone(cache.get("block 1"))
+
+	def test_open_block_cache_reuses_connection(self):
+		self.assertIs(open_block_cache(self.path, 1), open_block_cache(self.path, 1))
+
+	def test_build_reuses_unchanged_blocks(self):
+		content = os.path.join(self.tmp.name, "content")
+		template = os.path.join(self.tmp.name, "template.html")
+		public = os.path.join(self.tmp.name, "public")
+		os.makedirs(content)
+
+		with open(template, "w", encoding="utf-8") as file:
+			file.write("{{ Content }}")
+		with open(os.path.join(content, "index.md"), "w", encoding="utf-8") as file:
+			file.write("# Title\n\nFirst *paragraph*\n\nSecond paragraph")
+
+		build_site(content, template, public, cache_path = self.path)
+		with open(os.path.join(content, "index.md"), "w", encoding="utf-8") as file:
+			file.write("# Title\n\nFirst *paragraph*\n\nEdited paragraph")
+
+		profiler = Profiler()
+		set_profiler(profiler)
+		build_site(content, template, public, cache_path = self.path)
+
+		self.assertEqual(profiler.counters["block_cache_hits"], 2)
+		self.assertEqual(profiler.counters["block_cache_misses"], 1)
+		self.assertIsNone(get_block_cache())
+
+		with open(os.path.join(public, "index.html"), encoding="utf-8") as file:
+			self.assertEqual(file.read(), "<div><h1>Title</h1><p>First <i>paragraph</i></p><p>Edited paragraph</p></div>")
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,226 @@
+import unittest
+import os, subprocess, sys
+
+from build import BuildError, chunk_pages, collect_pages, output_path, rebuild_paths
+from manifest import hash_file, load_manifest, manifest_path, save_manifest
+from sitetest import SiteTestCase
+
+
+class TestBuildSite(SiteTestCase):
+	def setUp(self):
+		super().setUp()
+		self.write(os.path.join(self.content, "index.md"), "# Home")
+		self.write(os.path.join(self.content, "blog", "post.md"), "Some **bold** text")
+
+	def test_collect_pages(self):
+		self.assertEqual(collect_pages(self.content), [os.path.join("blog", "post.md"), "index.md"])
+		self.assertEqual(output_path(os.path.join("blog", "post.md")), os.path.join("blog", "post.html"))
+
+	def test_first_build_renders_everything(self):
+		report = self.build()
+
+		self.assertEqual(len(report.rendered), 2)
+		self.assertTrue(os.path.isfile(os.path.join(self.public, "blog", "post.html")))
+
+		manifest = load_manifest(manifest_path(self.public))
+		self.assertEqual(manifest.outputs(), {"index.html", os.path.join("blog", "post.html")})
+
+	def test_manifest_stays_out_of_the_output(self):
+		self.build()
+		legacy_path = os.path.join(self.public, ".manifest.json")
+		os.replace(manifest_path(self.public), legacy_path)
+
+		report = self.build()
+
+		self.assertEqual(report.skipped, 2)
+		self.assertFalse(os.path.exists(legacy_path))
+		self.assertEqual(manifest_path(self.public), os.path.join(self.root, ".cache", "public.manifest.json"))
+		self.assertTrue(os.path.isfile(manifest_path(self.public)))
+
+	def test_unchanged_build_skips(self):
+		self.build()
+		report = self.build()
+
+		self.assertEqual(report.rendered, [])
+		self.assertEqual(report.skipped, 2)
+
+	def test_changed_source_rerenders(self):
+		self.build()
+		self.write(os.path.join(self.content, "index.md"), "# New home")
+		report = self.build()
+
+		self.assertEqual(report.rendered, ["index.md"])
+
+	def test_renderer_change_rerenders_all(self):
+		self.build()
+		manifest = load_manifest(manifest_path(self.public))
+		manifest.renderer -= 1
+		save_manifest(manifest, manifest_path(self.public))
+
+		report = self.build()
+
+		self.assertEqual(len(report.rendered), 2)
+		self.assertEqual(self.build().skipped, 2)
+
+	def test_changed_template_rerenders_all(self):
+		self.build()
+		self.write(self.template, "<main>{{ Content }}</main>")
+		report = self.build()
+
+		self.assertEqual(len(report.rendered), 2)
+
+	def test_identical_outputs_are_not_rewritten(self):
+		self.build()
+		output = os.path.join(self.public, "index.html")
+		os.utime(output, ns = (0, 0))
+
+		report = self.build(incremental = False)
+
+		self.assertEqual((len(report.written), report.unchanged), (0, 2))
+		self.assertEqual(os.stat(output).st_mtime_ns, 0)
+
+		self.write(os.path.join(self.content, "index.md"), "# Changed")
+		report = self.build()
+
+		self.assertEqual((report.written, report.unchanged), (["index.md"], 0))
+		self.assertNotEqual(os.stat(output).st_mtime_ns, 0)
+
+	def test_manifest_records_output_hash(self):
+		self.build()
+		manifest = load_manifest(manifest_path(self.public))
+
+		self.assertEqual(manifest.pages["index.md"]["output_hash"], hash_file(os.path.join(self.public, "index.html")))
+
+		# Skipped pages keep the hash of the output they left on disk
+		self.write(os.path.join(self.content, "blog", "post.md"), "Other text")
+		report = self.build()
+		pages = load_manifest(manifest_path(self.public)).pages
+
+		self.assertEqual(report.skipped, 1)
+		self.assertEqual(pages["index.md"]["output_hash"], manifest.pages["index.md"]["output_hash"])
+
+	def test_directory_template_override(self):
+		self.build()
+		self.write(os.path.join(self.content, "blog", "template.html"), "<blog>{{ Title }}{{ Content }}</blog>")
+		report = self.build()
+
+		self.assertEqual(report.rendered, [os.path.join("blog", "post.md")])
+		self.assertEqual(self.read(os.path.join(self.public, "blog", "post.html")),
+			"<blog><div><p>Some <b>bold</b> text</p></div></blog>")
+		self.assertEqual(self.read(os.path.join(self.public, "index.html")),
+			"<html><body><div><h1>Home</h1></div></body></html>")
+
+	def test_removed_source_deletes_output(self):
+		self.build()
+		os.unlink(os.path.join(self.content, "blog", "post.md"))
+		report = self.build()
+
+		self.assertEqual(report.removed, [os.path.join("blog", "post.md")])
+		self.assertFalse(os.path.exists(os.path.join(self.public, "blog")))
+
+	def test_static_assets_sync(self):
+		self.write(os.path.join(self.static, "index.css"), "body {}")
+
+		report = self.build(incremental = False, dir_path_static = self.static)
+		self.assertEqual(report.assets.copied, ["index.css"])
+
+		os.unlink(os.path.join(self.static, "index.css"))
+		report = self.build(incremental = False, dir_path_static = self.static)
+		self.assertEqual(report.assets.removed, ["index.css"])
+		self.assertTrue(os.path.isfile(os.path.join(self.public, "index.html")))
+
+	def test_full_build_ignores_manifest(self):
+		self.build()
+		report = self.build(incremental = False)
+
+		self.assertEqual(len(report.rendered), 2)
+
+	def test_parallel_build_matches_serial(self):
+		for i in range(20):
+			self.write(os.path.join(self.content, "many", f"{i}.md"), f"# Page {i}\n\nText *{i}*")
+
+		self.build(incremental = False)
+		serial = {page: self.read(os.path.join(self.public, output_path(page))) for page in collect_pages(self.content)}
+
+		report = self.build(incremental = False, jobs = 4)
+		parallel = {page: self.read(os.path.join(self.public, output_path(page))) for page in collect_pages(self.content)}
+
+		self.assertEqual(len(report.rendered), 22)
+		self.assertEqual(serial, parallel)
+
+	def test_errors_are_aggregated_per_file(self):
+		# Sources that aren't valid UTF-8 fail to read
+		for path in [os.path.join(self.content, "broken.md"), os.path.join(self.content, "blog", "broken.md")]:
+			with open(path, "wb") as file:
+				file.write(b"# \xff\xfe")
+
+		with self.assertRaises(BuildError) as context:
+			self.build(jobs = 2)
+
+		self.assertEqual([source for source, message in context.exception.errors],
+			[os.path.join("blog", "broken.md"), "broken.md"])
+		self.assertTrue(os.path.isfile(os.path.join(self.public, "index.html")))
+
+		manifest = load_manifest(manifest_path(self.public))
+		self.assertNotIn("broken.md", manifest.pages)
+
+	def test_plain_build_skips_unused_stages(self):
+		# Without a cache, compression or search their modules (and sqlite3) are never imported
+		code = ("import sys; from build import build_site; "
+			f"build_site({self.content!r}, {self.template!r}, {self.public!r}); "
+			"print(*[name for name in ('blockcache', 'sqlite3', 'compress', 'search') if name in sys.modules])")
+		result = subprocess.run([sys.executable, "-c", code], cwd = os.path.dirname(os.path.abspath(__file__)),
+			capture_output = True, text = True, check = True)
+
+		self.assertEqual(result.stdout.strip(), "")
+		self.assertTrue(os.path.isfile(os.path.join(self.public, "index.html")))
+
+	def test_chunk_pages(self):
+		chunks = chunk_pages(list(range(10)), 2)
+
+		self.assertEqual(sum(chunks, []), list(range(10)))
+		self.assertEqual(len(chunk_pages(list(range(100000)), 2)[0]), 256)
+
+	def test_rebuild_paths(self):
+		self.build()
+		manifest = load_manifest(manifest_path(self.public))
+		post = os.path.join(self.content, "blog", "post.md")
+
+		self.write(post, "Changed")
+		report = rebuild_paths(manifest, [post], self.content, self.template, self.public)
+		self.assertEqual(report.rendered, [os.path.join("blog", "post.md")])
+		self.assertEqual(self.read(os.path.join(self.public, "blog", "post.html")),
+			"<html><body><div><p>Changed</p></div></body></html>")
+
+		override = os.path.join(self.content, "blog", "template.html")
+		self.write(override, "<blog>{{ Content }}</blog>")
+		report = rebuild_paths(manifest, [override], self.content, self.template, self.public)
+		self.assertEqual(report.rendered, [os.path.join("blog", "post.md")])
+		self.assertEqual(manifest.pages[os.path.join("blog", "post.md")]["template"], override)
+
+		report = rebuild_paths(manifest, [self.template], self.content, self.template, self.public)
+		self.assertEqual(report.rendered, ["index.md"])
+
+		os.unlink(post)
+		report = rebuild_paths(manifest, [post], self.content, self.template, self.public)
+		self.assertEqual(report.removed, [os.path.join("blog", "post.md")])
+		self.assertEqual(load_manifest(manifest_path(self.public)), manifest)
+
+	def test_rebuild_paths_directory_removed(self):
+		self.write(os.path.join(self.content, "blog", "drafts", "idea.md"), "Idea")
+		self.build()
+		manifest = load_manifest(manifest_path(self.public))
+		blog = os.path.join(self.content, "blog")
+
+		os.rename(blog, os.path.join(self.root, "elsewhere"))
+		report = rebuild_paths(manifest, [blog], self.content, self.template, self.public, save = False)
+
+		# Watch mode saves the manifest itself once browsers were told to reload
+		self.assertEqual(len(load_manifest(manifest_path(self.public)).pages), 3)
+		self.assertEqual(sorted(report.removed), [os.path.join("blog", "drafts", "idea.md"), os.path.join("blog", "post.md")])
+		self.assertEqual(list(manifest.pages), ["index.md"])
+		self.assertFalse(os.path.exists(os.path.join(self.public, "blog", "post.html")))
+
+
+if __name__ == "__main__":
+	unittest.main()
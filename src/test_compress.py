@@ -0,0 +1,93 @@
+import unittest
+import gzip, os
+
+from compress import available_encodings, compress_file, compress_outputs
+from sitetest import SiteTestCase
+
+LONG_TEXT = "Lorem ipsum dolor sit amet. " * 100
+
+
+class TestCompress(SiteTestCase):
+	def setUp(self):
+		super().setUp()
+		self.write(os.path.join(self.content, "index.md"), "# Home\n\n" + LONG_TEXT)
+		self.write(os.path.join(self.content, "short.md"), "# Short")
+		self.write(os.path.join(self.static, "index.css"), "body { color: red; }\n" * 100)
+		self.write(os.path.join(self.static, "logo.png"), "not really a png " * 100)
+
+	def build(self, compress = True, incremental = True):
+		return super().build(incremental, dir_path_static = self.static, compress = compress)
+
+	def public_path(self, *parts):
+		return os.path.join(self.public, *parts)
+
+	def test_compress_file(self):
+		path = self.public_path("page.html")
+		self.write(path, LONG_TEXT)
+
+		size, sizes = compress_file(path, [".gz"])
+
+		self.assertEqual(size, len(LONG_TEXT))
+		self.assertLess(sizes[".gz"], size)
+		with gzip.open(path + ".gz", "rt", encoding="utf-8") as file:
+			self.assertEqual(file.read(), LONG_TEXT)
+		self.assertEqual(os.stat(path + ".gz").st_mtime_ns, os.stat(path).st_mtime_ns)
+
+	def test_small_files_are_skipped(self):
+		path = self.public_path("small.html")
+		self.write(path, "<p>hi</p>")
+
+		self.assertIsNone(compress_file(path, [".gz"]))
+		self.assertFalse(os.path.exists(path + ".gz"))
+
+	def test_only_text_outputs(self):
+		self.write(self.public_path("a.html"), LONG_TEXT)
+		self.write(self.public_path("b.png"), LONG_TEXT)
+
+		report = compress_outputs(self.public, ["a.html", "b.png"], [".gz"])
+
+		self.assertEqual(report.compressed, ["a.html"])
+		self.assertFalse(os.path.exists(self.public_path("b.png.gz")))
+
+	def test_build_compresses_written_outputs(self):
+		report = self.build()
+
+		self.assertEqual(sorted(report.compressed.compressed), ["index.css", "index.html"])
+		for suffix in available_encodings():
+			self.assertTrue(os.path.isfile(self.public_path("index.html" + suffix)))
+		self.assertFalse(os.path.exists(self.public_path("short.html.gz")))
+		self.assertFalse(os.path.exists(self.public_path("logo.png.gz")))
+
+		# Nothing changed, nothing is recompressed
+		report = self.build(incremental = False)
+		self.assertEqual(report.compressed.compressed, [])
+
+		self.write(os.path.join(self.content, "index.md"), "# Home\n\n" + LONG_TEXT + "More.")
+		report = self.build()
+		self.assertEqual(report.compressed.compressed, ["index.html"])
+
+	def test_deleted_outputs_lose_their_siblings(self):
+		self.build()
+		os.unlink(os.path.join(self.content, "index.md"))
+		os.unlink(os.path.join(self.static, "index.css"))
+		self.build()
+
+		self.assertFalse(os.path.exists(self.public_path("index.html.gz")))
+		self.assertFalse(os.path.exists(self.public_path("index.css.gz")))
+
+	def test_toggling_compression(self):
+		self.build(compress = False)
+		self.assertFalse(os.path.exists(self.public_path("index.html.gz")))
+
+		# Turning it on compresses outputs this build didn't touch
+		self.build()
+		self.assertTrue(os.path.isfile(self.public_path("index.html.gz")))
+		self.assertTrue(os.path.isfile(self.public_path("index.css.gz")))
+
+		self.build(compress = False)
+		self.assertFalse(os.path.exists(self.public_path("index.html.gz")))
+		self.assertFalse(os.path.exists(self.public_path("index.css.gz")))
+
+
+if __name__ == "__main__":
+	unittest.main()
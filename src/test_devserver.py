@@ -0,0 +1,183 @@
+import unittest
+import gzip, http.client, os, tempfile, threading, urllib.error, urllib.request
+
+from devserver import LiveReload, RELOAD_SCRIPT, accepted_encodings, byte_range, make_server
+from manifest import Manifest, manifest_path, save_manifest
+
+
+class TestDevServer(unittest.TestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		with open(os.path.join(self.tmp.name, "index.html"), "w", encoding="utf-8") as file:
+			file.write("<html><body><p>Hi</p></body></html>")
+
+		self.live_reload = LiveReload()
+		self.server = make_server(self.tmp.name, 0, self.live_reload, host = "127.0.0.1")
+		threading.Thread(target = self.server.serve_forever, daemon = True).start()
+		self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+	def tearDown(self):
+		self.server.shutdown()
+		self.server.server_close()
+		self.tmp.cleanup()
+
+	def test_injects_reload_script(self):
+		with urllib.request.urlopen(self.url + "/") as response:
+			body = response.read()
+
+		self.assertEqual(body, b"<html><body><p>Hi</p>" + RELOAD_SCRIPT + b"</body></html>")
+
+	def test_hides_temporary_pages(self):
+		os.makedirs(os.path.join(self.tmp.name, ".well-known"))
+		for name in (os.path.join(".well-known", "index.html"), "index.html.tmp"):
+			with open(os.path.join(self.tmp.name, name), "w", encoding="utf-8") as file:
+				file.write("<p>Known</p>")
+
+		with urllib.request.urlopen(self.url + "/.well-known/") as response:
+			self.assertIn(b"Known", response.read())
+
+		with self.assertRaises(urllib.error.HTTPError) as context:
+			urllib.request.urlopen(self.url + "/index.html.tmp")
+		self.assertEqual(context.exception.code, 404)
+		context.exception.close()
+
+	def test_live_reload_wait(self):
+		self.assertEqual(self.live_reload.wait(0, 0), 0)
+		threading.Timer(0.01, self.live_reload.notify).start()
+		self.assertEqual(self.live_reload.wait(0, 2), 1)
+
+
+class TestPreviewServer(unittest.TestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.page = b"<html><body>" + b"<p>Hi</p>" * 200 + b"</body></html>"
+		self.write("index.html", self.page)
+		self.write("index.html.gz", gzip.compress(self.page, mtime = 0))
+		self.write("movie.bin", bytes(range(256)) * 4)
+
+		save_manifest(Manifest(pages = {"index.md": {"output": "index.html", "output_hash": "ab" * 32}}),
+			manifest_path(self.tmp.name))
+
+		self.server = make_server(self.tmp.name, 0, host = "127.0.0.1")
+		threading.Thread(target = self.server.serve_forever, daemon = True).start()
+		self.connection = http.client.HTTPConnection("127.0.0.1", self.server.server_address[1])
+
+	def tearDown(self):
+		self.connection.close()
+		self.server.shutdown()
+		self.server.server_close()
+		self.tmp.cleanup()
+
+	def write(self, name, data):
+		with open(os.path.join(self.tmp.name, name), "wb") as file:
+			file.write(data)
+
+	def get(self, path, method = "GET", **headers):
+		self.connection.request(method, path, headers = {name.replace("_", "-"): value for name, value in headers.items()})
+		response = self.connection.getresponse()
+		return response, response.read()
+
+	def test_accepted_encodings(self):
+		self.assertEqual(accepted_encodings("gzip, deflate, br"), {"gzip", "br"})
+		self.assertEqual(accepted_encodings("br;q=0, *;q=0.5"), {"gzip", "zstd"})
+		self.assertEqual(accepted_encodings("gzip;q=0"), set())
+		self.assertEqual(accepted_encodings(""), set())
+
+	def test_byte_range(self):
+		self.assertEqual(byte_range("bytes=0-9", 100), (0, 9))
+		self.assertEqual(byte_range("bytes=90-", 100), (90, 99))
+		self.assertEqual(byte_range("bytes=-10", 100), (90, 99))
+		self.assertEqual(byte_range("bytes=50-500", 100), (50, 99))
+		self.assertIs(byte_range("bytes=100-", 100), False)
+		self.assertIs(byte_range("bytes=-0", 100), False)
+		self.assertIsNone(byte_range("bytes=0-1,5-6", 100))
+		self.assertIsNone(byte_range("bytes=9-0", 100))
+
+	def test_manifest_etags_and_not_modified(self):
+		response, body = self.get("/")
+
+		self.assertEqual(response.status, 200)
+		self.assertEqual(body, self.page)
+		self.assertEqual(response.getheader("ETag"), f'"{"ab" * 16}"')
+		self.assertEqual(response.getheader("Vary"), "Accept-Encoding")
+
+		response, body = self.get("/index.html", If_None_Match = response.getheader("ETag"))
+		self.assertEqual(response.status, 304)
+		self.assertEqual(body, b"")
+
+		# Files the manifest doesn't hash are tagged by size and mtime
+		response, body = self.get("/movie.bin")
+		stat = os.stat(os.path.join(self.tmp.name, "movie.bin"))
+		self.assertEqual(response.getheader("ETag"), f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"')
+		self.assertIsNone(response.getheader("Vary"))
+
+		# A page rewritten after the manifest was saved doesn't get the hash of what it replaced
+		page = os.path.join(self.tmp.name, "index.html")
+		manifest = os.stat(manifest_path(self.tmp.name)).st_mtime_ns
+		os.utime(page, ns = (manifest + 1, manifest + 1))
+		response, body = self.get("/index.html", If_None_Match = f'"{"ab" * 16}"')
+		self.assertEqual(response.status, 200)
+		self.assertEqual(response.getheader("ETag"), f'"{len(self.page):x}-{manifest + 1:x}"')
+
+	def test_serves_precompressed_siblings(self):
+		response, body = self.get("/index.html", Accept_Encoding = "br, gzip")
+
+		self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+		self.assertEqual(gzip.decompress(body), self.page)
+		self.assertEqual(response.getheader("ETag"), f'"{"ab" * 16}-gzip"')
+		self.assertEqual(response.getheader("Content-Type"), "text/html")
+
+		response, body = self.get("/index.html", Accept_Encoding = "gzip;q=0")
+		self.assertIsNone(response.getheader("Content-Encoding"))
+		self.assertEqual(body, self.page)
+
+		# A sibling older than the file is left over from an earlier build
+		os.utime(os.path.join(self.tmp.name, "index.html.gz"), ns = (0, 0))
+		response, body = self.get("/index.html", Accept_Encoding = "gzip")
+		self.assertIsNone(response.getheader("Content-Encoding"))
+
+	def test_ranges(self):
+		data = bytes(range(256)) * 4
+
+		response, body = self.get("/movie.bin", Range = "bytes=10-19")
+		self.assertEqual(response.status, 206)
+		self.assertEqual(body, data[10:20])
+		self.assertEqual(response.getheader("Content-Range"), "bytes 10-19/1024")
+
+		response, body = self.get("/movie.bin", Range = "bytes=-24")
+		self.assertEqual(body, data[-24:])
+
+		response, body = self.get("/movie.bin", Range = "bytes=2000-")
+		self.assertEqual(response.status, 416)
+		self.assertEqual(response.getheader("Content-Range"), "bytes */1024")
+
+		# A range against a representation the client no longer has gets the whole file
+		response, body = self.get("/movie.bin", Range = "bytes=10-19", If_Range = '"stale"')
+		self.assertEqual(response.status, 200)
+		self.assertEqual(body, data)
+
+	def test_head_and_keep_alive(self):
+		response, body = self.get("/movie.bin", method = "HEAD")
+
+		self.assertEqual(response.status, 200)
+		self.assertEqual(response.getheader("Content-Length"), "1024")
+		self.assertEqual(body, b"")
+
+		# Both requests went over the one connection
+		response, body = self.get("/missing.html")
+		self.assertEqual(response.status, 404)
+		response, body = self.get("/movie.bin")
+		self.assertEqual(len(body), 1024)
+
+	def test_hides_build_files(self):
+		self.write(".manifest.json", b"{}")
+		self.write(".search.json", b"{}")
+		self.write("index.html.tmp", self.page)
+
+		for path in ["/.manifest.json", "/%2Esearch.json", "/blog/../.search.json", "/index.html.tmp"]:
+			for method in ("GET", "HEAD"):
+				response, body = self.get(path, method = method)
+				self.assertEqual(response.status, 404)
+
+if __name__ == "__main__":
+	unittest.main()
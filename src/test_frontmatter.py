@@ -0,0 +1,79 @@
+import unittest
+import os, tempfile
+
+from frontmatter import parse_front_matter, split_front_matter
+from manifest import load_manifest, manifest_path
+from sitetest import SiteTestCase
+from textnode import page_context, page_metadata, render_page
+
+
+class TestFrontMatter(unittest.TestCase):
+	def test_parse(self):
+		metadata = parse_front_matter([
+			"title: \"A: B\"\n",
+			"date: 2024-05-01\n",
+			"tags: [tolkien, 'books']\n",
+			"# a comment\n",
+			"Draft: yes\n",
+		])
+
+		self.assertEqual(metadata, {"title": "A: B", "date": "2024-05-01", "tags": ["tolkien", "books"], "draft": "yes"})
+
+	def test_comma_separated_tags(self):
+		self.assertEqual(parse_front_matter(["tags: a, b ,c"]), {"tags": ["a", "b", "c"]})
+
+	def test_split_consumes_only_the_header(self):
+		lines = iter(["---", "title: Post", "---", "# Heading", "body"])
+		metadata, body = split_front_matter(lines)
+
+		self.assertEqual(metadata, {"title": "Post"})
+		self.assertEqual(next(lines), "# Heading")
+
+	def test_without_front_matter(self):
+		metadata, body = split_front_matter(["# Heading", "body"])
+
+		self.assertEqual(metadata, {})
+		self.assertEqual(list(body), ["# Heading", "body"])
+
+	def test_unclosed_fence_is_body(self):
+		metadata, body = split_front_matter(["---", "title: Post", "body"])
+
+		self.assertEqual(metadata, {})
+		self.assertEqual(list(body), ["---", "title: Post", "body"])
+
+	def test_title_falls_back_to_first_h1(self):
+		self.assertEqual(page_metadata(["---", "date: 2024-01-01", "---", "", "# Heading"]),
+			{"date": "2024-01-01", "title": "Heading"})
+		self.assertEqual(page_metadata(["---", "title: Set", "---", "# Heading"])["title"], "Set")
+
+	def test_page_context(self):
+		context = page_context({"title": "Post", "tags": ["a", "b"]}, {"Title": "Override"})
+
+		self.assertEqual(context, {"Title": "Override", "Tags": "a, b"})
+
+	def test_render_page_skips_front_matter(self):
+		with tempfile.TemporaryDirectory() as root:
+			template = os.path.join(root, "template.html")
+			with open(template, "w", encoding="utf-8") as file:
+				file.write("<title>{{ Title }}</title><time>{{ Date }}</time><p>{{ Tags }}</p>{{ Content }}")
+
+			html = render_page("---\ntitle: Post\ndate: 2024-05-01\ntags: a, b\n---\n\nHello", template)
+
+		self.assertEqual(html, "<title>Post</title><time>2024-05-01</time><p>a, b</p><div><p>Hello</p></div>")
+
+
+class TestFrontMatterBuild(SiteTestCase):
+	template_text = "<title>{{ Title }}</title>{{ Content }}"
+
+	def test_build_stores_metadata_in_manifest(self):
+		self.write(os.path.join(self.content, "post.md"), "---\ndate: 2024-05-01\ntags: [a]\n---\n# Post\n\nBody")
+
+		self.build()
+
+		manifest = load_manifest(manifest_path(self.public))
+		self.assertEqual(manifest.pages["post.md"]["meta"], {"date": "2024-05-01", "tags": ["a"], "title": "Post"})
+		self.assertEqual(self.read("post.html"), "<title>Post</title><div><h1>Post</h1><p>Body</p></div>")
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 
-from htmlnode import HTMLNode, LeafNode, ParentNode
+from htmlnode import HTMLNode, LeafNode, ParentNode, write_html
+import io
 
 class TestHTMLNode(unittest.TestCase):
 	def test_eq(self):
@@ -68,6 +69,34 @@ class TestParentNode(unittest.TestCase):
 
 		self.assertEqual(node.to_html(), result)
 
+	def test_write_html_to_stream(self):
+		node = ParentNode(tag = "ul", children = [
+			ParentNode(tag = "li", children = [LeafNode(tag = "a", value = "Home", props = {"href": "/"})]),
+			ParentNode(tag = "li", children = [LeafNode(value = "Plain")])])
+
+		stream = io.StringIO()
+		write_html(node, stream.write)
+
+		self.assertEqual(stream.getvalue(), '<ul><li><a href="/">Home</a></li><li>Plain</li></ul>')
+		self.assertEqual(node.to_html(), stream.getvalue())
+
+	def test_deep_tree(self):
+		node = LeafNode(tag = "b", value = "deep")
+		for _ in range(5000):
+			node = ParentNode(tag = "span", children = [node])
+
+		html = node.to_html()
+
+		self.assertTrue(html.startswith("<span>" * 5000 + "<b>deep</b>"))
+		self.assertEqual(len(html), 5000 * len("<span></span>") + len("<b>deep</b>"))
+
+	def test_slots(self):
+		node = LeafNode(tag = "p", value = "text")
+
+		self.assertFalse(hasattr(node, "__dict__"))
+		with self.assertRaises(AttributeError):
+			node.extra = True
+
 if __name__ == "__main__":
 	unittest.main()
 
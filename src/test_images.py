@@ -0,0 +1,145 @@
+import unittest
+import os, shutil, struct, tempfile
+from unittest import mock
+
+import images
+
+from images import cached_variant, image_size, plan_variants, stale_pages
+from sitetest import SiteTestCase
+
+
+def png(width, height):
+	return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", width, height) + b"\x08\x06\x00\x00\x00"
+
+
+def copy_variant(source, cache_file, width):
+	# Stands in for Pillow, each variant is a copy of its image
+	os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+	shutil.copyfile(source, cache_file)
+
+
+class TestImageSize(unittest.TestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def size(self, data):
+		path = os.path.join(self.tmp.name, "image")
+		with open(path, "wb") as file:
+			file.write(data)
+		return image_size(path)
+
+	def test_png_and_gif(self):
+		self.assertEqual(self.size(png(1344, 896)), (1344, 896))
+		self.assertEqual(self.size(b"GIF89a" + struct.pack("<HH", 16, 9) + b"\x00" * 8), (16, 9))
+
+	def test_jpeg_skips_segments_before_the_frame(self):
+		app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x00" * 9
+		sof = b"\xff\xc0" + struct.pack(">HBHH", 17, 8, 600, 800) + b"\x00" * 10
+
+		self.assertEqual(self.size(b"\xff\xd8" + app0 + sof), (800, 600))
+		self.assertIsNone(self.size(b"\xff\xd8" + app0))
+
+	def test_webp(self):
+		def riff(chunk, payload):
+			return b"RIFF" + struct.pack("<I", 100) + b"WEBP" + chunk + struct.pack("<I", 50) + payload
+
+		lossy = riff(b"VP8 ", b"\x00" * 3 + b"\x9d\x01\x2a" + struct.pack("<HH", 640, 480))
+		lossless = riff(b"VP8L", b"\x2f" + ((640 - 1) | (480 - 1) << 14).to_bytes(4, "little") + b"\x00" * 5)
+		extended = riff(b"VP8X", b"\x00" * 4 + (640 - 1).to_bytes(3, "little") + (480 - 1).to_bytes(3, "little"))
+
+		for data in (lossy, lossless, extended):
+			self.assertEqual(self.size(data), (640, 480))
+
+	def test_unknown_or_missing(self):
+		self.assertIsNone(self.size(b"not an image at all, just text"))
+		self.assertIsNone(image_size(os.path.join(self.tmp.name, "missing.png")))
+
+
+class TestImageStage(SiteTestCase):
+	template_text = b"{{ Content }}"
+
+	def setUp(self):
+		super().setUp()
+		self.write(os.path.join(self.static, "images", "a.png"), png(200, 100))
+		self.write(os.path.join(self.content, "index.md"), b"![A](/images/a.png)")
+		self.write(os.path.join(self.content, "blog", "post.md"), b"![A](../images/a.png) ![B](/images/b.png)")
+		self.write(os.path.join(self.content, "plain.md"), b"No images")
+
+	def build(self, **kwargs):
+		return super().build(dir_path_static = self.static, images = True, **kwargs)
+
+	def test_dimensions_are_injected(self):
+		self.build()
+
+		self.assertEqual(self.read("index.html"), '<div><p><img src="/images/a.png" width="200" height="100" alt="A">A</img></p></div>')
+		self.assertIn('<img src="../images/a.png" width="200" height="100" alt="A">', self.read("blog", "post.html"))
+		self.assertIn('<img src="/images/b.png" alt="B">', self.read("blog", "post.html"))
+
+	def test_changed_images_rerender_only_their_pages(self):
+		self.build()
+		self.write(os.path.join(self.static, "images", "a.png"), png(300, 150))
+		self.write(os.path.join(self.static, "images", "b.png"), png(10, 10))
+
+		report = self.build()
+
+		self.assertEqual(sorted(report.rendered), [os.path.join("blog", "post.md"), "index.md"])
+		self.assertEqual(report.images.measured, [os.path.join("images", "a.png"), os.path.join("images", "b.png")])
+		self.assertIn('width="10" height="10" alt="B"', self.read("blog", "post.html"))
+
+		report = self.build()
+		self.assertEqual((report.rendered, report.images.measured), ([], []))
+
+	def test_turning_images_off_drops_the_dimensions(self):
+		self.build()
+		SiteTestCase.build(self, dir_path_static = self.static)
+
+		self.assertEqual(self.read("index.html"), '<div><p><img src="/images/a.png" alt="A">A</img></p></div>')
+
+	def test_block_cache_stays_valid_across_image_changes(self):
+		cache_path = os.path.join(self.root, "cache", "blocks.sqlite")
+		self.build(cache_path = cache_path)
+		self.write(os.path.join(self.static, "images", "a.png"), png(300, 150))
+		self.build(cache_path = cache_path)
+
+		self.assertIn('width="300" height="150"', self.read("index.html"))
+
+	def test_variants_are_referenced_by_srcset(self):
+		self.write(os.path.join(self.static, "images", "a.png"), png(1000, 500))
+		with mock.patch.object(images, "Image", object()), mock.patch.object(images, "render_variant", copy_variant):
+			self.build(image_cache = os.path.join(self.root, "cache", "images"))
+
+		self.assertTrue(os.path.isfile(os.path.join(self.public, "images", "a.480w.webp")))
+		self.assertEqual(self.read("index.html"), '<div><p><img src="/images/a.png" width="1000" height="500" '
+			'srcset="/images/a.webp 1000w, /images/a.480w.webp 480w, /images/a.960w.webp 960w" '
+			'sizes="(max-width: 1000px) 100vw, 1000px" alt="A">A</img></p></div>')
+		self.assertIn('srcset="../images/a.webp 1000w, ../images/a.480w.webp 480w, ../images/a.960w.webp 960w"',
+			self.read("blog", "post.html"))
+
+		# Without Pillow the variants go, and so do the references to them
+		report = self.build(image_cache = os.path.join(self.root, "cache", "images"))
+
+		self.assertEqual(sorted(report.rendered), [os.path.join("blog", "post.md"), "index.md"])
+		self.assertFalse(os.path.exists(os.path.join(self.public, "images", "a.480w.webp")))
+		self.assertNotIn("srcset", self.read("index.html"))
+
+	def test_stale_pages(self):
+		pages = {"a.md": {"images": {"x.png": [1, 1]}}, "b.md": {"images": {"y.png": None}}, "c.md": {}}
+
+		self.assertEqual(stale_pages(pages, {"x.png": [1, 1]}), set())
+		self.assertEqual(stale_pages(pages, {"x.png": [2, 1], "y.png": [3, 3]}), {"a.md", "b.md"})
+
+	def test_variants_are_planned_without_upscaling(self):
+		self.assertEqual(plan_variants(os.path.join("images", "a.png"), [1000, 500]), [
+			(os.path.join("images", "a.webp"), 1000),
+			(os.path.join("images", "a.480w.webp"), 480),
+			(os.path.join("images", "a.960w.webp"), 960),
+		])
+		self.assertEqual(plan_variants("b.gif", [1000, 500]), [])
+		self.assertEqual(cached_variant("cache", "abcdef", 480), os.path.join("cache", "ab", "abcdef-480w-q80.webp"))
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import os
+
+from build import rebuild_paths
+from links import LinkIndex, resolve_target
+from manifest import load_manifest, manifest_path
+from sitetest import SiteTestCase
+
+
+
+class TestLinks(SiteTestCase):
+	def setUp(self):
+		super().setUp()
+		self.write(os.path.join(self.static, "images", "logo.png"), "png")
+		self.write(os.path.join(self.content, "index.md"),
+			"# Home\n\nSee [the post](/blog/post.html), [the blog](/blog/) and ![logo](/images/logo.png)")
+		self.write(os.path.join(self.content, "blog", "index.md"), "# Blog\n\n[Post](post.html) and [off site](https://example.com)")
+		self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\n[Missing](../missing.html) ![gone](/images/gone.png)")
+
+	def build(self, incremental = True, **kwargs):
+		return super().build(incremental, dir_path_static = self.static, check_links = True, **kwargs)
+
+	def test_resolve_target(self):
+		output = os.path.join("blog", "post.html")
+
+		self.assertEqual(resolve_target("/images/a%20b.png", output), os.path.join("images", "a b.png"))
+		self.assertEqual(resolve_target("other.html#top", output), os.path.join("blog", "other.html"))
+		self.assertEqual(resolve_target("../", output), "index.html")
+		self.assertIsNone(resolve_target("https://example.com/x", output))
+		self.assertIsNone(resolve_target("mailto:me@example.com", output))
+		self.assertIsNone(resolve_target("#section", output))
+
+	def test_directory_links_resolve_to_index_pages(self):
+		index = LinkIndex({"index.md": {"links": [["link", "/blog", "blog"], ["link", "/nope", "nope"]]}})
+
+		self.assertEqual(index.broken({"index.html", os.path.join("blog", "index.html")}), [("index.md", "link", "/nope")])
+		self.assertEqual(index.referrers("blog"), [("index.md", "link", "/blog")])
+
+	def test_build_reports_broken_links(self):
+		report = self.build()
+
+		self.assertEqual(report.broken_links, [
+			(os.path.join("blog", "post.md"), "image", "/images/gone.png"),
+			(os.path.join("blog", "post.md"), "link", "../missing.html"),
+		])
+
+	def test_unchanged_pages_are_checked_from_the_manifest(self):
+		self.build()
+
+		# The missing targets appear; the linking page isn't rendered again but both links resolve now
+		self.write(os.path.join(self.content, "missing.md"), "# Found")
+		self.write(os.path.join(self.static, "images", "gone.png"), "png")
+		report = self.build()
+
+		self.assertEqual(report.rendered, ["missing.md"])
+		self.assertEqual(report.broken_links, [])
+
+		os.unlink(os.path.join(self.content, "blog", "post.md"))
+		manifest = load_manifest(manifest_path(self.public))
+		report = rebuild_paths(manifest, [os.path.join(self.content, "blog", "post.md")], self.content, self.template, self.public)
+
+		self.assertEqual(report.broken_links, sorted([
+			("index.md", "link", "/blog/post.html"),
+			(os.path.join("blog", "index.md"), "link", "post.html"),
+		]))
+
+	def test_cached_blocks_keep_their_targets(self):
+		cache_path = os.path.join(self.root, "cache", "blocks.sqlite")
+
+		# Fills the block cache without the link check
+		super().build(dir_path_static = self.static, cache_path = cache_path)
+		report = self.build(cache_path = cache_path)
+
+		self.assertEqual(len(report.broken_links), 2)
+
+	def test_async_build_collects_the_same(self):
+		expected = self.build().broken_links
+
+		self.assertEqual(self.build(incremental = False, async_io = True).broken_links, expected)
+
+
+if __name__ == "__main__":
+	unittest.main()
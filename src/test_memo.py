@@ -0,0 +1,88 @@
+import unittest
+import threading
+
+from memo import Memo
+from textnode import block_to_html_node, inline_to_html
+
+
+class TestMemo(unittest.TestCase):
+	def test_hits_and_misses(self):
+		calls = []
+		memo = Memo(lambda text: calls.append(text) or text.upper())
+
+		self.assertEqual(memo("a"), "A")
+		self.assertEqual(memo("a"), "A")
+		self.assertEqual(memo("b"), "B")
+		self.assertEqual(calls, ["a", "b"])
+		self.assertEqual(memo.stats(), {"hits": 1, "misses": 2, "bypassed": 0, "entries": 2, "max_entries": 65536,
+			"bytes": 4, "max_bytes": 8 << 20})
+
+	def test_lru_bound(self):
+		memo = Memo(str.upper, max_entries = 2)
+		memo("a")
+		memo("b")
+		memo("a")
+		memo("c")
+
+		self.assertEqual(list(memo.entries), ["a", "c"])
+
+	def test_byte_bound(self):
+		# Each entry holds its key and value, 6 characters
+		memo = Memo(str.upper, max_bytes = 12)
+		memo("aaa")
+		memo("bbb")
+		memo("ccc")
+
+		self.assertEqual(list(memo.entries), ["bbb", "ccc"])
+		self.assertEqual(memo.stats()["bytes"], 12)
+
+	def test_long_keys_skip_the_memo(self):
+		calls = []
+		memo = Memo(lambda text: calls.append(text) or text.upper(), max_key_length = 4)
+
+		memo("short")
+		memo("short")
+		memo("tiny")
+		memo("tiny")
+
+		self.assertEqual(calls, ["short", "short", "tiny"])
+		self.assertEqual(list(memo.entries), ["tiny"])
+		self.assertEqual(memo.stats()["bypassed"], 2)
+
+	def test_outputs_are_interned(self):
+		memo = Memo(lambda text: "".join(["<b>", text, "</b>"]))
+		first = memo("x" * 50)
+		memo.clear()
+
+		self.assertIs(memo("x" * 50), first)
+
+	def test_threads(self):
+		memo = Memo(str.upper, max_entries = 10)
+
+		def work():
+			for i in range(1000):
+				memo(str(i % 20))
+
+		threads = [threading.Thread(target=work) for _ in range(4)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+		stats = memo.stats()
+		self.assertEqual(stats["hits"] + stats["misses"], 4000)
+		self.assertLessEqual(stats["entries"], 10)
+
+	def test_inline_rendering(self):
+		html = inline_to_html("see [the docs](/docs) **now**")
+
+		self.assertEqual(html, 'see <a href="/docs">the docs</a><b>now</b>')
+		self.assertIs(inline_to_html("see [the docs](/docs) **now**"), html)
+
+	def test_empty_list_item_is_dropped(self):
+		self.assertEqual(block_to_html_node("* one\n* two\n* ", "unordered list"),
+			"<ul><li>one</li><li>two</li></ul>")
+
+
+if __name__ == "__main__":
+	unittest.main()
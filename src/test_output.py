@@ -0,0 +1,63 @@
+import unittest
+import os, tempfile
+
+from output import AtomicWriter
+
+
+class TestAtomicWriter(unittest.TestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.path = os.path.join(self.tmp.name, "out", "page.html")
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def write(self, *parts):
+		with AtomicWriter(self.path) as file:
+			for part in parts:
+				file.write(part)
+		return file
+
+	def read(self):
+		with open(self.path, "r", encoding="utf-8") as file:
+			return file.read()
+
+	def test_writes_new_file(self):
+		file = self.write("<p>", "héllo", "</p>")
+
+		self.assertTrue(file.written)
+		self.assertEqual(self.read(), "<p>héllo</p>")
+		self.assertEqual(file.size, len("<p>héllo</p>".encode("utf-8")))
+		self.assertEqual(os.listdir(os.path.dirname(self.path)), ["page.html"])
+
+	def test_skips_identical_content(self):
+		self.write("<p>same</p>")
+		os.utime(self.path, ns = (0, 0))
+
+		file = self.write("<p>", "same", "</p>")
+
+		self.assertFalse(file.written)
+		self.assertEqual(os.stat(self.path).st_mtime_ns, 0)
+		self.assertEqual(os.listdir(os.path.dirname(self.path)), ["page.html"])
+
+	def test_replaces_changed_content_of_same_size(self):
+		self.write("<p>aaaa</p>")
+		file = self.write("<p>bbbb</p>")
+
+		self.assertTrue(file.written)
+		self.assertEqual(self.read(), "<p>bbbb</p>")
+
+	def test_failure_keeps_old_file(self):
+		self.write("<p>old</p>")
+
+		with self.assertRaises(RuntimeError):
+			with AtomicWriter(self.path) as file:
+				file.write("<p>half")
+				raise RuntimeError("render failed")
+
+		self.assertEqual(self.read(), "<p>old</p>")
+		self.assertEqual(os.listdir(os.path.dirname(self.path)), ["page.html"])
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import json, os, tempfile
+
+from build import build_site
+from profiler import NULL_PROFILER, Profiler, get_profiler, set_profiler
+
+
+class TestProfiler(unittest.TestCase):
+	def tearDown(self):
+		set_profiler(None)
+
+	def test_disabled_by_default(self):
+		self.assertIs(get_profiler(), NULL_PROFILER)
+		with get_profiler().stage("scan"):
+			get_profiler().count("blocks")
+
+	def test_stages_pages_and_counters(self):
+		profiler = Profiler()
+
+		with profiler.stage("render"):
+			with profiler.page("a.md"):
+				profiler.count("blocks", 3)
+		with profiler.page("b.md"):
+			pass
+
+		self.assertEqual(list(profiler.stages), ["render"])
+		self.assertEqual(profiler.counters, {"blocks": 3})
+		self.assertEqual([name for name, seconds in profiler.slowest_pages(1)], [max(profiler.pages, key=profiler.pages.get)])
+		self.assertEqual(len(profiler.events), 3)
+
+	def test_merge(self):
+		worker = Profiler()
+		worker.count("pages", 2)
+		with worker.page("a.md"):
+			pass
+
+		profiler = Profiler()
+		profiler.count("pages")
+		profiler.merge(worker.to_dict())
+
+		self.assertEqual(profiler.counters, {"pages": 3})
+		self.assertIn("a.md", profiler.pages)
+
+	def test_profiled_build(self):
+		with tempfile.TemporaryDirectory() as root:
+			content = os.path.join(root, "content")
+			template = os.path.join(root, "template.html")
+			trace = os.path.join(root, "trace.json")
+			os.makedirs(content)
+
+			with open(template, "w", encoding="utf-8") as file:
+				file.write("{{ Content }}")
+			for name in ["a", "b", "c"]:
+				with open(os.path.join(content, f"{name}.md"), "w", encoding="utf-8") as file:
+					file.write(f"# {name}\n\nSome *text*")
+
+			for jobs in [1, 2]:
+				profiler = Profiler()
+				set_profiler(profiler)
+				build_site(content, template, os.path.join(root, "public"), jobs = jobs)
+				set_profiler(None)
+
+				self.assertEqual(profiler.counters["pages"], 3)
+				self.assertEqual(profiler.counters["blocks"], 6)
+				self.assertEqual(len(profiler.pages), 3)
+				self.assertIn("render", profiler.stages)
+
+			profiler.write_trace(trace)
+			with open(trace, encoding="utf-8") as file:
+				data = json.load(file)
+
+			self.assertTrue(all(event["ph"] == "X" for event in data["traceEvents"]))
+			self.assertEqual(data["otherData"]["counters"]["pages"], 3)
+
+
+if __name__ == "__main__":
+	unittest.main()
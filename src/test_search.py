@@ -0,0 +1,107 @@
+import unittest
+import json, os
+
+from build import rebuild_paths
+from manifest import load_manifest, manifest_path, state_path
+from search import LEGACY_STATE_NAME, STATE_SUFFIX, SearchIndex, page_postings
+from sitetest import SiteTestCase
+
+
+class TestSearchIndex(SiteTestCase):
+	def setUp(self):
+		super().setUp()
+		self.write(os.path.join(self.content, "index.md"), "# Home\n\nThe **ring** goes [home](/blog/post.html)")
+		self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\n* rings\n* river")
+
+	def build(self, search = True, **kwargs):
+		return super().build(search = search, **kwargs)
+
+	def load(self, *parts):
+		with open(os.path.join(self.public, "search", *parts), "r", encoding="utf-8") as file:
+			return json.load(file)
+
+	def test_page_postings(self):
+		self.assertEqual(page_postings(["The ring,", "the Ring"]), {"the": [0, 2], "ring": [1, 3]})
+
+	def test_build_writes_shards_and_pages(self):
+		self.build()
+
+		self.assertEqual(self.load("pages.json"), {
+			"0": {"url": "/blog/post.html", "title": "Post"},
+			"1": {"url": "/index.html", "title": "Home"},
+		})
+		self.assertEqual(self.load("terms", "ri.json"), {"ring": {"1": [2]}, "rings": {"0": [1]}, "river": {"0": [2]}})
+		self.assertEqual(self.load("terms", "ho.json"), {"home": {"1": [0, 4]}})
+
+	def test_cached_blocks_keep_their_text(self):
+		cache_path = os.path.join(self.root, "cache", "blocks.sqlite")
+		self.build(search = False, cache_path = cache_path)
+		self.build(cache_path = cache_path)
+
+		self.assertEqual(self.load("terms", "ri.json"), {"ring": {"1": [2]}, "rings": {"0": [1]}, "river": {"0": [2]}})
+
+	def test_incremental_update_touches_only_affected_shards(self):
+		self.build()
+		self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\n* rivers")
+
+		report = self.build()
+
+		self.assertEqual(report.search_shards, ["ri"])
+		self.assertEqual(self.load("terms", "ri.json"), {"ring": {"1": [2]}, "rivers": {"0": [1]}})
+		self.assertEqual(self.load("terms", "po.json"), {"post": {"0": [0]}})
+
+	def test_removed_pages_leave_the_index(self):
+		self.build()
+		os.unlink(os.path.join(self.content, "blog", "post.md"))
+
+		manifest = load_manifest(manifest_path(self.public))
+		rebuild_paths(manifest, [os.path.join(self.content, "blog", "post.md")], self.content, self.template, self.public)
+
+		self.assertFalse(os.path.exists(os.path.join(self.public, "search", "terms", "po.json")))
+		self.assertEqual(self.load("terms", "ri.json"), {"ring": {"1": [2]}})
+		self.assertEqual(list(self.load("pages.json")), ["1"])
+
+	def test_ids_are_stable(self):
+		self.build()
+		self.write(os.path.join(self.content, "index.md"), "# Home again")
+		self.build()
+
+		self.assertEqual(SearchIndex(self.public).pages["index.md"]["id"], 1)
+
+	def test_state_stays_out_of_the_output(self):
+		self.build()
+		pages = SearchIndex(self.public).pages
+		legacy_path = os.path.join(self.public, LEGACY_STATE_NAME)
+		os.replace(state_path(self.public, STATE_SUFFIX), legacy_path)
+
+		self.write(os.path.join(self.content, "index.md"), "# Home\n\nChanged")
+		self.build()
+
+		self.assertFalse(os.path.exists(legacy_path))
+		self.assertEqual(state_path(self.public, STATE_SUFFIX), os.path.join(self.root, ".cache", "public.search.json"))
+		self.assertEqual({source: page["id"] for source, page in SearchIndex(self.public).pages.items()},
+			{source: page["id"] for source, page in pages.items()})
+
+	def test_turning_search_on_and_off(self):
+		self.build(search = False)
+		self.assertFalse(os.path.exists(os.path.join(self.public, "search")))
+
+		# Pages skipped as unchanged still get indexed
+		self.build()
+		self.assertEqual(len(self.load("pages.json")), 2)
+
+		self.build(search = False)
+		self.assertFalse(os.path.exists(os.path.join(self.public, "search")))
+		self.assertFalse(os.path.exists(state_path(self.public, STATE_SUFFIX)))
+
+	def test_async_build_indexes_the_same(self):
+		self.build()
+		expected = self.load("terms", "ri.json")
+		self.build(search = False)
+
+		self.build(async_io = True)
+		self.assertEqual(self.load("terms", "ri.json"), expected)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,159 @@
+import unittest
+import json, os
+from unittest import mock
+
+import images
+
+from manifest import load_manifest, manifest_path
+from shards import ShardError, in_shard, merge_shards, shard_index
+from sitetest import SiteTestCase
+from test_images import copy_variant, png
+
+
+class TestShards(SiteTestCase):
+	def setUp(self):
+		super().setUp()
+		self.write(os.path.join(self.static, "style.css"), "body {}")
+		self.write(os.path.join(self.content, "index.md"), "# Home\n\nThe **ring** goes [home](/blog/post.html)")
+		self.write(os.path.join(self.content, "about.md"), "# About\n\n[Missing](/missing.html)")
+		self.write(os.path.join(self.content, "blog", "index.md"), "# Blog\n\n[Post](post.html)")
+		self.write(os.path.join(self.content, "blog", "post.md"), "---\ndate: 2024-01-02\n---\n# Post\n\n* rings\n* river")
+		self.write(os.path.join(self.content, "docs", "guide.md"), "# Guide\n\nA ring of [docs](/docs/)")
+		self.write(os.path.join(self.content, "docs", "index.md"), "# Docs\n\nRiver guide")
+
+	def build(self, dest_dir_path, **kwargs):
+		return super().build(dest_dir_path = dest_dir_path, dir_path_static = self.static, search = True, check_links = True,
+			base_url = "https://example.com", **kwargs)
+
+	def build_shards(self, count = 2, by = "directory", **kwargs):
+		shard_dirs = [os.path.join(self.root, "shards", str(index)) for index in range(count)]
+		for index, shard_dir in enumerate(shard_dirs):
+			self.build(shard_dir, shard = (index, count, by), **kwargs)
+
+		return shard_dirs
+
+	def merge(self, shard_dirs):
+		return merge_shards(shard_dirs, self.public, template_path = self.template, feeds = True,
+			base_url = "https://example.com")
+
+	def search_results(self, dest_dir_path):
+		# term -> urls of the pages with postings under it, ids differ between a merge and a full build
+		directory = os.path.join(dest_dir_path, "search")
+		with open(os.path.join(directory, "pages.json"), "r", encoding="utf-8") as file:
+			pages = json.load(file)
+
+		results = {}
+		for name in os.listdir(os.path.join(directory, "terms")):
+			with open(os.path.join(directory, "terms", name), "r", encoding="utf-8") as file:
+				for term, postings in json.load(file).items():
+					results[term] = {pages[page_id]["url"]: positions for page_id, positions in postings.items()}
+
+		return results, sorted(page["title"] for page in pages.values())
+
+	def assert_matches_full_build(self, report, by):
+		full = os.path.join(self.root, f"full-{by}")
+		full_report = self.build(full, feeds = True)
+		manifest = load_manifest(manifest_path(full))
+
+		for entry in manifest.pages.values():
+			self.assertEqual(self.read(self.public, entry["output"]), self.read(full, entry["output"]))
+		for name in ("sitemap.xml", "feed.xml", "style.css"):
+			self.assertEqual(self.read(self.public, name), self.read(full, name))
+
+		self.assertEqual(self.search_results(self.public), self.search_results(full))
+		self.assertEqual(report.broken_links, full_report.broken_links)
+		self.assertEqual(load_manifest(manifest_path(self.public)).pages.keys(), manifest.pages.keys())
+
+	def test_shard_index(self):
+		self.assertEqual(shard_index(os.path.join("blog", "a.md"), 4), shard_index(os.path.join("blog", "b.md"), 4))
+		self.assertEqual(shard_index("index.md", 4), shard_index("about.md", 4))
+		self.assertTrue(all(0 <= shard_index(f"page{n}.md", 3, "hash") < 3 for n in range(20)))
+
+		sources = [f"page{n}.md" for n in range(20)]
+		shards = [[source for source in sources if in_shard(source, (index, 3, "hash"))] for index in range(3)]
+		self.assertEqual(sorted(sum(shards, [])), sorted(sources))
+
+	def test_shard_builds_only_its_pages(self):
+		shard_dirs = self.build_shards()
+		pages = [set(load_manifest(manifest_path(shard_dir)).pages) for shard_dir in shard_dirs]
+
+		self.assertFalse(pages[0] & pages[1])
+		self.assertEqual(len(pages[0] | pages[1]), 6)
+		self.assertFalse(os.path.exists(os.path.join(shard_dirs[0], "sitemap.xml")))
+
+		# static/ is copied by the first shard only
+		self.assertTrue(os.path.isfile(os.path.join(shard_dirs[0], "style.css")))
+		self.assertFalse(os.path.exists(os.path.join(shard_dirs[1], "style.css")))
+
+	def test_compressed_shards(self):
+		self.write(os.path.join(self.static, "site.css"), "body { color: red }\n" * 100)
+
+		# The first build with compression on recompresses every output a shard has
+		shard_dirs = self.build_shards(compress = True)
+		self.merge(shard_dirs)
+
+		self.assertFalse(os.path.exists(os.path.join(shard_dirs[1], "site.css.gz")))
+		self.assertTrue(os.path.isfile(os.path.join(self.public, "site.css.gz")))
+
+	def test_shards_read_image_sizes_from_static(self):
+		self.write(os.path.join(self.static, "logo.png"), png(600, 300))
+		for directory in ("", "blog", "docs"):
+			self.write(os.path.join(self.content, directory, "logo.md"), "![Logo](/logo.png)")
+
+		with mock.patch.object(images, "Image", object()), mock.patch.object(images, "render_variant", copy_variant):
+			shard_dirs = self.build_shards(images = True, image_cache = os.path.join(self.root, "cache", "images"))
+		self.merge(shard_dirs)
+
+		# The second shard only planned the variants its pages refer to
+		for name in ("logo.png", "logo.480w.webp"):
+			self.assertFalse(os.path.exists(os.path.join(shard_dirs[1], name)))
+			self.assertTrue(os.path.isfile(os.path.join(self.public, name)))
+		for directory in ("", "blog", "docs"):
+			self.assertIn('width="600" height="300" srcset="/logo.webp 600w, /logo.480w.webp 480w"',
+				self.read(directory, "logo.html"))
+
+	def test_merge_by_directory_matches_full_build(self):
+		report = self.merge(self.build_shards(3))
+
+		self.assertEqual(len(report.copied), 6)
+		self.assertEqual(report.broken_links, [("about.md", "link", "/missing.html")])
+		self.assert_matches_full_build(report, "directory")
+
+	def test_merge_by_hash_matches_full_build(self):
+		report = self.merge(self.build_shards(2, "hash"))
+
+		self.assert_matches_full_build(report, "hash")
+
+	def test_incremental_merge(self):
+		shard_dirs = self.build_shards()
+		self.merge(shard_dirs)
+		report = self.merge(shard_dirs)
+
+		self.assertEqual(report.copied, [])
+		self.assertEqual(report.unchanged, 6)
+		self.assertEqual(report.search_shards, [])
+		self.assertEqual(report.aggregates, [])
+
+		self.write(os.path.join(self.content, "docs", "guide.md"), "# Guide\n\nNo rings here")
+		os.remove(os.path.join(self.content, "about.md"))
+		shard_dirs = self.build_shards()
+		report = self.merge(shard_dirs)
+
+		self.assertEqual(report.copied, [os.path.join("docs", "guide.md")])
+		self.assertEqual(report.removed, ["about.md"])
+		self.assertFalse(os.path.exists(os.path.join(self.public, "about.html")))
+		self.assert_matches_full_build(report, "directory")
+
+	def test_merge_errors(self):
+		shard_dirs = self.build_shards()
+
+		with self.assertRaises(ShardError):
+			self.merge(shard_dirs + [os.path.join(self.root, "shards", "9")])
+		with self.assertRaises(ShardError):
+			self.merge([shard_dirs[0], shard_dirs[0]])
+		with self.assertRaises(ShardError):
+			self.merge([])
+
+
+if __name__ == "__main__":
+	unittest.main()
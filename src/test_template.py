@@ -0,0 +1,60 @@
+import unittest
+import os, tempfile, time
+
+from template import Template, compile_template, find_template, load_template
+
+
+class TestTemplate(unittest.TestCase):
+	def test_compile_template(self):
+		template = compile_template("<title>{{ Title }}</title>{{Content}}<footer>")
+
+		expected_chunks = [
+			("<title>", None),
+			(None, "Title"),
+			("</title>", None),
+			(None, "Content"),
+			("<footer>", None),
+		]
+
+		self.assertEqual(template, Template(expected_chunks))
+		self.assertEqual(template.slots(), ["Title", "Content"])
+
+	def test_render_streams_chunks(self):
+		template = compile_template("<h1>{{ Title }}</h1>{{ Content }}{{ Missing }}")
+		chunks = []
+
+		template.render(chunks.append, {
+			"Title": "Home",
+			"Content": lambda write: (write("<p>"), write("body"), write("</p>"))})
+
+		self.assertEqual(chunks, ["<h1>", "Home", "</h1>", "<p>", "body", "</p>", ""])
+
+	def test_load_template_cache(self):
+		with tempfile.TemporaryDirectory() as root:
+			path = os.path.join(root, "template.html")
+			with open(path, "w", encoding="utf-8") as file:
+				file.write("{{ Content }}")
+
+			first = load_template(path)
+			self.assertIs(load_template(path), first)
+
+			with open(path, "w", encoding="utf-8") as file:
+				file.write("<main>{{ Content }}</main>")
+			os.utime(path, ns=(time.time_ns(), time.time_ns() + 10**9))
+
+			self.assertEqual(load_template(path).slots(), ["Content"])
+			self.assertIsNot(load_template(path), first)
+
+	def test_find_template(self):
+		with tempfile.TemporaryDirectory() as root:
+			os.makedirs(os.path.join(root, "blog", "2024"))
+			override = os.path.join(root, "blog", "template.html")
+			with open(override, "w", encoding="utf-8") as file:
+				file.write("{{ Content }}")
+
+			self.assertEqual(find_template(os.path.join("blog", "2024"), root, "default.html"), override)
+			self.assertEqual(find_template("", root, "default.html"), "default.html")
+
+
+if __name__ == "__main__":
+	unittest.main()
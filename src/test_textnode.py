@@ -12,8 +12,14 @@ from textnode import(
 	split_nodes_links,
 	text_to_textnodes,
 	markdown_to_blocks,
+	iter_blocks,
 	block_to_block_type,
-	markdown_to_html_node)
+	markdown_to_html_node,
+	write_markdown_html,
+	parse_inline,
+	strip_bounds,
+	split_bounds,
+	join_block)
 
 from htmlnode import LeafNode
 
@@ -100,6 +106,21 @@ class TestTextNode(unittest.TestCase):
 		
 		self.assertEqual(new_nodes, expected_nodes)
 
+	def test_text_to_textnodes_link_before_image(self):
+		text = "[home](/) then ![logo](/images/logo.png) and `*not italic*`"
+
+		new_nodes = text_to_textnodes(text)
+
+		expected_nodes = [
+			TextNode("home", TextType.LINK, "/"),
+			TextNode(" then ", TextType.TEXT),
+			TextNode("logo", TextType.IMAGE, "/images/logo.png"),
+			TextNode(" and ", TextType.TEXT),
+			TextNode("*not italic*", TextType.CODE),
+		]
+
+		self.assertEqual(new_nodes, expected_nodes)
+
 
 	def test_markdown_to_blocks(self):
 		text = """# This is a heading
@@ -121,6 +142,15 @@ class TestTextNode(unittest.TestCase):
 		self.assertEqual(result_list, expected_list)
 
 
+	def test_iter_blocks_is_lazy(self):
+		lines = iter(["# Heading\n", "\n", "* one\n", "* two\n", "Paragraph\n", "never read"])
+		blocks = iter_blocks(lines)
+
+		self.assertEqual(next(blocks), "# Heading")
+		self.assertEqual(next(blocks), "* one * two")
+		self.assertEqual(next(lines), "never read")
+
+
 	def test_block_to_block_type(self):
 		markdown_blocks = [
 		    "# Heading 1",
@@ -185,7 +215,51 @@ Happy writing!
 
 		self.assertEqual(result, expected_result)
 
+	def test_write_markdown_html_streams_blocks(self):
+		lines = ["# Title\n", "\n", "Some *text*\n"]
+		chunks = []
+
+		write_markdown_html(iter(lines), chunks.append)
+
+		self.assertEqual(chunks, ["<div>", "<h1>Title</h1>", "<p>Some <i>text</i></p>", "</div>"])
+		self.assertEqual("".join(chunks), markdown_to_html_node("".join(lines)))
+
+	def test_parse_inline_keeps_offsets(self):
+		text = "Go **far** to [site](https://a.com) and [back](https://a.com)"
+		ir = parse_inline(text)
+
+		self.assertEqual(list(ir.codes), [0, 1, 0, 5, 0, 5])
+		self.assertEqual([ir.text(i) for i in range(len(ir))], ["Go ", "far", " to ", "site", " and ", "back"])
+		self.assertEqual(ir.url(3), "https://a.com")
+		self.assertIs(ir.url(3), ir.url(5))
+		self.assertIsNone(ir.url(0))
+
+	def test_inline_ir_renders_like_nodes(self):
+		text = "A `c` *i* ![img](p.png) [l](u) **b** ```x```"
+		ir = parse_inline(text)
+		parts = []
+		ir.write_html(parts.append)
+
+		self.assertEqual(ir.textnodes(), text_to_textnodes(text))
+		self.assertEqual("".join(parts), "".join(node.to_html() for node in ir.html_nodes()))
+		self.assertEqual(ir.plain_text(), "A  c i img l b x")
+
+	def test_bounds_match_string_methods(self):
+		text = "* one - two -  - three "
+
+		for start, end in [(0, len(text)), (2, len(text)), (5, 9), (13, 15)]:
+			stripped = text[start:end].strip()
+			bounds = strip_bounds(text, start, end)
+			self.assertEqual(text[bounds[0]:bounds[1]], stripped)
+
+			pieces = [text[a:b] for a, b in split_bounds(text, "- ", start, end)]
+			self.assertEqual(pieces, text[start:end].split("- "))
+
+	def test_join_block_reuses_lone_lines(self):
+		line = "* only item"
 
+		self.assertIs(join_block([line, " "]), line)
+		self.assertEqual(join_block([" ", "```", "code", " ", " ", "```"]), "```code  ```")
 
 
 
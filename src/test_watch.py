@@ -0,0 +1,104 @@
+import unittest
+import contextlib, io, os, sys
+from unittest import mock
+
+from sitetest import SiteTestCase
+from watch import InotifyWatcher, PollingWatcher, watch
+
+
+class TestWatchers(SiteTestCase):
+	template_text = "{{ Content }}"
+
+	def setUp(self):
+		super().setUp()
+		self.write(os.path.join(self.content, "index.md"), "# Home")
+
+	def check_watcher(self, watcher):
+		try:
+			self.assertEqual(watcher.wait(timeout = 0), set())
+
+			page = os.path.join(self.content, "blog", "post.md")
+			self.write(page, "# Post")
+			self.assertIn(os.path.normpath(page), watcher.wait(timeout = 2))
+
+			self.write(self.template, "<main>{{ Content }}</main>")
+			self.write(os.path.join(self.root, "unrelated.txt"), "ignored")
+			changed = watcher.wait(timeout = 2)
+			self.assertIn(os.path.normpath(self.template), changed)
+			self.assertNotIn(os.path.normpath(os.path.join(self.root, "unrelated.txt")), changed)
+		finally:
+			watcher.close()
+
+	def test_polling_watcher(self):
+		self.check_watcher(PollingWatcher([self.content, self.template], interval = 0.01))
+
+	@unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux only")
+	def test_inotify_watcher(self):
+		self.check_watcher(InotifyWatcher([self.content, self.template]))
+
+	@unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux only")
+	def test_inotify_directory_moved_away(self):
+		blog = os.path.join(self.content, "blog")
+		self.write(os.path.join(blog, "drafts", "post.md"), "# Post")
+		watcher = InotifyWatcher([self.content, self.template])
+
+		try:
+			moved = os.path.join(self.root, "elsewhere")
+			os.rename(blog, moved)
+			self.assertIn(os.path.normpath(blog), watcher.wait(timeout = 2))
+
+			# Its watches went with it, edits where it went aren't reported as content
+			self.write(os.path.join(moved, "drafts", "post.md"), "# Moved")
+			self.assertEqual(watcher.wait(timeout = 0.1), set())
+			self.assertEqual([path for path, recursive in watcher.directories.values() if path.startswith(moved)], [])
+			self.assertEqual(len(watcher.directories), 2)
+		finally:
+			watcher.close()
+
+	@unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux only")
+	def test_inotify_directory_gone_before_its_event(self):
+		watcher = InotifyWatcher([self.content, self.template])
+
+		try:
+			os.mkdir(os.path.join(self.content, "brief"))
+			os.rmdir(os.path.join(self.content, "brief"))
+			# Reported as removed, never watched
+			self.assertLessEqual(watcher.wait(timeout = 2), {os.path.join(self.content, "brief")})
+			self.assertEqual(len(watcher.directories), 2)
+		finally:
+			watcher.close()
+
+	def test_watch_survives_missing_template(self):
+		self.build()
+		os.unlink(self.template)
+
+		class Stop(Exception):
+			pass
+
+		class Watcher():
+			# Reports the template gone, then its rename-save bringing it back
+			def __init__(watcher):
+				watcher.batches = [{self.template}, {self.template}]
+
+			def wait(watcher):
+				if not watcher.batches:
+					raise Stop()
+				if len(watcher.batches) == 1:
+					self.write(self.template, "<main>{{ Content }}</main>")
+				return watcher.batches.pop()
+
+			def close(watcher):
+				pass
+
+		errors = io.StringIO()
+		with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(errors):
+			with mock.patch("watch.make_watcher", lambda paths: Watcher()), self.assertRaises(Stop):
+				watch(self.content, self.static, self.template, self.public)
+
+		self.assertIn("Rebuild failed", errors.getvalue())
+
+		self.assertEqual(self.read("index.html"), "<main><div><h1>Home</h1></div></main>")
+
+
+if __name__ == "__main__":
+	unittest.main()
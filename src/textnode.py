@@ -1,6 +1,17 @@
 from enum import Enum
+from array import array
 from htmlnode import HTMLNode, LeafNode, ParentNode
-import re, os
+from template import load_template
+from profiler import get_profiler
+from frontmatter import split_front_matter
+from memo import Memo
+from output import AtomicWriter
+import logging, re, os, sys
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever rendering output changes, it invalidates the block cache
+RENDERER_VERSION = 2
 
 class TextType(Enum):
 	TEXT = "normal"
@@ -32,14 +43,36 @@ class TextNode():
 
 
 # Helper Methods
+# Compiled once here instead of on every call
+BRACKET_PATTERN = re.compile(r"\[(.*?)\]")
+PAREN_PATTERN = re.compile(r"\((.*?)\)")
+IMAGE_SPLIT_PATTERN = re.compile(r"(!\[.*?\]\(.*?\))")
+LINK_SPLIT_PATTERN = re.compile(r"(\[.*?\]\(.*?\))")
+
+
+def compile_delimiter(delimiter):
+	# (pattern capturing the text between delimiters, pattern capturing the whole span)
+	return (re.compile(fr"{re.escape(delimiter)}(.*?){re.escape(delimiter)}"),
+		re.compile(fr"({re.escape(delimiter)}.*?{re.escape(delimiter)})"))
+
+
+DELIMITER_PATTERNS = {delimiter: compile_delimiter(delimiter) for delimiter in ("**", "*", "_", "`", "```")}
+
+
+def delimiter_patterns(delimiter):
+	if (patterns := DELIMITER_PATTERNS.get(delimiter)) is None:
+		patterns = DELIMITER_PATTERNS[delimiter] = compile_delimiter(delimiter)
+	return patterns
+
+
 def extract_markdown_text(text, delimiter):
-	matches = re.findall(fr"{re.escape(delimiter)}(.*?){re.escape(delimiter)}", text)
+	matches = delimiter_patterns(delimiter)[0].findall(text)
 	return matches
 
 def extract_markdown_images(text):
 	tuples_list = []
-	alt_text_matches = re.findall(r"\[(.*?)\]", text)
-	url_matches = re.findall(r"\((.*?)\)", text)
+	alt_text_matches = BRACKET_PATTERN.findall(text)
+	url_matches = PAREN_PATTERN.findall(text)
 
 	for i, alt_text in enumerate(alt_text_matches):
 		tuples_list.append((alt_text, url_matches[i]))
@@ -48,8 +81,8 @@ def extract_markdown_images(text):
 
 def extract_markdown_links(text):
 	tuples_list = []
-	anchor_text_matches = re.findall(r"\[(.*?)\]", text)
-	url_matches = re.findall(r"\((.*?)\)", text)
+	anchor_text_matches = BRACKET_PATTERN.findall(text)
+	url_matches = PAREN_PATTERN.findall(text)
 
 	for i, anchor_text in enumerate(anchor_text_matches):
 		tuples_list.append((anchor_text, url_matches[i]))
@@ -73,14 +106,14 @@ def split_nodes_delimiter(old_nodes, delimiter, text_type):
 			matches = extract_markdown_text(node.text, delimiter)
 
 			if matches:
-				pattern = fr"({re.escape(delimiter)}.*?{re.escape(delimiter)})"
-				sections = re.split(pattern, node.text)
+				pattern = delimiter_patterns(delimiter)[1]
+				sections = pattern.split(node.text)
 				matches_count = 0
 
 				for section in sections:
 					text = matches[matches_count]
 
-					if re.match(pattern, section):
+					if pattern.match(section):
 						nodes_list.append(TextNode(text = text, text_type = text_type))
 
 						if matches_count < len(matches)-1:
@@ -108,15 +141,15 @@ def split_nodes_images(old_nodes):
 			tuples_list = extract_markdown_images(node.text)
 
 			if tuples_list:
-				pattern = r"(!\[.*?\]\(.*?\))"
-				sections = re.split(pattern, node.text)
+				pattern = IMAGE_SPLIT_PATTERN
+				sections = pattern.split(node.text)
 				tuple_count = 0
 
 				for section in sections:
 					alt_text = tuples_list[tuple_count][0]
 					url = tuples_list[tuple_count][1]
 
-					if re.match(pattern, section):
+					if pattern.match(section):
 						nodes_list.append(TextNode(text = alt_text, text_type = TextType.IMAGE, url = url))
 
 						if tuple_count < len(tuples_list)-1:
@@ -143,8 +176,8 @@ def split_nodes_links(old_nodes):
 		else:
 
 			tuples_list = extract_markdown_links(node.text)
-			pattern = r"(\[.*?\]\(.*?\))"
-			sections = re.split(pattern, node.text)
+			pattern = LINK_SPLIT_PATTERN
+			sections = pattern.split(node.text)
 
 			if tuples_list:
 				tuple_count = 0
@@ -153,7 +186,7 @@ def split_nodes_links(old_nodes):
 					anchor_text = tuples_list[tuple_count][0]
 					url = tuples_list[tuple_count][1]
 
-					if re.match(pattern, section):
+					if pattern.match(section):
 						nodes_list.append(TextNode(text = anchor_text, text_type = TextType.LINK, url = url))
 
 						if tuple_count < len(tuples_list)-1:
@@ -169,36 +202,160 @@ def split_nodes_links(old_nodes):
 	return all_nodes
 
 
+# Master inline pattern; alternatives are tried in order at each position,
+# so "**" and "```" have to come before "*" and "`"
+INLINE_PATTERN = re.compile(
+	r"\*\*(.*?)\*\*"
+	r"|```(.*?)```"
+	r"|`(.*?)`"
+	r"|\*(.*?)\*"
+	r"|!\[(.*?)\]\((.*?)\)"
+	r"|\[(.*?)\]\((.*?)\)")
+
+# match.lastindex -> (text type, group holding the text, group holding the url)
+INLINE_GROUPS = {
+	1: (TextType.BOLD, 1, None),
+	2: (TextType.BLOCK_CODE, 2, None),
+	3: (TextType.CODE, 3, None),
+	4: (TextType.ITALIC, 4, None),
+	6: (TextType.IMAGE, 5, 6),
+	8: (TextType.LINK, 7, 8),}
+
+
+# Span kinds of the inline IR, a span's type code indexes this
+SPAN_TYPES = (TextType.TEXT, TextType.BOLD, TextType.ITALIC, TextType.CODE, TextType.BLOCK_CODE, TextType.LINK, TextType.IMAGE)
+SPAN_CODES = {text_type: code for code, text_type in enumerate(SPAN_TYPES)}
+TEXT, BOLD, ITALIC, CODE, BLOCK_CODE, LINK, IMAGE = range(len(SPAN_TYPES))
+# Markup around a span's text for the codes without a url, same as text_node_to_html_node renders it
+SPAN_TAGS = {
+	TEXT: ("", ""),
+	BOLD: ("<b>", "</b>"),
+	ITALIC: ("<i>", "</i>"),
+	CODE: ("<code>", "</code>"),
+	BLOCK_CODE: ("<pre><code>", "</code></pre>"),}
+NON_SPACE = re.compile(r"\S")
+ORDERED_MARKER = re.compile(r"\d+\.\s")
+
+
+class InlineIR():
+	# One inline fragment as parallel arrays: a type code, the span's offsets into source
+	# and an index into the interned urls (-1 for none). TextNode and HTMLNode objects are
+	# only built when asked for; rendering writes straight from the arrays
+	__slots__ = ("source", "codes", "starts", "ends", "url_ids", "urls")
+
+	def __init__(self, source):
+		self.source = source
+		self.codes = array("B")
+		self.starts = array("I")
+		self.ends = array("I")
+		self.url_ids = array("i")
+		self.urls = []
+
+	def __len__(self):
+		return len(self.codes)
+
+	def __repr__(self):
+		return f"InlineIR({self.textnodes()})"
+
+	def add(self, code, start, end, url = None):
+		self.codes.append(code)
+		self.starts.append(start)
+		self.ends.append(end)
+
+		if url is None:
+			self.url_ids.append(-1)
+		else:
+			self.url_ids.append(len(self.urls))
+			self.urls.append(sys.intern(url))
+
+	def text(self, i):
+		return self.source[self.starts[i]:self.ends[i]]
+
+	def url(self, i):
+		return self.urls[self.url_ids[i]] if self.url_ids[i] >= 0 else None
+
+	def textnodes(self):
+		return [TextNode(text = self.text(i), text_type = SPAN_TYPES[self.codes[i]], url = self.url(i)) for i in range(len(self))]
+
+	def html_nodes(self):
+		return [text_node_to_html_node(node, node.text_type) for node in self.textnodes()]
+
+	def write_html(self, write):
+		source = self.source
+
+		for code, start, end, url_id in zip(self.codes, self.starts, self.ends, self.url_ids):
+			if code == LINK:
+				write(f'<a href="{self.urls[url_id]}">')
+				write(source[start:end])
+				write("</a>")
+			elif code == IMAGE:
+				text = source[start:end]
+				write(f'<img src="{self.urls[url_id]}" alt="{text}">')
+				write(text)
+				write("</img>")
+			else:
+				opening, closing = SPAN_TAGS[code]
+				write(opening)
+				write(source[start:end])
+				write(closing)
+
+	def plain_text(self):
+		return " ".join(self.source[start:end] for start, end in zip(self.starts, self.ends))
+
+	def targets(self):
+		# (kind, url) of every link and image, what the link index resolves
+		return tuple(("image" if code == IMAGE else "link", self.urls[url_id])
+			for code, url_id in zip(self.codes, self.url_ids) if url_id >= 0)
+
+
+def parse_inline(text):
+	ir = InlineIR(text)
+	position = 0
+
+	for match in INLINE_PATTERN.finditer(text):
+		start = match.start()
+
+		# Whitespace-only text between spans is dropped, checked in place without slicing
+		if start > position and NON_SPACE.search(text, position, start):
+			ir.add(TEXT, position, start)
+
+		text_type, text_group, url_group = INLINE_GROUPS[match.lastindex]
+
+		# Empty spans are dropped, same as whitespace-only text
+		if NON_SPACE.search(text, match.start(text_group), match.end(text_group)):
+			ir.add(SPAN_CODES[text_type], match.start(text_group), match.end(text_group),
+				match.group(url_group) if url_group else None)
+
+		position = match.end()
+
+	if NON_SPACE.search(text, position):
+		ir.add(TEXT, position, len(text))
+
+	get_profiler().count("text_nodes", len(ir))
+
+	return ir
+
+
 def text_to_textnodes(text):
-	all_nodes = [TextNode(text = text, text_type = TextType.TEXT)]
-
-	# First split by Text Delimiters
-	delimiters = {
-		"**": TextType.BOLD, 
-		"```":TextType.BLOCK_CODE,
-		"`": TextType.CODE,
-		"*": TextType.ITALIC,}
-
-	for key, value in delimiters.items():
-		if split := split_nodes_delimiter(all_nodes, key, value):
-			all_nodes = split
-
-	# Finally split by Image and Link Delimiters
-	if split := split_nodes_images(all_nodes):
-		all_nodes = split
-	if split := split_nodes_links(all_nodes):
-		all_nodes = split
-	
-	# Remove empty nodes
-	all_nodes = [node for node in all_nodes if node.text.strip()]
+	return parse_inline(text).textnodes()
 
-	return all_nodes
 
+def join_block(parts):
+	# "".join(parts).strip() without the second copy: parts hold stripped lines and " "
+	# separators, so only separators can sit at either end. A lone line is returned as is
+	start = 1 if parts[0] == " " else 0
+	end = len(parts)
+	while end > start and parts[end - 1] == " ":
+		end -= 1
 
-def markdown_to_blocks(markdown):
-	lines = markdown.split("\n")
-	blocks = []
-	string = ""
+	if end - start == 1:
+		return parts[start]
+	return "".join(parts[start:end])
+
+
+def iter_blocks(lines):
+	# Lazily groups lines into blocks; only the block being built is held in memory
+	parts = []
 	is_code_block = False
 
 	for line in lines:
@@ -207,34 +364,38 @@ def markdown_to_blocks(markdown):
 			if line.startswith("```"):
 
 				if is_code_block:
-					string += " " + line 
-					blocks.append(string.strip())
+					parts.append(" ")
+					parts.append(line)
+					yield join_block(parts)
 
 					is_code_block = False
-					string = ""
+					parts = []
 				else:
 					is_code_block = True
-					string += " " + line 
+					parts.append(" ")
+					parts.append(line)
 
 			elif is_code_block:
-				string += line + " "
+				parts.append(line)
+				parts.append(" ")
 
 			else:
 
 				if (line[0] == "*" and line[1] != "*") or (line[0] == "-" and line[1] != "-") or (line[0].isdigit() and line[1] == "."):
-					string += line +  " "
+					parts.append(line)
+					parts.append(" ")
 
 				else:
-					if string:
-						blocks.append(string.strip())
-						blocks.append(line)
-						string = ""
-					else:
-						blocks.append(line)
-	if string:
-		blocks.append(string.strip())
+					if parts:
+						yield join_block(parts)
+						parts = []
+					yield line
+	if parts:
+		yield join_block(parts)
+
 
-	return blocks
+def markdown_to_blocks(markdown):
+	return list(iter_blocks(markdown.split("\n")))
 
 
 def block_to_block_type(block):
@@ -275,146 +436,266 @@ def text_node_to_html_node(node, text_type):
 			raise Exception("No type found")
 
 
-def block_to_html_node(block, block_category):
-	match (block_category):
-		case "heading":
-			count = 1
-			j = 1
-			while (block[j]) == "#":
-				count += 1
-				j += 1
+def render_inline(text):
+	# (html, plain text, link and image targets), the text is what search indexes
+	ir = parse_inline(text)
+	parts = []
+	ir.write_html(parts.append)
 
-			block = block[count+1:]
+	return "".join(parts), ir.plain_text(), ir.targets()
 
-			if nodes := text_to_textnodes(block):
-				html_nodes = []
 
-				for node in nodes:
-					html_nodes.append(text_node_to_html_node(node, node.text_type))
+# Nav links, disclaimers and badges repeat across pages, each distinct fragment is rendered once per process
+inline_fragment = Memo(render_inline)
 
-			return ParentNode(tag = f"h{count}", children = html_nodes).to_html()
 
-		case "unordered list":
-			block = block[2:]
+def inline_to_html(text):
+	return inline_fragment(text)[0]
 
-			unordered_blocks = block.split("- ")
-			if len(unordered_blocks) < 2:
-				unordered_blocks = block.split("* ")
 
-			print(unordered_blocks)
-			all_html_nodes = []
+def strip_bounds(text, start, end):
+	# The bounds text[start:end].strip() would have, without making either string
+	if (match := NON_SPACE.search(text, start, end)) is None:
+		return start, start
 
-			for block in unordered_blocks:
-				block = block.strip()
+	start = match.start()
+	while text[end - 1].isspace():
+		end -= 1
 
-				if nodes := text_to_textnodes(block):
-					html_nodes = []
+	return start, end
 
-					for node in nodes:
-						html_nodes.append(text_node_to_html_node(node, node.text_type))
 
-				all_html_nodes.extend([ParentNode(tag = "li", children = html_nodes)])
+def split_bounds(text, separator, start, end):
+	# The bounds of the pieces text[start:end].split(separator) would make
+	while (found := text.find(separator, start, end)) >= 0:
+		yield start, found
+		start = found + len(separator)
 
-			return ParentNode(tag = f"ul", children = all_html_nodes).to_html()
+	yield start, end
 
-		case "ordered list":
-			block = block[3:]
 
-			pattern = r"(\d+\.\s)"
+def pattern_bounds(text, pattern, start, end):
+	# The bounds of the pieces between matches of pattern, what re.split leaves minus the separators
+	for match in pattern.finditer(text, start, end):
+		yield start, match.start()
+		start = match.end()
 
-			ordered_blocks = re.split(pattern, block)
+	yield start, end
 
-			all_html_nodes = []
 
-			for block in ordered_blocks:
-				if re.match(pattern, block):
-					ordered_blocks.remove(block)
+def inline_children(text, texts = None, start = 0, end = None, targets = None):
+	# The memoized markup rides along as one untagged leaf, which writes its value verbatim.
+	# Blocks work on offsets; a span is only copied out when it is less than the whole block,
+	# since the memo needs it as a key
+	if end is None:
+		end = len(text)
+	if start or end != len(text):
+		text = text[start:end]
 
-			for block in ordered_blocks:
-				block = block.strip()
+	html, plain, links = inline_fragment(text)
 
-				if nodes := text_to_textnodes(block):
-					html_nodes = []
-					for node in nodes:
-						html_nodes.append(text_node_to_html_node(node, node.text_type))
+	if texts is not None and plain:
+		texts.append(plain)
+	if targets is not None:
+		targets.extend(links)
+	if html:
+		return [LeafNode(value = html)]
+	return []
 
-				all_html_nodes.extend([ParentNode(tag = "li", children = html_nodes)])
 
-			return ParentNode(tag = "ol", children = all_html_nodes).to_html()
+def list_items(block, bounds, texts = None, targets = None):
+	items = []
 
-		case "quote":
-			block = block[2:]
+	for start, end in bounds:
+		# Empty items (a trailing marker) used to repeat the previous item
+		if html_nodes := inline_children(block, texts, *strip_bounds(block, start, end), targets):
+			items.append(ParentNode(tag = "li", children = html_nodes))
 
-			if nodes := text_to_textnodes(block):
-				html_nodes = []
+	return items
 
-				for node in nodes:
-					html_nodes.append(text_node_to_html_node(node, node.text_type))
 
-		
-			return ParentNode(tag = "blockquote", children = html_nodes).to_html()
+def block_to_html_node(block, block_category, texts = None, targets = None):
+	match (block_category):
+		case "heading":
+			count = 1
+			j = 1
+			while (block[j]) == "#":
+				count += 1
+				j += 1
 
-		case "code":
-			if nodes := text_to_textnodes(block):
-				print(block)
-				html_nodes = []
+			return ParentNode(tag = f"h{count}", children = inline_children(block, texts, count + 1, targets = targets)).to_html()
 
-				print(nodes)
-				for node in nodes:
-					html_nodes.append(text_node_to_html_node(node, node.text_type))
+		case "unordered list":
+			separator = "- " if block.find("- ", 2) >= 0 else "* "
+			bounds = split_bounds(block, separator, 2, len(block))
 
-		
-			return "".join(node.to_html() for node in html_nodes)
+			return ParentNode(tag = f"ul", children = list_items(block, bounds, texts, targets)).to_html()
 
-		case "normal":
+		case "ordered list":
+			bounds = pattern_bounds(block, ORDERED_MARKER, 3, len(block))
 
-			if nodes := text_to_textnodes(block):
-				html_nodes = []
+			return ParentNode(tag = "ol", children = list_items(block, bounds, texts, targets)).to_html()
 
-				for node in nodes:
-					html_nodes.append(text_node_to_html_node(node, node.text_type))
+		case "quote":
+			return ParentNode(tag = "blockquote", children = inline_children(block, texts, 2, targets = targets)).to_html()
 
-		
-			return ParentNode(tag = "p", children = html_nodes).to_html()
+		case "code":
+			logger.debug("code block: %s", block)
+			html, plain, links = inline_fragment(block)
+			if texts is not None and plain:
+				texts.append(plain)
+			if targets is not None:
+				targets.extend(links)
+			return html
 
+		case "normal":
+			return ParentNode(tag = "p", children = inline_children(block, texts, targets = targets)).to_html()
+
+
+
+def add_dimensions(html, targets, image_size):
+	# Width and height go on every image the build measured, so browsers reserve its box before it loads,
+	# and a srcset of its WebP variants lets them fetch the smallest one that fills it.
+	# Applied after the block cache, which stays valid when only an image changes
+	for kind, url in targets:
+		if kind == "image" and (size := image_size(url)):
+			attributes = f'width="{size[0]}" height="{size[1]}"'
+			if len(size) > 2:
+				srcset = ", ".join(f"{variant} {width}w" for variant, width in size[2])
+				attributes += f' srcset="{srcset}" sizes="(max-width: {size[0]}px) 100vw, {size[0]}px"'
+			html = html.replace(f'<img src="{url}" alt=', f'<img src="{url}" {attributes} alt=')
+
+	return html
+
+
+def get_block_cache():
+	# The cache rendering() opened, if any; blockcache (and sqlite3 with it) is only loaded by
+	# builds that use one
+	blockcache = sys.modules.get("blockcache")
+	return blockcache.get_block_cache() if blockcache else None
+
+
+def write_markdown_html(lines, write, text = None, links = None, image_size = None):
+	# text and links, when given, receive each block's plain text and its
+	# (kind, url) link and image targets alongside the markup; image_size maps
+	# an image url to its [width, height]
+	profiler = get_profiler()
+	cache = get_block_cache()
+	write("<div>")
+
+	for block in iter_blocks(lines):
+		if cache is None:
+			texts = [] if text else None
+			targets = [] if links or image_size else None
+			html = block_to_html_node(block, block_to_block_type(block), texts, targets)
+			plain = " ".join(texts) if text else None
+		elif (cached := cache.get(block)) is None:
+			# The cache always keeps the text and targets so a later indexed or checked build can hit it
+			texts = []
+			targets = []
+			html = block_to_html_node(block, block_to_block_type(block), texts, targets)
+			plain = " ".join(texts)
+			cache.put(block, html, plain, targets)
+			profiler.count("block_cache_misses")
+		else:
+			html, plain, targets = cached
+			profiler.count("block_cache_hits")
 
+		if image_size and targets:
+			html = add_dimensions(html, targets, image_size)
+
+		write(html)
+		if text:
+			text(plain)
+		if links:
+			links(targets)
+		profiler.count("blocks")
+
+	write("</div>")
 
-def markdown_to_html_node(markdown):
-	markdown_blocks = markdown_to_blocks(markdown)
 
-	print(markdown_blocks)
+def markdown_to_html_node(markdown):
 	html_nodes = []
-	for block in markdown_blocks:
-		block_category = block_to_block_type(block)
+	write_markdown_html(markdown.split("\n"), html_nodes.append)
+
+	return "".join(html_nodes)
 
-		html_nodes.append(block_to_html_node(block, block_category))
 
+def extract_title(lines):
+	# Stops at the first h1, so only the top of the file is read
+	for line in lines:
+		if (line := line.strip()).startswith("# "):
+			return line[2:].strip()
 
-	html_nodes.insert(0, "<div>")
-	html_nodes.append("</div>")
+	return ""
 
-	print(html_nodes)
 
-	return "".join(html_nodes)
+def page_metadata(lines):
+	# Front matter, with the title falling back to the first h1; reads no further than that
+	metadata, body = split_front_matter(lines)
+
+	if "title" not in metadata:
+		metadata["title"] = extract_title(body)
+
+	return metadata
+
+
+def page_context(metadata, variables = None):
+	# title, date, tags, ... become {{ Title }}, {{ Date }}, {{ Tags }}; explicit variables win
+	context = {key.capitalize(): ", ".join(value) if isinstance(value, list) else value
+		for key, value in metadata.items()}
+	context.update(variables or {})
+
+	return context
+
 
+def generate_page(from_path, template_path, dest_path, variables = None, texts = None, targets = None, image_size = None):
+	logger.info("Generating page from %s to %s using %s", from_path, dest_path, template_path)
+	profiler = get_profiler()
 
-def generate_page(from_path, template_path, dest_path):
-	print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+	with profiler.page(from_path):
+		return write_page(from_path, template_path, dest_path, variables, profiler, texts, targets, image_size)
 
-	with open(from_path, "r", encoding="utf-8") as file:
-            markdown = file.read()
-	
-	with open(template_path, "r", encoding="utf-8") as file:
-            template = file.read()
-	
-	html_content = markdown_to_html_node(markdown)
 
-	final_html = template.replace("{{ Content }}", html_content)
-	
-	os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-	
-	with open(dest_path, "w", encoding="utf-8") as file:
-		file.write(final_html)
+def write_page(from_path, template_path, dest_path, variables, profiler, texts = None, targets = None, image_size = None):
+	template = load_template(template_path)
+
+	with open(from_path, "r", encoding="utf-8") as source:
+		context = page_context(page_metadata(source), variables)
+
+	# Re-opened for every {{ Content }} slot, the body is never held in memory
+	def content(write):
+		with open(from_path, "r", encoding="utf-8") as source:
+			metadata, body = split_front_matter(source)
+			write_markdown_html(body, write, None if texts is None else texts.append,
+				None if targets is None else targets.extend, image_size)
+
+	context["Content"] = content
+
+	with AtomicWriter(dest_path) as file:
+		template.render(file.write, context)
+
+	if profiler.enabled:
+		profiler.count("pages")
+		if file.written:
+			profiler.count("bytes_written", file.size)
+		else:
+			profiler.count("outputs_unchanged")
+
+	return file
+
+
+def render_page(markdown, template_path, variables = None, texts = None, targets = None, image_size = None):
+	# In-memory variant of write_page for callers that do their own reads and writes
+	template = load_template(template_path)
+	lines = markdown.split("\n")
+	context = page_context(page_metadata(lines), variables)
+	context["Content"] = lambda write: write_markdown_html(split_front_matter(lines)[1], write,
+		None if texts is None else texts.append, None if targets is None else targets.extend, image_size)
+
+	parts = []
+	template.render(parts.append, context)
+	return "".join(parts)
 
 
 def generate_pages_recursive(dir_path_content, template_path, dest_dir_path):
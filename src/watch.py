@@ -0,0 +1,233 @@
+from build import BuildError, rebuild_paths
+from manifest import load_build_manifest, manifest_path, save_manifest
+import ctypes, ctypes.util
+import errno, os, select, struct, sys, time
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+	| IN_MOVE_SELF)
+EVENT_HEADER = struct.Struct("iIII")
+
+# Editors save in bursts (write, chmod, rename); events this close together are one change
+SETTLE_SECONDS = 0.01
+
+
+class PollingWatcher():
+	def __init__(self, paths, interval = 0.25):
+		self.paths = paths
+		self.interval = interval
+		self.snapshot = self.scan()
+
+	def scan(self):
+		snapshot = {}
+
+		for path in self.paths:
+			if os.path.isfile(path):
+				stat = os.stat(path)
+				snapshot[os.path.normpath(path)] = (stat.st_mtime_ns, stat.st_size)
+				continue
+
+			for root, dirs, files in os.walk(path):
+				for item in files:
+					file_path = os.path.normpath(os.path.join(root, item))
+					try:
+						stat = os.stat(file_path)
+					except OSError:
+						continue
+					snapshot[file_path] = (stat.st_mtime_ns, stat.st_size)
+
+		return snapshot
+
+	def wait(self, timeout = None):
+		deadline = None if timeout is None else time.monotonic() + timeout
+
+		while True:
+			snapshot = self.scan()
+			changed = {path for path in snapshot.keys() | self.snapshot.keys()
+				if snapshot.get(path) != self.snapshot.get(path)}
+			self.snapshot = snapshot
+
+			if changed or (deadline is not None and time.monotonic() >= deadline):
+				return changed
+			time.sleep(self.interval)
+
+	def close(self):
+		pass
+
+
+class InotifyWatcher():
+	def __init__(self, paths):
+		libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+		self.add_watch = libc.inotify_add_watch
+		self.add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+		self.rm_watch = libc.inotify_rm_watch
+		self.rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+
+		self.fd = libc.inotify_init1(IN_CLOEXEC)
+		if self.fd < 0:
+			raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+		# wd -> directory; single files are watched through their directory
+		self.directories = {}
+		self.files = set()
+
+		for path in paths:
+			if os.path.isfile(path):
+				self.files.add(os.path.normpath(path))
+				self.watch_directory(os.path.dirname(path) or ".", recursive = False)
+			else:
+				self.watch_directory(path)
+
+	def watch_directory(self, path, recursive = True):
+		path = os.path.normpath(path)
+		added = []
+
+		# A directory can be gone again before its creation event is read, there's nothing left to watch
+		wd = self.add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+		if wd < 0:
+			error = ctypes.get_errno()
+			if error in (errno.ENOENT, errno.ENOTDIR):
+				return added
+			raise OSError(error, f"inotify_add_watch failed for {path}")
+		self.directories[wd] = (path, recursive)
+
+		if recursive:
+			try:
+				items = list(os.scandir(path))
+			except (FileNotFoundError, NotADirectoryError):
+				items = []
+
+			for item in items:
+				if item.is_dir(follow_symlinks=False):
+					added.extend(self.watch_directory(item.path))
+				else:
+					added.append(os.path.normpath(item.path))
+
+		return added
+
+	def unwatch_directory(self, path):
+		# A moved directory's watches keep following it, its events would be reported under
+		# the old path; the kernel already dropped a deleted one's and the call just fails
+		for wd, (directory, recursive) in list(self.directories.items()):
+			if directory == path or directory.startswith(path + os.sep):
+				del self.directories[wd]
+				self.rm_watch(self.fd, wd)
+
+	def read_events(self):
+		changed = set()
+		data = os.read(self.fd, 1 << 16)
+		offset = 0
+
+		while offset < len(data):
+			wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+			offset += EVENT_HEADER.size
+			name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+			offset += length
+
+			if mask & IN_Q_OVERFLOW:
+				raise OverflowError("inotify queue overflowed")
+
+			if mask & IN_IGNORED:
+				self.directories.pop(wd, None)
+				continue
+			if wd not in self.directories:
+				continue
+			directory, recursive = self.directories[wd]
+			path = os.path.normpath(os.path.join(directory, name)) if name else directory
+
+			if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+				# Subdirectories were already handled through their parent's event, this is a watched root
+				self.unwatch_directory(directory)
+				changed.add(directory)
+			elif mask & IN_ISDIR:
+				# A new directory may already hold files by the time we watch it
+				if recursive and mask & (IN_CREATE | IN_MOVED_TO):
+					changed.update(self.watch_directory(path))
+				# A directory going away is reported as itself, rebuild_paths drops everything under it
+				elif recursive and mask & (IN_DELETE | IN_MOVED_FROM):
+					self.unwatch_directory(path)
+					changed.add(path)
+			elif recursive or path in self.files:
+				changed.add(path)
+
+		return changed
+
+	def wait(self, timeout = None):
+		changed = set()
+
+		if select.select([self.fd], [], [], timeout)[0]:
+			changed |= self.read_events()
+
+			while select.select([self.fd], [], [], SETTLE_SECONDS)[0]:
+				changed |= self.read_events()
+
+		return changed
+
+	def close(self):
+		os.close(self.fd)
+
+
+def make_watcher(paths):
+	if sys.platform.startswith("linux"):
+		try:
+			return InotifyWatcher(paths)
+		except (OSError, AttributeError):
+			pass
+
+	return PollingWatcher(paths)
+
+
+def watch(dir_path_content, dir_path_static, template_path, dest_dir_path, on_change = None, jobs = 1, cache_path = None):
+	manifest = load_build_manifest(dest_dir_path)
+	watcher = make_watcher([dir_path_content, dir_path_static, template_path])
+	print(f"Watching {dir_path_content}, {dir_path_static} and {template_path} with {type(watcher).__name__}")
+
+	try:
+		while True:
+			try:
+				changed = watcher.wait()
+			except OverflowError:
+				# Too many events to trust the queue, fall back to a rescan of everything
+				changed = set(PollingWatcher([dir_path_content, dir_path_static, template_path]).snapshot)
+
+			started = time.perf_counter()
+
+			try:
+				report = rebuild_paths(manifest, changed, dir_path_content, template_path, dest_dir_path,
+					jobs = jobs, dir_path_static = dir_path_static, cache_path = cache_path, save = False)
+			except BuildError as e:
+				print(e, file=sys.stderr)
+				save_manifest(manifest, manifest_path(dest_dir_path))
+				continue
+			except OSError as e:
+				# A file that vanished mid-rebuild (the template between an editor's delete and
+				# rename) is picked up again by the event that brings it back
+				print(f"Rebuild failed: {e}", file=sys.stderr)
+				continue
+
+			assets = report.assets
+			if report.rendered or report.removed or assets.copied or assets.removed:
+				elapsed = (time.perf_counter() - started) * 1000
+				print(f"Rebuilt {len(report.rendered)} pages, removed {len(report.removed)}, "
+					f"copied {len(assets.copied)} assets, removed {len(assets.removed)} in {elapsed:.1f} ms")
+
+				if on_change:
+					on_change()
+
+				# Off the edit-to-refresh path, browsers are already reloading
+				save_manifest(manifest, manifest_path(dest_dir_path))
+	finally:
+		watcher.close()